@@ -0,0 +1,213 @@
+# Response cache for the report endpoints
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from psycopg2 import errors
+
+from api.database import pooled_connection, run_db
+
+# Cache sizing and invalidation, overridable from the environment
+CACHE_TTL = float(os.getenv("API_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "1024"))
+VERSION_CHECK_INTERVAL = float(os.getenv("API_CACHE_VERSION_INTERVAL", "10"))
+
+# Bumped by the Dagster pipeline after dbt rebuilds the marts
+DATA_VERSION_TABLE = "raw.data_version"
+
+
+# ______________ Backends ______________#
+class CacheBackend:
+    """
+    Interface for cache storage. Subclass it to keep entries elsewhere (e.g.
+    Redis) and install the instance with set_backend().
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache(CacheBackend):
+    """
+    Thread-safe in-process LRU with a per-entry time to live.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_backend = MemoryCache()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def set_backend(backend: CacheBackend):
+    global _backend
+    _backend = backend
+
+
+def _count(endpoint, outcome):
+    with _stats_lock:
+        counts = _stats.setdefault(endpoint, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+
+def cache_stats():
+    """
+    Hit and miss counters, overall and per endpoint.
+    """
+    with _stats_lock:
+        endpoints = {name: dict(counts) for name, counts in _stats.items()}
+    hits = sum(counts["hits"] for counts in endpoints.values())
+    misses = sum(counts["misses"] for counts in endpoints.values())
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "entries": len(_backend),
+        "data_version": _version.token,
+        "endpoints": endpoints,
+    }
+
+
+# ______________ Data version ______________#
+class DataVersion:
+    """
+    The latest data-version token, re-read from the database at most every
+    VERSION_CHECK_INTERVAL seconds. Without a version row the token is None and
+    entries only expire through their TTL.
+    """
+
+    def __init__(self):
+        self.token = None
+        self.updated_at = None
+        self.checked_at = float("-inf")
+
+    def _fetch(self):
+        # Read where the marts are read: a replica that lags behind the primary
+        # reports the version of the data it actually serves
+        try:
+            with pooled_connection(readonly=True) as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT version, updated_at FROM {DATA_VERSION_TABLE} "
+                    "WHERE name = 'marts';"
+                )
+                row = cursor.fetchone()
+        except errors.UndefinedTable:
+            row = None
+        if row is None:
+            return None, None
+        return row[0], row[1].astimezone(timezone.utc)
+
+    async def refresh(self):
+        if time.monotonic() - self.checked_at < VERSION_CHECK_INTERVAL:
+            return self
+        token, updated_at = await run_db(self._fetch)
+        self.checked_at = time.monotonic()
+        if token != self.token:
+            # Entries keyed by the old token can never hit again
+            _backend.clear()
+            self.token, self.updated_at = token, updated_at
+        return self
+
+
+_version = DataVersion()
+
+
+# ______________ Conditional requests ______________#
+def _etag(key, token):
+    digest = hashlib.sha1(repr((key, token)).encode("utf-8")).hexdigest()[:16]
+    return f'"{token}-{digest}"'
+
+
+def _not_modified(request: Request, etag, updated_at):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in {tag.strip() for tag in if_none_match.split(",")} or (
+            if_none_match.strip() == "*"
+        )
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return updated_at.replace(microsecond=0) <= since
+    return False
+
+
+async def cached_call(request: Request, response: Response, endpoint, params, func):
+    """
+    Serve `func()` (a blocking crud call) from the cache for this endpoint and
+    parameters, loading it through run_db on a miss.
+
+    Once the pipeline has recorded a data version, responses carry an ETag and
+    Last-Modified, and a matching conditional request gets a bare 304 Response.
+    """
+    version = await _version.refresh()
+    key = (endpoint, params, version.token)
+
+    if version.token is not None:
+        etag = _etag(key, version.token)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(version.updated_at, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if _not_modified(request, etag, version.updated_at):
+            _count(endpoint, "hits")
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    value = _backend.get(key)
+    if value is not None:
+        _count(endpoint, "hits")
+        return value
+    _count(endpoint, "misses")
+    value = await run_db(func)
+    _backend.set(key, value, CACHE_TTL)
+    return value
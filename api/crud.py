@@ -1,45 +1,57 @@
-# SQL query logic
-from api.database import get_connection
+# SQL query logic. Rows are shaped to the response schemas with JSON-native types
+# (float8 rather than numeric), so endpoints can serialize them without another
+# round of validation.
+import logging
+import os
+from contextlib import closing
+
+import orjson
+import psycopg2
+from psycopg2 import pool
+
+from api.database import pooled_connection, stream_query
+from api.warehouse import warehouse_cursor
+
+logger = logging.getLogger(__name__)
+
+# Detections from this model back search results and the default top products
+# report; other models run alongside it are picked with the `model` parameter.
+DEFAULT_MODEL_VERSION = os.getenv("API_DEFAULT_MODEL", "yolov8n")
 
 
 # ______________ Get all channel slugs ______________#
 def get_all_channel_slugs():
-    conn = get_connection()
-    cursor = conn.cursor()
-
     query = """
         SELECT DISTINCT channel_slug
         FROM raw_marts.fct_messages
         ORDER BY channel_slug;
     """
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with pooled_connection(readonly=True) as conn, conn.cursor() as cursor:
+        cursor.execute(query)
+        rows = cursor.fetchall()
 
     return [row[0] for row in rows]
 
 
 # ______________ Get top products ______________#
 # This function retrieves the top products based on the number of mentions and average confidence score.
-def get_top_products(limit=10):
-    conn = get_connection()
-    cursor = conn.cursor()
-
+# It reads the agg_object_daily rollup, whose size grows with days rather than detections.
+def get_top_products(limit=10, model=DEFAULT_MODEL_VERSION):
     query = """
         SELECT 
-            detected_object,
-            COUNT(*) AS count,
-            ROUND(AVG(confidence_score)::numeric, 3) AS avg_confidence
-        FROM enriched.fct_image_detections
-        GROUP BY detected_object
+            object_class,
+            SUM(detection_count)::bigint AS count,
+            ROUND((SUM(confidence_sum) / SUM(detection_count))::numeric, 3)::float8
+                AS avg_confidence
+        FROM raw_marts.agg_object_daily
+        WHERE model_version = %s
+        GROUP BY object_class
         ORDER BY count DESC
         LIMIT %s;
     """
-    cursor.execute(query, (limit,))
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with pooled_connection(readonly=True) as conn, conn.cursor() as cursor:
+        cursor.execute(query, (model, limit))
+        rows = cursor.fetchall()
 
     return [
         {"object_class": row[0], "count": row[1], "avg_confidence": row[2]}
@@ -47,33 +59,110 @@ def get_top_products(limit=10):
     ]
 
 
-# ______________ Get channel activity ______________#
-# This function retrieves the daily message count and view count for a specific channel.
-def get_channel_activity(channel_slug: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
+# ______________ Get object trends ______________#
+# Monthly detection counts per object class over any date range, read from the
+# Parquet export by DuckDB rather than from Postgres.
+def get_object_trends(
+    model=DEFAULT_MODEL_VERSION, channel_slug=None, date_from=None, date_to=None
+):
     query = """
-        SELECT 
-            date_day,
-            COUNT(*) AS message_count,
-            SUM(COALESCE(views, 0)) AS total_views
-        FROM raw_marts.fct_messages
-        WHERE channel_slug = %s
-        GROUP BY date_day
-        ORDER BY date_day ASC;
+        SELECT
+            date_month,
+            object_class,
+            count(*) AS count,
+            round(avg(confidence_score), 3) AS avg_confidence
+        FROM fct_image_detections
+        WHERE model_version = $model
+          AND ($channel_slug IS NULL OR channel_slug = $channel_slug)
+          AND ($date_from IS NULL OR date_day >= $date_from)
+          AND ($date_to IS NULL OR date_day <= $date_to)
+        GROUP BY date_month, object_class
+        ORDER BY date_month, count DESC, object_class;
     """
-    cursor.execute(query, (channel_slug,))
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    params = {
+        "model": model,
+        "channel_slug": channel_slug,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    with warehouse_cursor("fct_image_detections") as cursor:
+        rows = cursor.execute(query, params).fetchall()
 
     return [
-        {"date_day": row[0], "message_count": row[1], "total_views": row[2]}
+        {
+            "date_month": row[0],
+            "object_class": row[1],
+            "count": row[2],
+            "avg_confidence": row[3],
+        }
         for row in rows
     ]
 
 
+# ______________ Get channel activity ______________#
+# This function retrieves the daily message count and view count for a specific channel
+# from the agg_channel_daily rollup (one indexed row per channel and day).
+ACTIVITY_SQL = """
+    SELECT 
+        date_day,
+        message_count,
+        total_views
+    FROM raw_marts.agg_channel_daily
+    WHERE channel_slug = %(channel_slug)s
+      AND (%(date_from)s::date IS NULL OR date_day >= %(date_from)s::date)
+      AND (%(date_to)s::date IS NULL OR date_day <= %(date_to)s::date)
+      AND (%(after)s::date IS NULL OR date_day > %(after)s::date)
+    ORDER BY date_day ASC
+"""
+
+
+def _activity_row(row):
+    return {"date_day": row[0], "message_count": row[1], "total_views": row[2]}
+
+
+def get_channel_activity(
+    channel_slug: str, date_from=None, date_to=None, limit=365, after=None
+):
+    """
+    One page of a channel's daily activity and the key to continue after it.
+
+    `after` is the date_day of the last row of the previous page; next_key is
+    None on the last page.
+    """
+    params = {
+        "channel_slug": channel_slug,
+        "date_from": date_from,
+        "date_to": date_to,
+        "after": after,
+        "limit": limit + 1,
+    }
+    with pooled_connection(readonly=True) as conn, conn.cursor() as cursor:
+        cursor.execute(ACTIVITY_SQL + "LIMIT %(limit)s;", params)
+        rows = cursor.fetchall()
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = rows[-1][0]
+    return [_activity_row(row) for row in rows], next_key
+
+
+def stream_channel_activity(channel_slug: str, date_from=None, date_to=None):
+    """
+    A channel's whole activity history in batches, read through a server-side
+    cursor.
+    """
+    params = {
+        "channel_slug": channel_slug,
+        "date_from": date_from,
+        "date_to": date_to,
+        "after": None,
+    }
+    with closing(stream_query(ACTIVITY_SQL, params, name="activity_export")) as batches:
+        for rows in batches:
+            yield [_activity_row(row) for row in rows]
+
+
 # ______________ Search messages ______________#
 # This function searches for messages containing a specific query string.
 def format_text(raw_text):
@@ -82,54 +171,149 @@ def format_text(raw_text):
     return lines[:15]  # limit to top 15 lines for brevity
 
 
-def search_messages(query: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    search = f"%{query.lower().strip()}%"
-    print(f"Search pattern: {search}")
-    sql = """
+# Candidate rows per search mode. `sort_key` orders results (rank or recency) and,
+# together with message_id, forms the keyset for cursor pagination.
+DATE_FILTER = """
+          AND (%(date_from)s::date IS NULL OR s.date_day >= %(date_from)s::date)
+          AND (%(date_to)s::date IS NULL OR s.date_day <= %(date_to)s::date)
+"""
+SEARCH_MATCHES = {
+    "fts": (
+        """
+        SELECT s.message_id, s.channel_slug, s.date_day, s.text,
+               ts_rank(s.search_vector, q.query) AS sort_key
+        FROM raw_marts.fct_message_search s,
+             websearch_to_tsquery('simple', %(term)s) AS q(query)
+        WHERE s.search_vector @@ q.query
+        """
+        + DATE_FILTER,
+        "real",
+    ),
+    "substring": (
+        """
+        SELECT s.message_id, s.channel_slug, s.date_day, s.text,
+               s.date_day AS sort_key
+        FROM raw_marts.fct_message_search s
+        WHERE s.text ILIKE %(term)s
+        """
+        + DATE_FILTER,
+        "date",
+    ),
+}
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_params(query, mode, date_from, date_to):
+    term = query.strip()
+    if mode == "substring":
+        term = f"%{_escape_like(term.lower())}%"
+    logger.debug("search mode=%s pattern=%r", mode, term)
+    return {
+        "term": term,
+        "date_from": date_from,
+        "date_to": date_to,
+        "model_version": DEFAULT_MODEL_VERSION,
+    }
+
+
+def _search_sql(mode, keyset=False, paged=True):
+    """
+    Matches in (sort_key, message_id) order with their detections, which are
+    only aggregated for the rows that are returned.
+    """
+    matches, key_type = SEARCH_MATCHES[mode]
+    after = ""
+    if keyset:
+        after = (
+            f"WHERE (sort_key, message_id) < (%(after_key)s::{key_type}, %(after_id)s)"
+        )
+    limit = "LIMIT %(limit)s" if paged else ""
+    return f"""
+        WITH matches AS ({matches}),
+        page AS (
+            SELECT * FROM matches
+            {after}
+            ORDER BY sort_key DESC, message_id DESC
+            {limit}
+        )
         SELECT 
-            m.message_id,
-            m.channel_slug,
-            m.date_day AS posted_at,
-            ARRAY_AGG(
+            p.message_id,
+            p.channel_slug,
+            p.date_day::timestamp AS posted_at,
+            d.detections,
+            p.text,
+            p.sort_key
+        FROM page p
+        LEFT JOIN LATERAL (
+            SELECT json_agg(
                 json_build_object(
                     'object', d.detected_object,
                     'confidence', ROUND(d.confidence_score::numeric, 3)
                 )
-            ) FILTER (WHERE d.detected_object IS NOT NULL) AS detections,
-            m.text
-        FROM raw_marts.fct_messages m
-        LEFT JOIN enriched.fct_image_detections d
-            ON m.message_id = d.message_id
-        WHERE m.text IS NOT NULL AND LOWER(m.text) LIKE %s
-        GROUP BY m.message_id, m.channel_slug, m.date_day, m.text
-        ORDER BY posted_at DESC
-        LIMIT 50;
+            )::text AS detections
+            FROM enriched.fct_image_detections d
+            WHERE d.message_id = p.message_id
+              AND d.model_version = %(model_version)s
+              AND d.detected_object IS NOT NULL
+        ) d ON true
+        ORDER BY p.sort_key DESC, p.message_id DESC
         """
 
+
+def _search_row(row):
+    # Detections arrive as JSON text built by Postgres and are embedded as is
+    return {
+        "message_id": row[0],
+        "channel_slug": row[1],
+        "posted_at": row[2],
+        "detections": orjson.Fragment(row[3] or "[]"),
+        "text_preview": format_text(row[4]),
+    }
+
+
+def search_messages(
+    query: str, mode="substring", limit=50, after=None, date_from=None, date_to=None
+):
+    """
+    Search message text and return (results, next_key).
+
+    `after` is the (sort_key, message_id) of the last row of the previous page;
+    detections are only aggregated for the rows on the requested page.
+    """
+    params = _search_params(query, mode, date_from, date_to)
+    params["limit"] = limit + 1
+    if after is not None:
+        params.update(after_key=after[0], after_id=after[1])
+    sql = _search_sql(mode, keyset=after is not None)
+
     try:
-        cursor.execute(sql, (search,))
-        rows = cursor.fetchall()
-        print(f"Query returned {len(rows)} rows")  # Debug line
-    except Exception as e:
-        print(f"Search query failed: {e}")
+        with pooled_connection(readonly=True) as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        logger.debug("search mode=%s rows=%d", mode, len(rows))
+    except (pool.PoolError, psycopg2.OperationalError, psycopg2.InterfaceError):
+        raise  # no database to ask: answered 503 by the app, not "no matches"
+    except psycopg2.Error as e:
+        logger.error("search query failed mode=%s error=%s", mode, str(e).strip())
         rows = []
 
-    cursor.close()
-    conn.close()
-
-    results = []
-    for row in rows:
-        print("Row detections:", row[3])  # prints before return
-        results.append(
-            {
-                "message_id": row[0],
-                "channel_slug": row[1],
-                "posted_at": row[2],
-                "detections": row[3] or [],
-                "text_preview": format_text(row[4]),
-            }
-        )
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = [rows[-1][5], rows[-1][0]]
+
+    return [_search_row(row) for row in rows], next_key
 
-    return results
+
+def stream_search_messages(query: str, mode="substring", date_from=None, date_to=None):
+    """
+    Every match of a search in batches, read through a server-side cursor.
+    """
+    params = _search_params(query, mode, date_from, date_to)
+    sql = _search_sql(mode, paged=False)
+    with closing(stream_query(sql, params, name="search_export")) as batches:
+        for rows in batches:
+            yield [_search_row(row) for row in rows]
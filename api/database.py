@@ -1,16 +1,421 @@
 # Postgres connector
-import os, psycopg2
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import anyio.to_thread
+import psycopg2
+from anyio import CapacityLimiter
 from dotenv import load_dotenv
+from psycopg2 import extensions, pool
+
+from api.metrics import POOL_WAIT_SECONDS, Gauge, add_time, register
 
 load_dotenv()
 
+# Pool sizing and checkout behaviour, overridable from the environment
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN", "2"))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "10"))
+# Queries slower than this are logged with their EXPLAIN (ANALYZE, BUFFERS) plan;
+# 0 turns the slow-query log off
+SLOW_QUERY_MS = float(os.getenv("API_SLOW_QUERY_MS", "0"))
+# Read replicas for pooled_connection(readonly=True): comma-separated libpq
+# connection strings or URIs, each overriding the POSTGRES_* settings it names,
+# e.g. "host=replica1,host=replica2 port=5433". Reads go round-robin over them
+# and fall back to the primary (POSTGRES_*) while none is available.
+READ_DSNS = [dsn.strip() for dsn in os.getenv("POSTGRES_READ_DSNS", "").split(",")]
+READ_DSNS = [dsn for dsn in READ_DSNS if dsn]
+# Seconds a replica that failed to connect or dropped a query is skipped for
+REPLICA_COOLDOWN = float(os.getenv("POSTGRES_REPLICA_COOLDOWN", "30"))
+# Default connect_timeout for replicas, so an unreachable host fails over quickly
+REPLICA_CONNECT_TIMEOUT = 5
 
-# Function to get a connection to the PostgreSQL database
-def get_connection():
-    return psycopg2.connect(
+_primary = None
+_replicas = []
+_next_replica = itertools.count()
+_limiter = None
+_pool_lock = threading.Lock()
+_in_use = 0
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("api.slow_query")
+
+register(
+    Gauge(
+        "api_pool_connections_in_use",
+        "Pooled database connections currently checked out.",
+        lambda: _in_use,
+    )
+)
+register(
+    Gauge(
+        "api_db_replicas_available",
+        "Read replicas currently routed to (not cooling down after a failure).",
+        lambda: sum(node.available() for node in _replicas),
+    )
+)
+
+
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no pooled connection frees up within POOL_TIMEOUT seconds."""
+
+
+# ______________ Query instrumentation ______________#
+class InstrumentedCursor(extensions.cursor):
+    """
+    Cursor that adds its execute and fetch time to the request's DB time and,
+    when SLOW_QUERY_MS is set, logs the plan of slow read queries.
+    """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - start
+            add_time("db", elapsed)
+        # Only queries that succeeded are explained, so a failing EXPLAIN can
+        # never replace the error the caller (and replica mark-down) needs
+        if (
+            SLOW_QUERY_MS
+            and elapsed * 1000 >= SLOW_QUERY_MS
+            and self.name is None
+            and not self.connection.closed
+        ):
+            self._log_slow_query(elapsed)
+        return result
+
+    def fetchmany(self, size=None):
+        # Named (server-side) cursors do their work as rows are fetched
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        finally:
+            add_time("db", time.perf_counter() - start)
+
+    def _log_slow_query(self, elapsed):
+        query = self.query.decode(self.connection.encoding, "replace")
+        if not query.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        # EXPLAIN ANALYZE runs the query again; a savepoint keeps a failure from
+        # aborting the caller's transaction
+        with self.connection.cursor(cursor_factory=extensions.cursor) as explain:
+            savepoint = False
+            try:
+                explain.execute("SAVEPOINT slow_query_explain;")
+                savepoint = True
+                explain.execute("EXPLAIN (ANALYZE, BUFFERS) " + query)
+                plan = "\n".join(row[0] for row in explain.fetchall())
+                explain.execute("RELEASE SAVEPOINT slow_query_explain;")
+            except psycopg2.Error as e:
+                plan = f"EXPLAIN failed: {e}".strip()
+                if savepoint and not self.connection.closed:
+                    explain.execute("ROLLBACK TO SAVEPOINT slow_query_explain;")
+        slow_query_logger.warning(
+            "slow query duration_ms=%.1f threshold_ms=%.0f\n%s\n%s",
+            elapsed * 1000,
+            SLOW_QUERY_MS,
+            query.strip(),
+            plan,
+        )
+
+
+def _connection_kwargs(dsn=None):
+    kwargs = dict(
         dbname=os.getenv("POSTGRES_DB"),
         user=os.getenv("POSTGRES_USER"),
         password=os.getenv("POSTGRES_PASSWORD"),
         host=os.getenv("POSTGRES_HOST"),
         port=os.getenv("POSTGRES_PORT"),
+        cursor_factory=InstrumentedCursor,
+    )
+    if dsn:
+        kwargs["connect_timeout"] = REPLICA_CONNECT_TIMEOUT
+        kwargs.update(extensions.parse_dsn(dsn))
+    return kwargs
+
+
+# Function to get a connection to the PostgreSQL database
+def get_connection():
+    """
+    Open a fresh, unpooled connection. Prefer pooled_connection() in the API.
+    """
+    return psycopg2.connect(**_connection_kwargs())
+
+
+# ______________ Connection pool ______________#
+class PoolNode:
+    """
+    Connection pool for one database server, the primary or a read replica.
+
+    A replica that fails is marked down for REPLICA_COOLDOWN seconds and its
+    pool dropped. The first checkout after the cooldown opens a new pool,
+    which doubles as the health check.
+    """
+
+    def __init__(self, name, connect_kwargs, minconn, maxconn):
+        self.name = name
+        self.connect_kwargs = connect_kwargs
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pool = None
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def get_pool(self):
+        """
+        The node's pool, opened and warmed up on first use. Each warm connection
+        is pinged so a misconfigured server fails here rather than mid-query.
+        """
+        with self._lock:
+            if self.pool is None:
+                new_pool = pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn, **self.connect_kwargs
+                )
+                warm = [new_pool.getconn() for _ in range(self.minconn)]
+                try:
+                    for conn in warm:
+                        _ping(conn)
+                except psycopg2.Error:
+                    new_pool.closeall()
+                    raise
+                finally:
+                    if not new_pool.closed:
+                        for conn in warm:
+                            new_pool.putconn(conn)
+                self.pool = new_pool
+                if self.down_until:
+                    logger.info("replica recovered node=%s", self.name)
+                    self.down_until = 0.0
+            return self.pool
+
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, error):
+        # Connections still checked out go back to the pool they came from
+        with self._lock:
+            self.pool = None
+            self.down_until = time.monotonic() + REPLICA_COOLDOWN
+        message = str(error).strip().splitlines() or [type(error).__name__]
+        logger.warning(
+            "replica down node=%s cooldown_s=%.0f error=%s",
+            self.name,
+            REPLICA_COOLDOWN,
+            message[0],
+        )
+
+    def close(self):
+        with self._lock:
+            if self.pool is not None and not self.pool.closed:
+                self.pool.closeall()
+            self.pool = None
+
+
+def init_pool(minconn=POOL_MIN_SIZE, maxconn=POOL_MAX_SIZE):
+    """
+    Create the process-wide connection pools and warm up the primary's.
+
+    The primary pool opens `minconn` connections immediately, so a
+    misconfigured database fails at startup instead of on the first request.
+    Replica pools open on their first read; an unreachable replica is skipped
+    rather than failing startup.
+    """
+    global _primary, _replicas, _limiter
+    with _pool_lock:
+        if _primary is not None:
+            return _primary.pool
+        primary = PoolNode("primary", _connection_kwargs(), minconn, maxconn)
+        primary.get_pool()
+        _replicas = [
+            PoolNode(f"replica{i}", _connection_kwargs(dsn), minconn, maxconn)
+            for i, dsn in enumerate(READ_DSNS, start=1)
+        ]
+        _primary = primary
+        # One worker thread per connection across the primary and the replicas
+        _limiter = CapacityLimiter(maxconn * (1 + len(_replicas)))
+    return _primary.pool
+
+
+def close_pool():
+    """
+    Close every pooled connection. Safe to call when no pool exists.
+    """
+    global _primary, _replicas, _limiter
+    with _pool_lock:
+        for node in [_primary, *_replicas]:
+            if node is not None:
+                node.close()
+        _primary = _limiter = None
+        _replicas = []
+
+
+def get_pool():
+    return _primary.pool if _primary is not None else init_pool()
+
+
+def _ping(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1;")
+        cursor.fetchone()
+    conn.rollback()
+
+
+def _is_healthy(conn):
+    """
+    Cheap liveness check that does not cost a round trip.
+    """
+    if conn.closed:
+        return False
+    return conn.get_transaction_status() != extensions.TRANSACTION_STATUS_UNKNOWN
+
+
+def check_pool_health():
+    """
+    Round-trip a connection from the pool. Returns True if the database answers.
+    """
+    try:
+        with pooled_connection() as conn:
+            _ping(conn)
+        return True
+    except (psycopg2.Error, pool.PoolError):
+        return False
+
+
+def _read_nodes():
+    """
+    Nodes to try for a read, in order: the available replicas starting from
+    the next one in the rotation, then the primary.
+    """
+    replicas = [node for node in _replicas if node.available()]
+    if replicas:
+        start = next(_next_replica) % len(replicas)
+        replicas = replicas[start:] + replicas[:start]
+    return [*replicas, _primary]
+
+
+def _checkout(node, start):
+    """
+    Take one of the node's slots and a healthy connection from its pool.
+    """
+    if not node.slots.acquire(timeout=POOL_TIMEOUT):
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        logger.warning("pool exhausted node=%s timeout_s=%.0f", node.name, POOL_TIMEOUT)
+        raise PoolTimeoutError(
+            f"No database connection available after {POOL_TIMEOUT:.0f} seconds."
+        )
+    try:
+        db_pool = node.get_pool()
+        conn = db_pool.getconn()
+        if not _is_healthy(conn):
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+    except BaseException:
+        node.slots.release()
+        raise
+    POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+    return db_pool, conn
+
+
+@contextmanager
+def pooled_connection(readonly=False):
+    """
+    Borrow a connection from the pool for the duration of the block.
+
+    With readonly=True the connection comes from a read replica when any is
+    configured and available. A replica that cannot be reached is marked down
+    and the next one (finally the primary) is tried. One that fails during the
+    block is marked down too and the error is raised.
+
+    Blocks for up to POOL_TIMEOUT seconds when every connection is in use,
+    replaces broken connections transparently and always ends the transaction
+    before the connection goes back to the pool.
+    """
+    global _in_use
+    get_pool()
+    start = time.perf_counter()
+    for node in _read_nodes() if readonly else [_primary]:
+        try:
+            db_pool, conn = _checkout(node, start)
+            break
+        except psycopg2.OperationalError as e:
+            if node is _primary:
+                raise
+            node.mark_down(e)
+    with _pool_lock:
+        _in_use += 1
+    try:
+        try:
+            yield conn
+        except psycopg2.OperationalError as e:
+            if node is not _primary and not _is_healthy(conn):
+                node.mark_down(e)
+            raise
+        finally:
+            # Read-only callers: release snapshot and locks. Also runs when a
+            # streaming generator holding the connection is closed early.
+            if not conn.closed:
+                conn.rollback()
+    finally:
+        db_pool.putconn(conn, close=not _is_healthy(conn))
+        with _pool_lock:
+            _in_use -= 1
+        node.slots.release()
+
+
+def stream_query(sql, params=None, batch_size=2000, name="api_stream"):
+    """
+    Yield the rows of `sql` in lists of up to `batch_size`, read through a
+    server-side (named) cursor so memory stays bounded however many rows match.
+
+    The pooled connection, from a read replica when there is one, is held until
+    the generator is exhausted or closed.
+    """
+    with pooled_connection(readonly=True) as conn, conn.cursor(name=name) as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+
+# ______________ Async path ______________#
+async def run_db(func, *args, **kwargs):
+    """
+    Run a blocking database function from async code without stalling the event loop.
+
+    Work is offloaded to a worker thread; concurrency is capped at the combined
+    size of the primary and replica pools so queued requests wait here rather
+    than exhausting them.
+    """
+    get_pool()
+    return await anyio.to_thread.run_sync(
+        partial(func, *args, **kwargs), limiter=_limiter
     )
+
+
+async def iterate_db(batches):
+    """
+    Async iterator over a blocking batch generator such as stream_query(), each
+    batch fetched in a worker thread under the same limit as run_db.
+
+    The generator is always closed, returning its connection to the pool, even
+    when the consumer stops early (e.g. the client disconnects).
+    """
+    try:
+        while True:
+            batch = await run_db(next, batches, None)
+            if batch is None:
+                break
+            yield batch
+    finally:
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(batches.close)
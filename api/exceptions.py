@@ -13,6 +13,13 @@ class EmptyQueryException(Exception):
         self.detail = detail
 
 
+class InvalidCursorException(Exception):
+    def __init__(
+        self, detail: str = "Cursor is malformed or belongs to another query."
+    ):
+        self.detail = detail
+
+
 async def not_found_handler(request: Request, exc: NotFoundException):
     return JSONResponse(
         status_code=404,
@@ -25,3 +32,28 @@ async def empty_query_handler(request: Request, exc: EmptyQueryException):
         status_code=422,
         content={"error": "Invalid Query", "detail": exc.detail},
     )
+
+
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorException):
+    return JSONResponse(
+        status_code=422,
+        content={"error": "Invalid Cursor", "detail": exc.detail},
+    )
+
+
+async def database_unavailable_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Service Unavailable", "detail": str(exc)},
+    )
+
+
+async def database_connection_handler(request: Request, exc: Exception):
+    # The driver's message names hosts and sockets; keep it out of the response
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error": "Service Unavailable",
+            "detail": "The database could not answer.",
+        },
+    )
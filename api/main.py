@@ -1,57 +1,282 @@
-from fastapi import FastAPI
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Optional
+import psycopg2
+from fastapi import FastAPI, Query, Request, Response
 from fastapi import Path
-from api.crud import get_top_products, get_channel_activity, search_messages
-from api.schemas import ObjectStat, ChannelActivity, MessageSearchResult, ChannelSlug
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from api.cache import cache_stats, cached_call
+from api.crud import (
+    DEFAULT_MODEL_VERSION,
+    get_top_products,
+    get_object_trends,
+    get_channel_activity,
+    search_messages,
+    stream_channel_activity,
+    stream_search_messages,
+)
+from api.database import (
+    PoolTimeoutError,
+    check_pool_health,
+    init_pool,
+    close_pool,
+    run_db,
+)
+from api.warehouse import WarehouseUnavailableError, close_warehouse, run_warehouse
+from api.metrics import MetricsMiddleware, render_metrics
+from api.pagination import encode_cursor, decode_cursor
+from api.responses import json_response
+from api.streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from api.schemas import (
+    ObjectStat,
+    ObjectTrend,
+    ChannelActivity,
+    MessageSearchResult,
+    ChannelSlug,
+    SearchMode,
+)
 from api.exceptions import (
     NotFoundException,
     EmptyQueryException,
+    InvalidCursorException,
     not_found_handler,
     empty_query_handler,
+    invalid_cursor_handler,
+    database_unavailable_handler,
+    database_connection_handler,
 )
 
+
+# ______________ Logging ______________#
+# The api.* loggers write key=value records at API_LOG_LEVEL; search patterns and
+# row counts are DEBUG, slow-query plans WARNING.
+def configure_logging(level=None):
+    logger = logging.getLogger("api")
+    logger.setLevel((level or os.getenv("API_LOG_LEVEL", "INFO")).upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+        )
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+# ______________ Lifespan ______________#
+# Warm the connection pool on startup and close it cleanly on shutdown.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    init_pool()
+    try:
+        yield
+    finally:
+        close_pool()
+        close_warehouse()
+
+
 # ______________ API Endpoints ______________#
 app = FastAPI(
     title="Telegram Medical Insights",
     description="API for analysing message and image data from Ethiopian health Telegram channels.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Register exception handlers
 app.add_exception_handler(NotFoundException, not_found_handler)
 app.add_exception_handler(EmptyQueryException, empty_query_handler)
+app.add_exception_handler(InvalidCursorException, invalid_cursor_handler)
+app.add_exception_handler(PoolTimeoutError, database_unavailable_handler)
+app.add_exception_handler(psycopg2.OperationalError, database_connection_handler)
+app.add_exception_handler(WarehouseUnavailableError, database_unavailable_handler)
+
+# Per-route latency, DB and serialization time, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
 
 
 # ______________ Get top products ______________#
 # This endpoint retrieves the top products based on mentions and confidence scores.
+# `model` picks which weights' detections to rank when several models are run.
+# Report responses are cached until the pipeline publishes a new data version.
 @app.get("/api/reports/top-products", response_model=list[ObjectStat])
-def read_top_products(limit: int = 10):
-    return get_top_products(limit)
+async def read_top_products(
+    request: Request,
+    response: Response,
+    limit: int = 10,
+    model: str = Query(DEFAULT_MODEL_VERSION, min_length=1, max_length=64),
+):
+    products = await cached_call(
+        request,
+        response,
+        "top_products",
+        (limit, model),
+        lambda: get_top_products(limit, model),
+    )
+    if isinstance(products, Response):
+        return products  # 304 Not Modified
+    return json_response(products, response)
+
+
+# ______________ Get object trends ______________#
+# This endpoint aggregates detections per month and object class over the whole
+# history, or a date range, from the Parquet export (API_PARQUET_ROOT). It is
+# answered with 503 when no export is configured.
+@app.get(
+    "/api/analytics/object-trends",
+    response_model=list[ObjectTrend],
+    tags=["Analytics"],
+)
+async def read_object_trends(
+    response: Response,
+    model: str = Query(DEFAULT_MODEL_VERSION, min_length=1, max_length=64),
+    channel_slug: Optional[ChannelSlug] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    trends = await run_warehouse(
+        get_object_trends,
+        model,
+        channel_slug.value if channel_slug else None,
+        date_from,
+        date_to,
+    )
+    return json_response(trends, response)
 
 
-# ______________ Get all channel slugs ______________#
-# This endpoint retrieves all distinct channel slugs from the database.
+# ______________ Get channel activity ______________#
+# This endpoint retrieves a channel's daily activity, oldest day first, optionally
+# limited to a date range. Pages are linked through the X-Next-Cursor header.
 @app.get(
     "/api/channels/{channel_slug}/activity",
     response_model=list[ChannelActivity],
     tags=["Channels"],
 )
-def read_channel_activity(channel_slug: ChannelSlug = Path(...)):
-    activities = get_channel_activity(channel_slug.value)
-    if not activities:
+async def read_channel_activity(
+    request: Request,
+    response: Response,
+    channel_slug: ChannelSlug = Path(...),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(365, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    kind = f"activity:{channel_slug.value}"
+    after = decode_cursor(cursor, kind) if cursor else None
+    page = await cached_call(
+        request,
+        response,
+        "channel_activity",
+        (channel_slug.value, date_from, date_to, limit, after),
+        lambda: get_channel_activity(
+            channel_slug.value, date_from, date_to, limit, after
+        ),
+    )
+    if isinstance(page, Response):
+        return page  # 304 Not Modified
+    activities, next_key = page
+    if not activities and after is None:
         raise NotFoundException(f"No activity found for channel: {channel_slug.value}")
-    return activities
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(kind, next_key)
+    return json_response(activities, response)
+
+
+# ______________ Export channel activity ______________#
+# This endpoint streams a channel's whole activity history as NDJSON.
+@app.get(
+    "/api/channels/{channel_slug}/activity/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+    tags=["Channels"],
+)
+async def export_channel_activity(
+    channel_slug: ChannelSlug = Path(...),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    return await ndjson_response(
+        stream_channel_activity(channel_slug.value, date_from, date_to)
+    )
 
 
 # ______________ Search messages ______________#
-# This endpoint allows searching for messages containing a specific query string.
+# This endpoint searches message text, either ranked full-text (mode=fts) or by
+# substring. Pages are linked through the opaque cursor in the X-Next-Cursor header.
 @app.get(
     "/api/search/messages", response_model=list[MessageSearchResult], tags=["Search"]
 )
-def read_search_messages(query: str):
+async def read_search_messages(
+    response: Response,
+    query: str,
+    mode: SearchMode = SearchMode.substring,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
     query = query.strip()
     if not query:
         raise EmptyQueryException()
-    results = search_messages(query)
-    if not results:
+    after = decode_cursor(cursor, f"search:{mode.value}") if cursor else None
+    results, next_key = await run_db(
+        search_messages, query, mode.value, limit, after, date_from, date_to
+    )
+    if not results and after is None:
         raise NotFoundException(f"No messages found containing: '{query}'")
-    return results
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            f"search:{mode.value}", next_key
+        )
+    return json_response(results, response)
+
+
+# ______________ Export search results ______________#
+# This endpoint streams every match of a search as NDJSON, in result order.
+@app.get(
+    "/api/search/messages/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+    tags=["Search"],
+)
+async def export_search_messages(
+    query: str,
+    mode: SearchMode = SearchMode.substring,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    query = query.strip()
+    if not query:
+        raise EmptyQueryException()
+    return await ndjson_response(
+        stream_search_messages(query, mode.value, date_from, date_to)
+    )
+
+
+# ______________ Cache statistics ______________#
+# This endpoint reports response cache hits and misses to monitor the hit ratio.
+@app.get("/api/cache/stats", tags=["Cache"])
+async def read_cache_stats():
+    return cache_stats()
+
+
+# ______________ Health ______________#
+# This endpoint round-trips a query on the primary for load balancer and
+# container health checks: 200 when it answers, 503 otherwise.
+@app.get("/health", tags=["Health"])
+async def read_health():
+    if await run_db(check_pool_health):
+        return {"status": "ok"}
+    return ORJSONResponse({"status": "unavailable"}, status_code=503)
+
+
+# ______________ Metrics ______________#
+# This endpoint exposes request, database and pool metrics for Prometheus to scrape.
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
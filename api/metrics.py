@@ -0,0 +1,182 @@
+# Request instrumentation and Prometheus metrics
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+# Latency buckets in seconds, from a cached response to a slow export
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_ENABLED = os.getenv("API_METRICS", "1") != "0"
+
+
+# ______________ Metric types ______________#
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, in the Prometheus text format.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for labels, (counts, count, total) in sorted(snapshot.items()):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _labels(self.label_names + ("le",), labels + (f"{bound:g}",))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.label_names + ("le",), labels + ("+Inf",))
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{base} {total:.6f}")
+            lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    A value read when metrics are scraped.
+    """
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.read()}",
+        ]
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+REQUEST_SECONDS = Histogram(
+    "api_request_duration_seconds",
+    "Time from request to the last byte of the response.",
+    ("method", "route", "status"),
+)
+DB_SECONDS = Histogram(
+    "api_db_duration_seconds",
+    "Time spent executing queries and fetching rows, per request.",
+    ("route",),
+)
+SERIALIZE_SECONDS = Histogram(
+    "api_serialize_duration_seconds",
+    "Time spent rendering response bodies, per request.",
+    ("route",),
+)
+POOL_WAIT_SECONDS = Histogram(
+    "api_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    (),
+)
+_registry = [REQUEST_SECONDS, DB_SECONDS, SERIALIZE_SECONDS, POOL_WAIT_SECONDS]
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ______________ Per-request timings ______________#
+class RequestTimings:
+    """
+    Time accumulated by one request. Worker threads started through run_db see
+    the same object, since anyio copies the context into them.
+    """
+
+    __slots__ = ("db", "serialize")
+
+    def __init__(self):
+        self.db = self.serialize = 0.0
+
+
+_timings = ContextVar("api_request_timings", default=None)
+
+
+def add_time(kind, seconds):
+    """
+    Add `seconds` of `kind` (db or serialize) to the current request.
+    """
+    timings = _timings.get()
+    if timings is not None:
+        setattr(timings, kind, getattr(timings, kind) + seconds)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route (the path template, so
+    /api/channels/{channel_slug}/activity is one series) until the response
+    body is complete, along with the request's DB and serialization time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"], route, str(status)
+            )
+            DB_SECONDS.observe(timings.db, route)
+            SERIALIZE_SECONDS.observe(timings.serialize, route)
@@ -0,0 +1,67 @@
+# Opaque keyset cursors for paginated endpoints
+import base64
+import binascii
+import json
+import math
+from datetime import date
+
+from api.exceptions import InvalidCursorException
+
+
+def encode_cursor(kind: str, key: list) -> str:
+    """
+    Encode the sort key of the last row on a page into an opaque cursor string.
+    """
+    payload = json.dumps({"k": kind, "v": key}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _date_key(value) -> date:
+    if not isinstance(value, str):
+        raise ValueError("date key must be an ISO date string")
+    return date.fromisoformat(value)
+
+
+def _number_key(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("rank key must be a number")
+    if not math.isfinite(value):
+        raise ValueError("rank key must be finite")
+    return float(value)
+
+
+def _check_key(kind: str, key):
+    """
+    Return the key in the shape its listing's SQL expects: a date_day for
+    channel activity, [rank or date_day, message_id] for search.
+    """
+    if kind.startswith("activity:"):
+        return _date_key(key)
+    if kind.startswith("search:"):
+        if not isinstance(key, list) or len(key) != 2:
+            raise ValueError("search key must be [sort_key, message_id]")
+        sort_key, message_id = key
+        if not isinstance(message_id, str):
+            raise ValueError("message_id must be a string")
+        if kind == "search:fts":
+            return [_number_key(sort_key), message_id]
+        return [_date_key(sort_key), message_id]
+    return key
+
+
+def decode_cursor(cursor: str, kind: str):
+    """
+    Decode a cursor produced by encode_cursor for the same kind of listing.
+    Cursors of another kind, or whose key has the wrong shape, are rejected
+    here rather than failing in the query.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursorException()
+    if not isinstance(payload, dict) or payload.get("k") != kind:
+        raise InvalidCursorException()
+    try:
+        return _check_key(kind, payload.get("v"))
+    except ValueError:
+        raise InvalidCursorException()
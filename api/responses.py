@@ -0,0 +1,23 @@
+# orjson responses for rows already shaped like the response schemas
+import time
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+from api.metrics import add_time
+
+
+def json_response(content, response: Response) -> ORJSONResponse:
+    """
+    Serialize `content` with orjson and return it as the response.
+
+    FastAPI does not validate a returned Response against the route's
+    response_model (which stays for the OpenAPI docs), so crud rows must
+    already match it. Headers set on the injected `response` (ETag,
+    X-Next-Cursor) are carried over, as FastAPI does for plain return values.
+    """
+    start = time.perf_counter()
+    rendered = ORJSONResponse(content)
+    add_time("serialize", time.perf_counter() - start)
+    rendered.headers.raw.extend(response.headers.raw)
+    return rendered
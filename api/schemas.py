@@ -16,6 +16,13 @@ class ChannelSlug(str, Enum):
     yetenaweg = "yetenaweg"
 
 
+# ______________ Search Modes ______________#
+# Enum for message search strategies: ranked full-text or substring matching.
+class SearchMode(str, Enum):
+    fts = "fts"
+    substring = "substring"
+
+
 # ______________ Object Statistics ______________#
 # This model represents the statistics of detected objects in images.
 class ObjectStat(BaseModel):
@@ -24,6 +31,15 @@ class ObjectStat(BaseModel):
     avg_confidence: float
 
 
+# ______________ Object Trends ______________#
+# This model represents one object class's detections in one month.
+class ObjectTrend(BaseModel):
+    date_month: date
+    object_class: str
+    count: int
+    avg_confidence: float
+
+
 # ______________ Product Statistics ______________#
 # This model represents the statistics of products mentioned in messages.
 class ProductStat(BaseModel):
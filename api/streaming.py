@@ -0,0 +1,40 @@
+# NDJSON streaming responses for bulk exports
+import time
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+from api.database import iterate_db
+from api.metrics import add_time
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_ndjson(rows) -> bytes:
+    start = time.perf_counter()
+    body = b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+    add_time("serialize", time.perf_counter() - start)
+    return body
+
+
+async def ndjson_response(batches) -> StreamingResponse:
+    """
+    Stream a blocking batch generator (see crud.stream_*) as NDJSON, one chunk
+    per batch.
+
+    The first batch is read before the response starts, so a pool timeout or a
+    failing query still gets a proper error status instead of a cut-off body.
+    """
+    stream = iterate_db(batches)
+    first = await anext(stream, None)
+
+    async def body():
+        try:
+            if first is not None:
+                yield encode_ndjson(first)
+            async for batch in stream:
+                yield encode_ndjson(batch)
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
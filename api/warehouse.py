@@ -0,0 +1,87 @@
+# DuckDB connector for the Parquet export (python -m scripts export)
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import anyio.to_thread
+from anyio import CapacityLimiter
+from dotenv import load_dotenv
+
+from api.metrics import add_time
+from scripts.parquet_export import open_duckdb
+
+load_dotenv()
+
+# Folder of the Parquet export; the analytics endpoints answer 503 while unset.
+# Queries run in an embedded DuckDB, so whole-history scans never reach Postgres.
+PARQUET_ROOT = os.getenv("API_PARQUET_ROOT")
+WAREHOUSE_THREADS = int(os.getenv("API_WAREHOUSE_THREADS", "2"))
+
+_duck = None
+_duck_lock = threading.Lock()
+_limiter = None
+
+
+class WarehouseUnavailableError(Exception):
+    """Raised when the Parquet export is not configured or lacks a table."""
+
+
+def _connection(tables):
+    """
+    Process-wide DuckDB connection with a view per exported table, reopened
+    when a table it lacks has been exported since.
+    """
+    global _duck
+    if not PARQUET_ROOT:
+        raise WarehouseUnavailableError("API_PARQUET_ROOT is not set.")
+    with _duck_lock:
+        for attempt in range(2):
+            if _duck is None:
+                _duck = open_duckdb(PARQUET_ROOT)
+            views = {row[0] for row in _duck.execute("SHOW TABLES;").fetchall()}
+            missing = set(tables) - views
+            if not missing:
+                return _duck
+            _duck.close()
+            _duck = None
+    raise WarehouseUnavailableError(
+        f"Parquet export has no {', '.join(sorted(missing))} yet."
+    )
+
+
+@contextmanager
+def warehouse_cursor(*tables):
+    """
+    DuckDB cursor for one query, after checking that `tables` are exported.
+    Query time counts towards the request's DB time.
+    """
+    cursor = _connection(tables).cursor()
+    start = time.perf_counter()
+    try:
+        yield cursor
+    finally:
+        add_time("db", time.perf_counter() - start)
+        cursor.close()
+
+
+def close_warehouse():
+    global _duck
+    with _duck_lock:
+        if _duck is not None:
+            _duck.close()
+            _duck = None
+
+
+async def run_warehouse(func, *args, **kwargs):
+    """
+    Run a blocking warehouse query in a worker thread, at most WAREHOUSE_THREADS
+    at a time so heavy scans cannot take every thread from the Postgres routes.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = CapacityLimiter(WAREHOUSE_THREADS)
+    return await anyio.to_thread.run_sync(
+        partial(func, *args, **kwargs), limiter=_limiter
+    )
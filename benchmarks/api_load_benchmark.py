@@ -0,0 +1,305 @@
+"""
+Load test for the API against a synthetic warehouse on a local Postgres.
+
+Starts the API with uvicorn on --database (seeded first with --messages, see
+benchmarks.synthetic_data) and runs scripted scenarios against it over HTTP,
+each for --requests requests from --concurrency threads. Every scenario
+reports:
+
+    throughput_rps, p50/p95/p99_ms   client-side, from benchmarks.common
+    db_cpu_ms_per_request            CPU time of the Postgres server processes
+    api_cpu_ms_per_request           CPU time of the API process
+    server_db_ms, server_serialize_ms
+                                     mean per request, from the API's /metrics
+
+Results are written to --output-dir as JSON named after the current commit, so
+runs on different commits can be compared with --compare.
+
+Usage:
+    python -m benchmarks.api_load_benchmark --messages 1000000
+    python -m benchmarks.api_load_benchmark --requests 500 --no-cache
+    python -m benchmarks.api_load_benchmark --compare old.json new.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta, timezone
+
+import psutil
+
+from benchmarks.common import CHANNELS, connect, create_database, run_concurrent
+from benchmarks.synthetic_data import PRODUCTS, seed
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+# ______________ Scenarios ______________#
+def activity_window(rng):
+    end = date.today() - timedelta(days=rng.randrange(0, 365))
+    start = end - timedelta(days=rng.choice([7, 30, 90, 365]))
+    return {"date_from": start.isoformat(), "date_to": end.isoformat()}
+
+
+# Each scenario returns a request path; parameters vary per request so the
+# response cache and the database see a realistic spread
+SCENARIOS = {
+    "top_products": lambda rng: "/api/reports/top-products?"
+    + urllib.parse.urlencode({"limit": rng.choice([5, 10, 20])}),
+    "channel_activity": lambda rng: f"/api/channels/{rng.choice(CHANNELS)}/activity?"
+    + urllib.parse.urlencode(activity_window(rng)),
+    "channel_activity_full": lambda rng: (
+        f"/api/channels/{rng.choice(CHANNELS)}/activity?limit=1000"
+    ),
+    "search_substring": lambda rng: "/api/search/messages?"
+    + urllib.parse.urlencode({"query": rng.choice(PRODUCTS), "limit": 50}),
+    "search_fts": lambda rng: "/api/search/messages?"
+    + urllib.parse.urlencode(
+        {"query": rng.choice(PRODUCTS), "mode": "fts", "limit": 50}
+    ),
+    "search_recent_range": lambda rng: "/api/search/messages?"
+    + urllib.parse.urlencode(
+        {
+            "query": rng.choice(PRODUCTS),
+            "date_from": (date.today() - timedelta(days=30)).isoformat(),
+            "limit": 50,
+        }
+    ),
+    "activity_export": lambda rng: (
+        f"/api/channels/{rng.choice(CHANNELS)}/activity/export"
+    ),
+}
+
+
+# ______________ Server ______________#
+def start_server(database, port, no_cache):
+    env = dict(os.environ, POSTGRES_DB=database, API_LOG_LEVEL="warning")
+    if no_cache:
+        env["API_CACHE_TTL"] = "0"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The API exited during startup.")
+        try:
+            urllib.request.urlopen(base_url + "/metrics").read()
+            return server, base_url
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("The API did not start within 30 seconds.")
+
+
+def postgres_cpu():
+    """
+    CPU seconds used so far by the Postgres server. Backends and parallel workers
+    that exit hand their time to the postmaster's children times, so the
+    difference of two totals covers them too.
+    """
+    total = None
+    for process in psutil.process_iter(["name", "cpu_times"]):
+        times = process.info["cpu_times"]
+        if process.info["name"] in ("postgres", "postmaster") and times is not None:
+            total = (total or 0.0) + (
+                times.user + times.system + times.children_user + times.children_system
+            )
+    return total
+
+
+def process_cpu(process):
+    times = process.cpu_times()
+    return times.user + times.system
+
+
+def server_metrics(base_url):
+    """
+    Per-route sums and counts of the API's DB and serialization histograms.
+    """
+    text = urllib.request.urlopen(base_url + "/metrics").read().decode("utf-8")
+    pattern = re.compile(
+        r'^api_(db|serialize)_duration_seconds_(sum|count)\{route="([^"]*)"\} (\S+)$'
+    )
+    metrics = {}
+    for line in text.splitlines():
+        match = pattern.match(line)
+        if match:
+            kind, field, route, value = match.groups()
+            metrics[(kind, field, route)] = float(value)
+    return metrics
+
+
+def route_of(path):
+    route = urllib.parse.urlparse(path).path
+    for channel in CHANNELS:
+        route = route.replace(f"/channels/{channel}/", "/channels/{channel_slug}/")
+    return route
+
+
+def run_scenario(name, base_url, args, api_process):
+    rng = random.Random(f"{args.seed}:{name}")
+    make_path = SCENARIOS[name]
+
+    def request():
+        with urllib.request.urlopen(base_url + make_path(rng)) as response:
+            response.read()
+
+    route = route_of(make_path(random.Random(0)))
+    before = server_metrics(base_url)
+    db_before, api_before = postgres_cpu(), process_cpu(api_process)
+    result = run_concurrent(request, args.concurrency, args.requests)
+    db_after, api_cpu = postgres_cpu(), process_cpu(api_process) - api_before
+    after = server_metrics(base_url)
+
+    requests = max(1, result["requests"])
+    # None when Postgres runs elsewhere (e.g. in a container) and is not visible
+    result["db_cpu_ms_per_request"] = (
+        round((db_after - db_before) * 1000 / requests, 3)
+        if db_after is not None
+        else None
+    )
+    result["api_cpu_ms_per_request"] = round(api_cpu * 1000 / requests, 3)
+    for kind in ("db", "serialize"):
+        total = after.get((kind, "sum", route), 0.0) - before.get(
+            (kind, "sum", route), 0.0
+        )
+        count = after.get((kind, "count", route), 0.0) - before.get(
+            (kind, "count", route), 0.0
+        )
+        result[f"server_{kind}_ms"] = round(total * 1000 / count, 3) if count else None
+    return result
+
+
+# ______________ Results ______________#
+def git_revision():
+    def git(*command):
+        return subprocess.run(
+            ["git", *command], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(
+        git("status", "--porcelain", "--untracked-files=no")
+    )
+
+
+def dataset_size(database):
+    conn = connect(database)
+    sizes = {}
+    with conn.cursor() as cursor:
+        for table in ("raw_marts.fct_messages", "enriched.fct_image_detections"):
+            cursor.execute(f"SELECT count(*) FROM {table};")
+            sizes[table] = cursor.fetchone()[0]
+    conn.close()
+    return sizes
+
+
+def compare(old_path, new_path):
+    """
+    Side by side p50/p95/p99 and throughput of two result files.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    report = {"old": old["commit"], "new": new["commit"], "scenarios": {}}
+    for name, after in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if before is None:
+            continue
+        report["scenarios"][name] = {
+            key: {
+                "old": before[key],
+                "new": after[key],
+                "change_pct": (
+                    round((after[key] - before[key]) * 100 / before[key], 1)
+                    if before[key]
+                    else None
+                ),
+            }
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default="api_benchmark")
+    parser.add_argument(
+        "--messages", type=int, help="Seed the database with this many messages first"
+    )
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Expire cached reports immediately"
+    )
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        sys.exit(0)
+
+    create_database(args.database)
+    if args.messages:
+        conn = connect(args.database)
+        print(json.dumps(seed(conn, args.messages)), file=sys.stderr)
+        conn.close()
+
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": dataset_size(args.database),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    server, base_url = start_server(args.database, args.port, args.no_cache)
+    try:
+        api_process = psutil.Process(server.pid)
+        for name in args.scenarios:
+            report["scenarios"][name] = run_scenario(name, base_url, args, api_process)
+            print(f"{name}: {json.dumps(report['scenarios'][name])}", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    suffix = "-dirty" if dirty else ""
+    stamp = report["started_at"].replace(":", "").replace("-", "")[:15]
+    path = os.path.join(args.output_dir, f"{stamp}-{commit}{suffix}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Saved {path}", file=sys.stderr)
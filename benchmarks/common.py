@@ -0,0 +1,104 @@
+# Shared timing and scratch-database helpers for the benchmark scripts
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHANNELS = [
+    "CheMed123",
+    "lobelia4cosmetics",
+    "newoptics",
+    "ethiopianfoodanddrugauthority",
+    "tikvahpharma",
+    "yetenaweg",
+]
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of samples (pct in 0-100).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarise(latencies, elapsed, errors=0):
+    """
+    Summarise per-request latencies (seconds) over a wall-clock window.
+    """
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run_concurrent(func, concurrency, requests):
+    """
+    Call `func()` `requests` times from `concurrency` threads and time each call.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            start = time.perf_counter()
+            try:
+                func()
+            except Exception:
+                with lock:
+                    errors += 1
+                continue
+            duration = time.perf_counter() - start
+            with lock:
+                latencies.append(duration)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return summarise(latencies, time.perf_counter() - start, errors)
+
+
+def connect(dbname):
+    return psycopg2.connect(
+        dbname=dbname,
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+    )
+
+
+def create_database(name):
+    """
+    Create a scratch database, refusing the ones the pipeline and API use.
+    """
+    if name in (os.getenv("POSTGRES_DB"), os.getenv("POSTGRES_DB_TEST")):
+        raise SystemExit(f"Refusing to overwrite {name}; pick a scratch database.")
+    conn = connect(os.getenv("POSTGRES_DB") or "postgres")
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (name,))
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE DATABASE "{name}";')
+    conn.close()
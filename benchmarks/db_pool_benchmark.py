@@ -0,0 +1,89 @@
+"""
+Load benchmark for the API database layer: per-request connections vs the pool.
+
+Direct mode runs the api.crud queries against a local Postgres from a thread pool
+(mirroring how FastAPI serves requests) twice: once opening a fresh connection per
+call, as the API did before pooling, and once through api.database's pool.
+
+HTTP mode hits a running API instead, so the same command can be pointed at a
+server started from an older commit to compare end-to-end numbers.
+
+Usage:
+    python -m benchmarks.db_pool_benchmark --concurrency 16 --requests 2000
+    python -m benchmarks.db_pool_benchmark --url http://localhost:8000
+"""
+
+import argparse
+import json
+import urllib.request
+from contextlib import contextmanager
+
+from api import crud, database
+from benchmarks.common import run_concurrent
+
+ENDPOINTS = {
+    "top_products": (
+        lambda: crud.get_top_products(10),
+        "/api/reports/top-products?limit=10",
+    ),
+    "channel_activity": (
+        lambda: crud.get_channel_activity("CheMed123"),
+        "/api/channels/CheMed123/activity",
+    ),
+    "search_messages": (
+        lambda: crud.search_messages("vitamin"),
+        "/api/search/messages?query=vitamin",
+    ),
+}
+
+
+@contextmanager
+def unpooled_connection(readonly=False):
+    # The pre-pool behaviour: connect, run one query, disconnect
+    conn = database.get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def bench_direct(concurrency, requests):
+    results = {}
+    for label, factory in (
+        ("per_request_connection", unpooled_connection),
+        ("pooled", database.pooled_connection),
+    ):
+        crud.pooled_connection = factory
+        if label == "pooled":
+            database.init_pool(maxconn=max(concurrency, database.POOL_MAX_SIZE))
+        for name, (call, _) in ENDPOINTS.items():
+            results.setdefault(name, {})[label] = run_concurrent(
+                call, concurrency, requests
+            )
+    database.close_pool()
+    return results
+
+
+def bench_http(base_url, concurrency, requests):
+    def fetch(path):
+        with urllib.request.urlopen(base_url.rstrip("/") + path) as response:
+            response.read()
+
+    return {
+        name: run_concurrent(lambda path=path: fetch(path), concurrency, requests)
+        for name, (_, path) in ENDPOINTS.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--url", help="Benchmark a running API over HTTP instead")
+    args = parser.parse_args()
+
+    if args.url:
+        report = bench_http(args.url, args.concurrency, args.requests)
+    else:
+        report = bench_direct(args.concurrency, args.requests)
+    print(json.dumps(report, indent=2))
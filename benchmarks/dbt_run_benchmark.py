@@ -0,0 +1,202 @@
+"""
+dbt run duration benchmark: full rebuild vs incremental merge of the facts.
+
+Fills a scratch database with a synthetic raw.telegram_messages table (and
+matching enriched.fct_image_detections rows), then times three dbt runs:
+
+    full_refresh  `dbt run --full-refresh`, what every run cost with table facts
+    no_changes    `dbt run` right after, nothing new to merge
+    delta         `dbt run` after --delta-rows messages were added or re-loaded
+
+dbt is pointed at the scratch database through a throwaway profiles.yml built
+from the POSTGRES_* variables, so real data is never touched.
+
+Usage:
+    python -m benchmarks.dbt_run_benchmark --rows 2000000 --delta-rows 10000
+    python -m benchmarks.dbt_run_benchmark --exclude fct_message_search
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from benchmarks.common import CHANNELS, connect, create_database
+
+PROJECT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "medical_insights")
+)
+
+
+def seed(conn, rows):
+    """
+    Replace the raw tables with `rows` synthetic messages spread over six
+    channels and roughly two years; every third message gets two detections.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            CREATE SCHEMA IF NOT EXISTS raw;
+            CREATE SCHEMA IF NOT EXISTS enriched;
+            DROP TABLE IF EXISTS raw.telegram_messages CASCADE;
+            DROP TABLE IF EXISTS enriched.fct_image_detections CASCADE;
+            DROP TABLE IF EXISTS enriched.detection_deletions;
+            CREATE TABLE raw.telegram_messages (
+                channel_title TEXT,
+                channel_username TEXT NOT NULL,
+                id BIGINT NOT NULL,
+                text TEXT,
+                date TIMESTAMP,
+                views INTEGER,
+                media_type TEXT,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (channel_username, id)
+            );
+            CREATE INDEX telegram_messages_loaded_at_idx
+                ON raw.telegram_messages (loaded_at);
+            CREATE TABLE enriched.fct_image_detections (
+                detection_id TEXT PRIMARY KEY,
+                message_id TEXT NOT NULL,
+                model_version TEXT NOT NULL DEFAULT 'yolov8n',
+                detected_object TEXT,
+                confidence_score FLOAT,
+                bbox JSONB,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX fct_image_detections_loaded_at_idx
+                ON enriched.fct_image_detections (loaded_at);
+            CREATE TABLE enriched.detection_deletions (
+                message_id TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """
+        )
+        insert_messages(cursor, 1, rows // len(CHANNELS))
+        insert_detections(cursor, 1, rows // len(CHANNELS))
+    conn.commit()
+
+
+def insert_messages(cursor, first_id, last_id):
+    cursor.execute(
+        """
+        INSERT INTO raw.telegram_messages
+            (channel_title, channel_username, id, text, date, views, media_type)
+        SELECT 'Channel ' || ch, '@' || ch, g,
+               'Synthetic message ' || g || ' paracetamol vitamin C 500mg',
+               timestamp '2024-01-01' + g * interval '2 minutes',
+               g %% 5000,
+               CASE WHEN g %% 3 = 0 THEN 'photo' END
+        FROM generate_series(%s, %s) g, unnest(%s::text[]) ch;
+    """,
+        (first_id, last_id, CHANNELS),
+    )
+
+
+def insert_detections(cursor, first_id, last_id):
+    cursor.execute(
+        """
+        INSERT INTO enriched.fct_image_detections
+            (detection_id, message_id, detected_object, confidence_score, bbox)
+        SELECT md5(ch || '_' || g || '/' || k), ch || '_' || g,
+               (ARRAY['bottle', 'person', 'cup', 'cell phone'])[1 + (g + k) %% 4],
+               0.3 + ((g * 7 + k) %% 70) / 100.0,
+               '[0, 0, 100, 100]'
+        FROM generate_series(%s, %s) g, unnest(%s::text[]) ch,
+             generate_series(1, 2) k
+        WHERE g %% 3 = 0;
+    """,
+        (first_id, last_id, CHANNELS),
+    )
+
+
+def apply_delta(conn, rows, delta_rows):
+    """
+    Half the delta re-loads existing messages (new view counts), half are new
+    messages with their detections.
+    """
+    per_channel = max(1, delta_rows // (2 * len(CHANNELS)))
+    last_id = rows // len(CHANNELS)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE raw.telegram_messages
+            SET views = views + 1, loaded_at = now()
+            WHERE id %% %s = 0;
+        """,
+            (max(1, last_id // per_channel),),
+        )
+        insert_messages(cursor, last_id + 1, last_id + per_channel)
+        insert_detections(cursor, last_id + 1, last_id + per_channel)
+    conn.commit()
+
+
+def write_profile(directory, database):
+    """
+    profiles.yml for the scratch database (JSON is valid YAML).
+    """
+    output = {
+        "type": "postgres",
+        "host": os.getenv("POSTGRES_HOST") or "localhost",
+        "port": int(os.getenv("POSTGRES_PORT") or 5432),
+        "user": os.getenv("POSTGRES_USER") or "postgres",
+        "password": os.getenv("POSTGRES_PASSWORD") or "",
+        "dbname": database,
+        "schema": "raw",
+        "threads": 4,
+    }
+    profile = {"medical_insights": {"target": "bench", "outputs": {"bench": output}}}
+    with open(os.path.join(directory, "profiles.yml"), "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def dbt_run(args, profiles_dir, *extra):
+    command = [
+        args.dbt,
+        "run",
+        "--project-dir",
+        args.project_dir,
+        "--profiles-dir",
+        profiles_dir,
+        *extra,
+    ]
+    if args.exclude:
+        command += ["--exclude", *args.exclude]
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"dbt run failed:\n{result.stdout}\n{result.stderr}")
+    return round(elapsed, 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--delta-rows", type=int, default=10_000)
+    parser.add_argument("--database", default="dbt_benchmark")
+    parser.add_argument("--dbt", default="dbt", help="dbt executable")
+    parser.add_argument("--project-dir", default=PROJECT_DIR)
+    parser.add_argument("--exclude", nargs="*", help="Models to leave out")
+    args = parser.parse_args()
+
+    create_database(args.database)
+    conn = connect(args.database)
+    start = time.perf_counter()
+    seed(conn, args.rows)
+    report = {
+        "rows": args.rows,
+        "delta_rows": args.delta_rows,
+        "seed_s": round(time.perf_counter() - start, 2),
+    }
+
+    with tempfile.TemporaryDirectory() as profiles_dir:
+        write_profile(profiles_dir, args.database)
+        report["full_refresh_s"] = dbt_run(args, profiles_dir, "--full-refresh")
+        report["no_changes_s"] = dbt_run(args, profiles_dir)
+        apply_delta(conn, args.rows, args.delta_rows)
+        report["delta_s"] = dbt_run(args, profiles_dir)
+    conn.close()
+    print(json.dumps(report, indent=2))
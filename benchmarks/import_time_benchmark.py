@@ -0,0 +1,127 @@
+"""
+Startup benchmark: import time of the pipeline scripts, the CLI and the API.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+(median of --repeat runs). The report lists the cumulative import time, the
+heaviest direct imports, and any heavy dependency (torch, ultralytics,
+telethon, cv2) pulled in at import time. The scripts must import none of those;
+they load them lazily when a command needs them.
+
+Exits with status 1 when a module exceeds --budget-ms or imports a heavy
+dependency, so it can guard against startup regressions.
+
+Usage:
+    python -m benchmarks.import_time_benchmark
+    python -m benchmarks.import_time_benchmark --budget-ms 300 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODULES = [
+    "scripts.__main__",
+    "scripts._01_data_scraper",
+    "scripts._02_data_loader",
+    "scripts._03_data_enricher",
+    "scripts._03_enriched_data_loader",
+    "api.main",
+]
+# Only ever imported lazily by the scripts
+HEAVY = ("torch", "ultralytics", "telethon", "cv2")
+# The API needs FastAPI and pydantic at import; it is measured but not held to
+# the scripts' rules
+LAZY_REQUIRED = ("scripts.",)
+
+
+def import_times(module):
+    """
+    Parse `-X importtime` output into (module name, cumulative us, depth) rows,
+    in the order the imports finished.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: <self us> | <cumulative us> | <indented module name>
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(cumulative), depth))
+    return rows
+
+
+def direct_imports(rows, module):
+    """
+    What `module` imported itself: a module's imports are listed right before
+    it, one level deeper.
+    """
+    index = next(i for i, row in enumerate(rows) if row[0] == module)
+    depth = rows[index][2]
+    children = []
+    for name, cumulative, child_depth in reversed(rows[:index]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1:
+            children.append((name, cumulative))
+    return sorted(children, key=lambda item: item[1], reverse=True)
+
+
+def measure(module, repeat):
+    runs = [import_times(module) for _ in range(repeat)]
+    total_us = statistics.median(
+        next(us for name, us, _ in run if name == module) for run in runs
+    )
+    last = runs[-1]
+    return {
+        "cumulative_ms": round(total_us / 1000, 1),
+        "heaviest_imports_ms": {
+            name: round(us / 1000, 1) for name, us in direct_imports(last, module)[:5]
+        },
+        "heavy_dependencies": sorted({name for name, _, _ in last if name in HEAVY}),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=500.0,
+        help="Fail when a module takes longer than this to import",
+    )
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    report = {}
+    failures = []
+    for module in args.modules:
+        try:
+            report[module] = measure(module, args.repeat)
+        except RuntimeError as e:
+            report[module] = {"error": str(e)}
+            failures.append(f"{module}: {e}")
+            continue
+        if report[module]["cumulative_ms"] > args.budget_ms:
+            failures.append(f"{module}: over the {args.budget_ms:.0f} ms budget")
+        if module.startswith(LAZY_REQUIRED) and report[module]["heavy_dependencies"]:
+            failures.append(
+                f"{module}: imports {', '.join(report[module]['heavy_dependencies'])}"
+            )
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
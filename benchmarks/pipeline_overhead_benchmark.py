@@ -0,0 +1,190 @@
+"""
+Per-stage overhead of running the pipeline scripts as subprocesses versus
+calling them in-process from the Dagster ops.
+
+Measured directly (median of --repeat runs):
+    interpreter_s       bare `python -c pass`
+    import_s[stage]     importing each script module in a fresh interpreter
+    dotenv_s            re-reading .env
+    connect_s           opening a new Postgres connection
+    pool_checkout_s     checking a connection out of a warm pool
+    model_load_s        loading the YOLO weights (when ultralytics is installed)
+    loader_noop_*       the raw loader on an empty day, as a subprocess and as an
+                        in-process call with a pooled connection
+
+These are combined into the overhead of one run over --channels channels
+(four script ops per channel) for: subprocess ops (the old pipeline), in-process
+ops under the multiprocess executor (one op per process, each importing its
+script and opening one connection) and the in_process executor (imports,
+connection and model shared by every op).
+
+Usage:
+    python -m benchmarks.pipeline_overhead_benchmark --channels 5 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2 import pool
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SCRIPTS_DIR = os.path.join(REPO_ROOT, "scripts")
+ENV_PATH = os.path.join(REPO_ROOT, ".env")
+STAGES = {
+    "scrape": "scripts._01_data_scraper",
+    "load": "scripts._02_data_loader",
+    "enrich": "scripts._03_data_enricher",
+    "load_detections": "scripts._03_enriched_data_loader",
+}
+DB_STAGES = ("load", "enrich", "load_detections")
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def run_python(*args, cwd=REPO_ROOT):
+    result = subprocess.run(
+        [sys.executable, *args], cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+
+def connect_kwargs():
+    return dict(
+        dbname=os.getenv("POSTGRES_DB_TEST"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+    )
+
+
+def measure(repeat, model_path):
+    report = {"interpreter_s": timed(lambda: run_python("-c", "pass"), repeat)}
+
+    report["import_s"] = {}
+    for stage, module in STAGES.items():
+        try:
+            total = timed(lambda: run_python("-c", f"import {module}"), repeat)
+            report["import_s"][stage] = max(0.0, total - report["interpreter_s"])
+        except RuntimeError as e:
+            report["import_s"][stage] = None
+            print(f"Skipping {stage}: {e}", file=sys.stderr)
+
+    report["dotenv_s"] = timed(lambda: load_dotenv(ENV_PATH), repeat)
+    load_dotenv(ENV_PATH)
+    report["connect_s"] = timed(
+        lambda: psycopg2.connect(**connect_kwargs()).close(), repeat
+    )
+    warm_pool = pool.ThreadedConnectionPool(1, 2, **connect_kwargs())
+
+    def checkout():
+        warm_pool.putconn(warm_pool.getconn())
+
+    report["pool_checkout_s"] = timed(checkout, repeat)
+
+    report["model_load_s"] = None
+    if report["import_s"]["enrich"] is not None:
+        from ultralytics import YOLO
+
+        report["model_load_s"] = timed(lambda: YOLO(model_path), repeat)
+
+    # One stage end to end with nothing to load: all that is left is overhead
+    day = "1900-01-01"
+    report["loader_noop_subprocess_s"] = timed(
+        lambda: run_python(
+            "_02_data_loader.py", "--test", "--date", day, cwd=SCRIPTS_DIR
+        ),
+        repeat,
+    )
+    sys.path.insert(0, REPO_ROOT)
+    from scripts import _02_data_loader as loader
+
+    def in_process():
+        conn = warm_pool.getconn()
+        try:
+            loader.load_telegram_messages(test_mode=True, day=day, conn=conn)
+        finally:
+            conn.rollback()
+            warm_pool.putconn(conn)
+
+    report["loader_noop_in_process_s"] = timed(in_process, repeat)
+    warm_pool.closeall()
+    return report
+
+
+def run_overhead(m, channels):
+    """
+    Startup overhead of one run, in seconds, for each way of executing the ops.
+    """
+    stages = [s for s in STAGES if m["import_s"][s] is not None]
+    model = m["model_load_s"] or 0.0
+
+    def per_op(stage, interpreter, dotenv, connect):
+        cost = interpreter + m["import_s"][stage] + dotenv
+        if stage in DB_STAGES:
+            cost += connect
+        if stage == "enrich":
+            cost += model
+        return cost
+
+    subprocess_ops = channels * sum(
+        per_op(s, m["interpreter_s"], m["dotenv_s"], m["connect_s"]) for s in stages
+    )
+    multiprocess = channels * sum(per_op(s, 0.0, 0.0, m["connect_s"]) for s in stages)
+    in_process = (
+        sum(m["import_s"][s] for s in stages)
+        + m["connect_s"]
+        + channels * len([s for s in stages if s in DB_STAGES]) * m["pool_checkout_s"]
+        + (model if "enrich" in stages else 0.0)
+    )
+    return {
+        "stages_measured": stages,
+        "subprocess_ops_s": round(subprocess_ops, 3),
+        "in_process_ops_multiprocess_executor_s": round(multiprocess, 3),
+        "in_process_executor_s": round(in_process, 3),
+        "saved_multiprocess_executor_s": round(subprocess_ops - multiprocess, 3),
+        "saved_in_process_executor_s": round(subprocess_ops - in_process, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--model", default="yolov8n.pt")
+    args = parser.parse_args()
+
+    measured = measure(args.repeat, args.model)
+    rounded = {
+        key: (
+            {k: round(v, 4) if v is not None else None for k, v in value.items()}
+            if isinstance(value, dict)
+            else round(value, 4) if value is not None else None
+        )
+        for key, value in measured.items()
+    }
+    print(
+        json.dumps(
+            {
+                "measured": rounded,
+                "per_run": run_overhead(measured, args.channels),
+                "channels": args.channels,
+            },
+            indent=2,
+        )
+    )
@@ -0,0 +1,113 @@
+"""
+Cost of preparing model inputs: decoding and letterboxing JPEGs against reading
+letterboxed images back from the tensor cache's memory-mapped shards.
+
+Synthetic photos at typical Telegram sizes are written to a temporary image
+store. Each image is then prepared twice (median of --repeat passes):
+    decode   cv2.imread + letterbox, what every enrichment run did before
+    mmap     TensorCache.get on a warm cache, as repeat runs and A/B runs of
+             other weights at the same input size do
+
+Usage:
+    python -m benchmarks.preprocess_benchmark --images 500
+    python -m benchmarks.preprocess_benchmark --images 200 --imgsz 1280
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from scripts.image_store import ImageStore
+from scripts.tensor_cache import TensorCache, letterbox
+
+SIZES = [(1280, 1280), (1280, 960), (960, 1280), (1280, 720), (800, 800)]
+
+
+def synthetic_photo(rng, width, height):
+    """
+    A noisy JPEG with a few shapes, so it compresses like a photo.
+    """
+    image = np.random.default_rng(rng.randrange(1 << 30)).integers(
+        0, 255, (height, width, 3), dtype=np.uint8
+    )
+    for _ in range(6):
+        x, y = rng.randrange(width), rng.randrange(height)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        cv2.circle(image, (x, y), rng.randrange(40, 300), color, -1)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+
+
+def median_seconds(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ImageStore(os.path.join(tmp, "images"), near_distance=None)
+        digests = [
+            store.put(synthetic_photo(rng, *rng.choice(SIZES)))
+            for _ in range(args.images)
+        ]
+        cache = TensorCache(os.path.join(tmp, "tensor_cache"), args.imgsz)
+
+        def decode():
+            for sha256 in digests:
+                letterbox(cv2.imread(store.path(sha256), cv2.IMREAD_COLOR), args.imgsz)
+
+        for sha256 in digests:
+            cache.add(
+                sha256,
+                *letterbox(
+                    cv2.imread(store.path(sha256), cv2.IMREAD_COLOR), args.imgsz
+                ),
+            )
+        cache.flush()
+
+        def mmap():
+            for sha256 in digests:
+                # copy, as stacking a batch for the model does
+                np.array(cache.get(sha256)[0])
+
+        decode_s = median_seconds(decode, args.repeat)
+        mmap_s = median_seconds(mmap, args.repeat)
+        jpeg_bytes = store.stats()["stored_bytes"]
+        shard_bytes = sum(
+            os.path.getsize(os.path.join(cache.directory, name))
+            for name in os.listdir(cache.directory)
+        )
+        cache.close()
+        store.close()
+
+    print(
+        json.dumps(
+            {
+                "images": args.images,
+                "imgsz": args.imgsz,
+                "decode_images_per_s": round(args.images / decode_s, 1),
+                "mmap_images_per_s": round(args.images / mmap_s, 1),
+                "speedup": round(decode_s / mmap_s, 1),
+                "jpeg_mb": round(jpeg_bytes / 1e6, 1),
+                "shard_mb": round(shard_bytes / 1e6, 1),
+            },
+            indent=2,
+        )
+    )
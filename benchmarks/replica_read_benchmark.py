@@ -0,0 +1,193 @@
+"""
+Read throughput of the API queries while a full reload runs on the primary,
+with reads served by the primary or routed to a read replica.
+
+A load thread repeats what `load --mode full` does to the primary: copy a large
+table into a staging table, index it and swap it in. It works in a scratch
+schema (replica_benchmark), so the tables the API reads are left alone. The
+api.crud queries run from a thread pool in three scenarios:
+    primary_idle        no load, reads on the primary (the baseline)
+    primary_under_load  load running, reads on the primary (the old behaviour)
+    replica_under_load  load running, reads routed with POSTGRES_READ_DSNS
+Each scenario reads for --duration seconds and reports read throughput and
+latency, failed reads (on a replica, e.g. queries cancelled by replay), the
+reloads finished meanwhile and, with a replica, how far (in WAL bytes) replay
+lagged at the end.
+
+Both servers need the benchmark database, e.g. a streaming replica of a primary
+filled by benchmarks.synthetic_data:
+    pg_basebackup -h <primary> -D /tmp/replica -R -X stream
+    pg_ctl -D /tmp/replica -o "-p 5433" start
+
+Usage:
+    python -m benchmarks.replica_read_benchmark --replica "host=localhost port=5433"
+    python -m benchmarks.replica_read_benchmark --replica "port=5433" --load-workers 2
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from api import crud, database
+from benchmarks.common import connect, run_concurrent, summarise
+from benchmarks.db_pool_benchmark import ENDPOINTS
+
+LOAD_SCHEMA = "replica_benchmark"
+
+
+def read_for(seconds, concurrency):
+    """
+    Run the API queries in turn from `concurrency` threads for `seconds` and
+    time each call. A fixed duration, rather than a request count, keeps the
+    reads overlapping the reloads however fast either side is.
+    """
+    calls = [call for call, _ in ENDPOINTS.values()]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(offset):
+        nonlocal errors
+        index = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                calls[index % len(calls)]()
+            except psycopg2.Error:
+                with lock:
+                    errors += 1
+                continue
+            finally:
+                index += 1
+            duration = time.perf_counter() - start
+            with lock:
+                latencies.append(duration)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for offset in range(concurrency):
+            executor.submit(worker, offset)
+    return summarise(latencies, time.perf_counter() - start, errors)
+
+
+def reload_loop(dbname, worker, stop, done):
+    """
+    Rebuild a copy of fct_messages in a staging table and swap it in, until
+    `stop` is set. Each finished swap is counted in done[worker].
+    """
+    table = f"{LOAD_SCHEMA}.messages_{worker}"
+    conn = connect(dbname)
+    try:
+        with conn.cursor() as cursor:
+            while not stop.is_set():
+                cursor.execute(
+                    f"""
+                    DROP TABLE IF EXISTS {table}_staging;
+                    CREATE TABLE {table}_staging AS
+                        SELECT * FROM raw_marts.fct_messages;
+                    CREATE INDEX ON {table}_staging (channel_slug, date_day);
+                    DROP TABLE IF EXISTS {table};
+                    ALTER TABLE {table}_staging RENAME TO messages_{worker};
+                """
+                )
+                conn.commit()
+                done[worker] += 1
+            cursor.execute(f"DROP TABLE IF EXISTS {table}, {table}_staging;")
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def replica_lag_bytes(dbname, replica_dsn):
+    """
+    WAL bytes the replica has received but not replayed yet, plus those the
+    primary has written but not sent.
+    """
+    primary = connect(dbname)
+    replica = psycopg2.connect(**database._connection_kwargs(replica_dsn))
+    try:
+        with primary.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn();")
+            current = cursor.fetchone()[0]
+        with replica.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_wal_lsn_diff(%s, pg_last_wal_replay_lsn())::bigint;",
+                (current,),
+            )
+            return cursor.fetchone()[0]
+    finally:
+        primary.close()
+        replica.close()
+
+
+def run_scenario(args, replica_dsn, load_workers):
+    database.READ_DSNS = [replica_dsn] if replica_dsn else []
+    database.init_pool(maxconn=max(args.concurrency, database.POOL_MAX_SIZE))
+    stop = threading.Event()
+    done = [0] * load_workers
+    loaders = [
+        threading.Thread(
+            target=reload_loop, args=(args.database, worker, stop, done), daemon=True
+        )
+        for worker in range(load_workers)
+    ]
+    try:
+        for loader in loaders:
+            loader.start()
+        report = read_for(args.duration, args.concurrency)
+        report["reloads_finished"] = sum(done)
+        if replica_dsn:
+            report["replica_lag_bytes"] = replica_lag_bytes(args.database, replica_dsn)
+    finally:
+        stop.set()
+        for loader in loaders:
+            loader.join()
+        database.close_pool()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--replica",
+        required=True,
+        help="libpq connection string of the replica, as in POSTGRES_READ_DSNS",
+    )
+    parser.add_argument("--database", default="api_benchmark")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--duration", type=float, default=30.0, help="Seconds of reads per scenario"
+    )
+    parser.add_argument("--load-workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # api.database reads the database name when it opens connections
+    os.environ["POSTGRES_DB"] = args.database
+    conn = connect(args.database)
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {LOAD_SCHEMA};")
+    conn.commit()
+    conn.close()
+
+    # Warm both servers' caches so the first scenario is not penalised
+    for replica_dsn in (None, args.replica):
+        database.READ_DSNS = [replica_dsn] if replica_dsn else []
+        database.init_pool()
+        for call, _ in ENDPOINTS.values():
+            run_concurrent(call, args.concurrency, 10)
+        database.close_pool()
+
+    report = {
+        "concurrency": args.concurrency,
+        "load_workers": args.load_workers,
+        "primary_idle": run_scenario(args, None, 0),
+        "primary_under_load": run_scenario(args, None, args.load_workers),
+        "replica_under_load": run_scenario(args, args.replica, args.load_workers),
+    }
+    print(json.dumps(report, indent=2))
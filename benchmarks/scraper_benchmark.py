@@ -0,0 +1,219 @@
+"""
+Throughput benchmark for the Telegram scraper scheduler against a fake client.
+
+FakeTelegramClient serves synthetic channels with a fixed latency per history
+page and per photo download, and can inject FloodWait errors. The scraper runs
+twice: sequentially with inline downloads (the old behaviour) and concurrently
+with the download worker pool. Each run scrapes every channel from scratch and
+then again after a few new posts, resuming from the saved checkpoints. Each
+pass reports messages/sec, requests made, the peak number of channels and
+downloads in flight, and the most requests seen in any one second against the
+configured budget. With --distinct-photos the channels repost a small set of
+photos, and only the first copy of each should be downloaded.
+
+Usage:
+    python -m benchmarks.scraper_benchmark --channels 6 --messages 300
+    python -m benchmarks.scraper_benchmark --flood-every 20
+    python -m benchmarks.scraper_benchmark --distinct-photos 40
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import zlib
+from bisect import bisect_right
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from telethon.errors import FloodWaitError
+
+from scripts import _01_data_scraper as scraper
+
+
+class FakeTelegramClient:
+    def __init__(
+        self,
+        messages_per_channel,
+        page_latency=0.05,
+        download_latency=0.05,
+        photo_ratio=0.5,
+        flood_every=0,
+        flood_seconds=1,
+        distinct_photos=0,
+    ):
+        self.messages_per_channel = messages_per_channel
+        self.page_latency = page_latency
+        self.download_latency = download_latency
+        self.photo_every = max(1, round(1 / photo_ratio)) if photo_ratio else 0
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.distinct_photos = distinct_photos
+        self.request_times = []
+        self.downloads = 0
+        self.floods = 0
+        self.active_channels = self.peak_channels = 0
+        self.active_downloads = self.peak_downloads = 0
+
+    def _request(self):
+        self.request_times.append(time.monotonic())
+        if self.flood_every and len(self.request_times) % self.flood_every == 0:
+            self.floods += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    async def get_entity(self, username):
+        self._request()
+        await asyncio.sleep(self.page_latency)
+        return SimpleNamespace(title=f"Fake {username}", username=username)
+
+    def _message(self, entity, msg_id):
+        has_photo = self.photo_every and msg_id % self.photo_every == 0
+        # With distinct_photos set, channels keep reposting the same few photos
+        photo_id = (
+            msg_id % self.distinct_photos
+            if self.distinct_photos
+            else zlib.crc32(f"{entity.username}/{msg_id}".encode())
+        )
+        return SimpleNamespace(
+            id=msg_id,
+            message=f"message {msg_id}",
+            date=datetime.now(timezone.utc),
+            views=msg_id,
+            media=(
+                SimpleNamespace(photo=SimpleNamespace(id=photo_id))
+                if has_photo
+                else None
+            ),
+        )
+
+    async def get_messages(self, entity, limit=1):
+        self._request()
+        await asyncio.sleep(self.page_latency)
+        top = self.messages_per_channel
+        return [
+            self._message(entity, msg_id)
+            for msg_id in range(top, max(0, top - limit), -1)
+        ]
+
+    async def iter_messages(self, entity, limit=None, min_id=0, reverse=False):
+        self.active_channels += 1
+        self.peak_channels = max(self.peak_channels, self.active_channels)
+        try:
+            ids = range(min_id + 1, self.messages_per_channel + 1)
+            if not reverse:
+                ids = ids[::-1]
+            for index, msg_id in enumerate(ids[:limit]):
+                if index % scraper.HISTORY_PAGE_SIZE == 0:
+                    self._request()
+                    await asyncio.sleep(self.page_latency)
+                yield self._message(entity, msg_id)
+        finally:
+            self.active_channels -= 1
+
+    async def download_media(self, message, file):
+        self._request()
+        self.active_downloads += 1
+        self.peak_downloads = max(self.peak_downloads, self.active_downloads)
+        try:
+            await asyncio.sleep(self.download_latency)
+        finally:
+            self.active_downloads -= 1
+        self.downloads += 1
+        return f"photo {message.media.photo.id}".encode()
+
+    def peak_requests_per_second(self):
+        times = self.request_times
+        return max(
+            (bisect_right(times, t + 1.0) - i for i, t in enumerate(times)), default=0
+        )
+
+
+def summarise_pass(client, counts, elapsed, args):
+    total = sum(count or 0 for count in counts.values())
+    return {
+        "messages": total,
+        "failed_channels": sum(count is None for count in counts.values()),
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(total / elapsed, 1) if elapsed else 0.0,
+        "requests": len(client.request_times),
+        "downloads": client.downloads,
+        "flood_waits": client.floods,
+        "peak_channels": client.peak_channels,
+        "peak_downloads": client.peak_downloads,
+        "peak_requests_in_1s": client.peak_requests_per_second(),
+        "request_budget_per_s": args.requests_per_second,
+    }
+
+
+async def run_scenario(args, max_channels, download_workers):
+    """
+    Scrape every channel once from scratch, then again after `--new-messages`
+    posts per channel, resuming from the checkpoints of the first pass.
+    """
+    channels = [f"@fake_channel_{i}" for i in range(args.channels)]
+    report = {"max_channels": max_channels, "download_workers": download_workers}
+    total_messages = args.messages
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("initial", "incremental"):
+            client = FakeTelegramClient(
+                total_messages,
+                page_latency=args.page_latency,
+                download_latency=args.download_latency,
+                photo_ratio=args.photo_ratio,
+                flood_every=args.flood_every,
+                distinct_photos=args.distinct_photos,
+            )
+            # The scraper prints progress per channel; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                counts = await scraper.scrape_channels(
+                    client,
+                    channels,
+                    args.messages,
+                    max_channels=max_channels,
+                    download_workers=download_workers,
+                    requests_per_second=args.requests_per_second,
+                    base_dir=os.path.join(tmp, f"{max_channels}_{download_workers}"),
+                    image_dir=os.path.join(tmp, "images"),
+                )
+                elapsed = time.perf_counter() - start
+            report[label] = summarise_pass(client, counts, elapsed, args)
+            total_messages += args.new_messages
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--channels", type=int, default=6)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument(
+        "--new-messages", type=int, default=20, help="Posts added before the 2nd pass"
+    )
+    parser.add_argument("--max-channels", type=int, default=3)
+    parser.add_argument("--download-workers", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=50.0)
+    parser.add_argument("--page-latency", type=float, default=0.05)
+    parser.add_argument("--download-latency", type=float, default=0.05)
+    parser.add_argument("--photo-ratio", type=float, default=0.5)
+    parser.add_argument(
+        "--flood-every", type=int, default=0, help="Inject a FloodWait every N requests"
+    )
+    parser.add_argument(
+        "--distinct-photos",
+        type=int,
+        default=0,
+        help="Photos the channels share and repost (0 = every photo is new)",
+    )
+    args = parser.parse_args()
+
+    report = {
+        "sequential": asyncio.run(run_scenario(args, 1, 0)),
+        "concurrent": asyncio.run(
+            run_scenario(args, args.max_channels, args.download_workers)
+        ),
+    }
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,141 @@
+"""
+Serialization cost per endpoint at large result sizes, without a database.
+
+For each endpoint, synthetic rows are turned into a response body two ways
+(median of --repeat runs):
+    validated   the previous path: crud rows as psycopg2 returned them (numeric
+                columns as Decimal, detections decoded from JSON into lists of
+                dicts), validated and serialized by FastAPI against the
+                response_model, then rendered by the stdlib JSON encoder
+    orjson      the current path: rows with JSON-native types (detections as
+                the JSON text Postgres built) rendered directly by orjson
+
+Usage:
+    python -m benchmarks.serialization_benchmark --rows 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from api.schemas import ChannelActivity, MessageSearchResult, ObjectStat
+
+OBJECTS = ["bottle", "person", "cup", "cell phone", "book"]
+
+
+def top_products_rows(n):
+    legacy = [
+        {
+            "object_class": f"{OBJECTS[i % 5]}_{i}",
+            "count": Decimal(1000 + i),
+            "avg_confidence": Decimal("0.613"),
+        }
+        for i in range(n)
+    ]
+    native = [
+        {"object_class": r["object_class"], "count": 1000 + i, "avg_confidence": 0.613}
+        for i, r in enumerate(legacy)
+    ]
+    return legacy, native, None
+
+
+def channel_activity_rows(n):
+    start = date(2020, 1, 1)
+    rows = [
+        {
+            "date_day": start + timedelta(days=i),
+            "message_count": 140 + i % 10,
+            "total_views": 10_000 * i,
+        }
+        for i in range(n)
+    ]
+    return rows, rows, None
+
+
+def search_messages_rows(n):
+    legacy, native, detection_texts = [], [], []
+    for i in range(n):
+        detections = json.dumps(
+            [
+                {"object": OBJECTS[(i + k) % 5], "confidence": 0.5 + k / 10}
+                for k in range(i % 3)
+            ]
+        )
+        row = {
+            "message_id": f"CheMed123_{i}",
+            "channel_slug": "CheMed123",
+            "posted_at": datetime(2025, 1, 1) + timedelta(hours=i),
+            "text_preview": [f"message {i} vitamin", "paracetamol 500mg", "call now"],
+        }
+        detection_texts.append(detections)
+        legacy.append(dict(row, detections=None))
+        native.append(dict(row, detections=orjson.Fragment(detections)))
+    return legacy, native, detection_texts
+
+
+ENDPOINTS = {
+    "top_products": (ObjectStat, top_products_rows),
+    "channel_activity": (ChannelActivity, channel_activity_rows),
+    "search_messages": (MessageSearchResult, search_messages_rows),
+}
+
+
+def median_seconds(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def validated_body(field, rows, detection_texts):
+    if detection_texts is not None:
+        # psycopg2 decoded the aggregated detections into Python objects
+        for row, text in zip(rows, detection_texts):
+            row["detections"] = json.loads(text)
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def measure(name, rows, repeat):
+    model, build = ENDPOINTS[name]
+    field = create_model_field(name="Response", type_=list[model], mode="serialization")
+    legacy, native, detection_texts = build(rows)
+    validated = validated_body(field, legacy, detection_texts)
+    fast = ORJSONResponse(native).body
+    assert json.loads(validated) == json.loads(fast), f"{name}: bodies differ"
+
+    validated_s = median_seconds(
+        lambda: validated_body(field, legacy, detection_texts), repeat
+    )
+    orjson_s = median_seconds(lambda: ORJSONResponse(native).body, repeat)
+    return {
+        "validated_ms": round(validated_s * 1000, 2),
+        "orjson_ms": round(orjson_s * 1000, 2),
+        "speedup": round(validated_s / orjson_s, 1) if orjson_s else None,
+        "body_bytes": len(fast),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--endpoints", nargs="*", default=list(ENDPOINTS))
+    args = parser.parse_args()
+
+    report = {
+        name: {str(rows): measure(name, rows, args.repeat) for rows in args.rows}
+        for name in args.endpoints
+    }
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,257 @@
+"""
+Synthetic warehouse for API benchmarks at production scale.
+
+Fills a scratch database with synthetic source tables, generated in SQL so a
+few million rows take seconds rather than a scrape:
+
+    raw.telegram_messages           --messages posts over --days days
+    enriched.fct_image_detections   YOLO-style detections for photo posts
+
+and then builds the marts the API reads (fct_messages, fct_message_search,
+agg_channel_daily, agg_object_daily and the dimensions) with `dbt run
+--full-refresh`, so tables and indexes are exactly what the models build. dbt is
+pointed at the scratch database through a throwaway profiles.yml, as in
+benchmarks.dbt_run_benchmark.
+
+Distributions follow the scraped data rather than being uniform: channel
+volumes are skewed, posting is biased towards recent days, views are heavy
+tailed, posts mix English product names with Amharic, about 45% carry a photo,
+and photos have zero to several detections with a few common classes.
+Generation is deterministic for a given --seed.
+
+Usage:
+    python -m benchmarks.synthetic_data --messages 1000000
+    python -m benchmarks.synthetic_data --messages 5000000 --database api_benchmark
+"""
+
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+
+from benchmarks.common import CHANNELS, connect, create_database
+from benchmarks.dbt_run_benchmark import PROJECT_DIR, write_profile
+from scripts._02_data_loader import create_loaded_at_index, create_message_table
+from scripts._03_enriched_data_loader import EnrichedDataLoader
+
+# Words posts are built from; PRODUCTS doubles as the search terms of the load
+# scenarios, and the earlier entries are picked more often
+PRODUCTS = [
+    "paracetamol",
+    "vitamin",
+    "amoxicillin",
+    "ibuprofen",
+    "omeprazole",
+    "metformin",
+    "cetirizine",
+    "sunscreen",
+    "moisturizer",
+    "glasses",
+    "insulin",
+    "azithromycin",
+    "glucometer",
+    "thermometer",
+    "sanitizer",
+    "formula",
+]
+WORDS = [
+    "available",
+    "original",
+    "imported",
+    "tablets",
+    "capsules",
+    "syrup",
+    "500mg",
+    "100ml",
+    "price",
+    "birr",
+    "delivery",
+    "order",
+    "call",
+    "now",
+    "ዋጋ",
+    "ይደውሉ",
+    "አዲስ",
+    "መድኃኒት",
+    "ቅናሽ",
+    "ለማዘዝ",
+    "አድራሻ",
+    "ቦሌ",
+    "መገናኛ",
+]
+OBJECTS = ["person", "bottle", "cup", "cell phone", "book", "handbag", "scissors"]
+
+
+# The marts the API reads, with every model they depend on
+MARTS = ["fct_message_search", "agg_channel_daily", "agg_object_daily"]
+
+
+def seed(conn, messages, days=730, random_seed=0.42, dbt="dbt"):
+    """
+    Replace the source tables with `messages` synthetic posts and rebuild the
+    marts from them with dbt. Returns row counts per table.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT setseed(%s);", (random_seed,))
+        cursor.execute(
+            """
+            CREATE SCHEMA IF NOT EXISTS raw;
+            DROP TABLE IF EXISTS raw.telegram_messages CASCADE;
+            DROP TABLE IF EXISTS enriched.fct_image_detections CASCADE;
+            DROP TABLE IF EXISTS enriched.detection_deletions;
+        """
+        )
+        # The loaders' own DDL, so the sources match what dbt reads in production
+        create_message_table(cursor, "raw.telegram_messages")
+        create_loaded_at_index(cursor, "raw.telegram_messages")
+        EnrichedDataLoader().ensure_table(cursor)
+        insert_messages(cursor, messages, days)
+        insert_detections(cursor)
+    conn.commit()
+
+    build_marts(conn.info.dbname, dbt)
+
+    counts = {}
+    with conn.cursor() as cursor:
+        for table in (
+            "raw_marts.fct_messages",
+            "enriched.fct_image_detections",
+            "raw_marts.fct_message_search",
+            "raw_marts.agg_channel_daily",
+            "raw_marts.agg_object_daily",
+        ):
+            cursor.execute(f"SELECT count(*) FROM {table};")
+            counts[table] = cursor.fetchone()[0]
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE;")
+    conn.autocommit = False
+    return counts
+
+
+def insert_messages(cursor, messages, days):
+    cursor.execute(
+        """
+        INSERT INTO raw.telegram_messages
+            (channel_title, channel_username, id, text, date, views, media_type,
+             loaded_at)
+        WITH posts AS (
+            SELECT
+                g AS id,
+                -- skewed channel volumes: the first channels post the most
+                1 + floor(power(random(), 1.6) * %(channel_count)s)::int AS channel,
+                -- recent days are busier than old ones
+                current_date - floor(power(random(), 1.8) * %(days)s)::int AS date_day,
+                random() < 0.45 AS has_image,
+                floor(exp(random() * random() * 11))::int AS views,
+                2 + (g %% 9) + floor(random() * 6)::int AS words
+            FROM generate_series(1, %(messages)s) g
+        )
+        SELECT
+            'Channel ' || (%(channels)s::text[])[p.channel],
+            '@' || (%(channels)s::text[])[p.channel],
+            p.id,
+            t.text,
+            p.date_day + floor(random() * 86400) * interval '1 second',
+            p.views,
+            CASE WHEN p.has_image THEN 'photo' END,
+            now() - (current_date - p.date_day) * interval '1 day'
+        FROM posts p,
+        LATERAL (
+            SELECT
+                (%(products)s::text[])[1 + floor(power(random(), 2)
+                    * array_length(%(products)s::text[], 1))::int]
+                || E'\\n'
+                || string_agg(
+                    (%(words)s::text[])[1 + floor(random()
+                        * array_length(%(words)s::text[], 1))::int]
+                    || CASE WHEN w %% 4 = 0 THEN E'\\n' ELSE ' ' END,
+                    ''
+                ) AS text
+            FROM generate_series(1, p.words) w
+        ) t;
+    """,
+        {
+            "messages": messages,
+            "days": days,
+            "channels": CHANNELS,
+            "channel_count": len(CHANNELS),
+            "products": PRODUCTS,
+            "words": WORDS,
+        },
+    )
+
+
+def insert_detections(cursor):
+    # Zero to several detections per photo (mean about 1.5), common classes
+    # first, confidences skewed high as YOLO reports them
+    cursor.execute(
+        """
+        INSERT INTO enriched.fct_image_detections
+            (detection_id, message_id, model_version, detected_object,
+             confidence_score, bbox, loaded_at)
+        WITH photos AS (
+            SELECT replace(channel_username, '@', '') || '_' || id AS message_id,
+                   loaded_at,
+                   floor(-ln(1 - random()) * 1.5)::int AS detections
+            FROM raw.telegram_messages
+            WHERE media_type = 'photo'
+        )
+        SELECT
+            md5(p.message_id || '/' || k),
+            p.message_id,
+            'yolov8n',
+            (%(objects)s::text[])[1 + floor(power(random(), 2.2)
+                * array_length(%(objects)s::text[], 1))::int],
+            0.25 + 0.75 * power(random(), 0.6),
+            jsonb_build_array(0, 0, 100, 100),
+            p.loaded_at
+        FROM photos p, generate_series(1, p.detections) k;
+    """,
+        {"objects": OBJECTS},
+    )
+
+
+def build_marts(database, dbt="dbt"):
+    """
+    Build MARTS and their parents from scratch with `dbt run --full-refresh`.
+    """
+    with tempfile.TemporaryDirectory() as profiles_dir:
+        write_profile(profiles_dir, database)
+        command = [
+            dbt,
+            "run",
+            "--full-refresh",
+            "--project-dir",
+            PROJECT_DIR,
+            "--profiles-dir",
+            profiles_dir,
+            "--select",
+            *(f"+{model}" for model in MARTS),
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"dbt run failed:\n{result.stdout}\n{result.stderr}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--seed", type=float, default=0.42, help="In [-1, 1]")
+    parser.add_argument("--database", default="api_benchmark")
+    parser.add_argument("--dbt", default="dbt", help="dbt executable")
+    args = parser.parse_args()
+
+    create_database(args.database)
+    conn = connect(args.database)
+    start = time.perf_counter()
+    counts = seed(conn, args.messages, args.days, args.seed, args.dbt)
+    conn.close()
+    print(
+        json.dumps(
+            {"seed_s": round(time.perf_counter() - start, 1), "rows": counts}, indent=2
+        )
+    )
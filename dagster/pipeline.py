@@ -1,172 +1,337 @@
-from dagster import op, In, job
+from dagster import (
+    op,
+    In,
+    job,
+    Field,
+    Nothing,
+    DynamicOut,
+    DynamicOutput,
+    DailyPartitionsDefinition,
+)
 from dotenv import load_dotenv
+from contextlib import contextmanager
 import subprocess
-import psycopg2
-import sys
+import threading
+import asyncio
+import logging
 import os
 
+from resources import PostgresResource, YoloModelResource
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.abspath(os.path.join(script_dir, "..", ".env"))
 load_dotenv(env_path)
 
+# Channels the job fans out over; the pipeline runs the scripts in test mode
+CHANNELS = ["@mock_pharma", "@mock_food", "@mock_optics", "@mock_tena", "@mock_drug"]
+
+# Op processes running at once, and how many of them may be YOLO enrichers
+# (each loads its own model)
+MAX_CONCURRENT = int(os.getenv("DAGSTER_MAX_CONCURRENT", "4"))
+YOLO_CONCURRENT = int(os.getenv("DAGSTER_YOLO_CONCURRENT", "1"))
+
+# dbt models the enricher reads from; built before the channels are enriched
+MESSAGE_MODELS = "+fct_messages"
+
+# One partition per day. end_offset=1 exposes today's partition, so the 07:00
+# schedule scrapes into today's folder rather than yesterday's.
+daily_partitions = DailyPartitionsDefinition(
+    start_date="2025-06-01", timezone="Africa/Addis_Ababa", end_offset=1
+)
+
+
+def partition_day(context):
+    """
+    The run's day partition (YYYY-MM-DD), or None for an unpartitioned run.
+    """
+    return context.partition_key if context.has_partition_key else None
 
-@op
-def validate_test_db(context):
-    conn = psycopg2.connect(
-        dbname=os.getenv("POSTGRES_DB_TEST"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD"),
-        host=os.getenv("POSTGRES_HOST"),
-        port=os.getenv("POSTGRES_PORT"),
-    )
 
-    cur = conn.cursor()
-    cur.execute("SELECT current_database();")
-    active_db = cur.fetchone()[0]
-    cur.close()
-    conn.close()
+# ______________ Script logs ______________#
+class DagsterLogHandler(logging.Handler):
+    """
+    Forwards `logging` records from the pipeline scripts to the op's Dagster log
+    as they happen.
+    """
+
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+        self._forwarding = threading.local()
+
+    def emit(self, record):
+        # Dagster's own records may reach the root logger too; don't echo them
+        if record.name.startswith("dagster") or getattr(
+            self._forwarding, "active", False
+        ):
+            return
+        self._forwarding.active = True
+        try:
+            level = record.levelname.lower()
+            getattr(self.log, level, self.log.info)(record.getMessage())
+        finally:
+            self._forwarding.active = False
+
+
+@contextmanager
+def script_logs(context):
+    root = logging.getLogger()
+    handler = DagsterLogHandler(context.log)
+    previous_level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(previous_level)
+
+
+# ______________ Ops ______________#
+@op
+def validate_test_db(context, postgres: PostgresResource) -> bool:
+    with postgres.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT current_database();")
+        active_db = cur.fetchone()[0]
 
     context.log.info(f"Connected to DB: {active_db}")
     if active_db != "telegram_health_test":
         raise Exception("Abort: Connected to production DB!")
+    return True
+
+
+@op(
+    ins={"start": In(Nothing)},
+    out=DynamicOut(str),
+    config_schema={
+        "channels": Field(
+            [str], default_value=CHANNELS, description="Channels to scrape"
+        )
+    },
+)
+def channel_partitions(context):
+    # Fan out: every channel is scraped and loaded by its own ops
+    for channel in context.op_config["channels"]:
+        yield DynamicOutput(channel, mapping_key=channel.lstrip("@"))
+
+
+@op(out=DynamicOut(str))
+def enrich_channels(context, channels: list):
+    # Fan out again once fct_messages holds every channel's new messages
+    for channel in channels:
+        yield DynamicOutput(channel, mapping_key=channel.lstrip("@"))
 
 
 @op
-def scrape_telegram(context) -> str:
-    # Call scraping script here
-    context.log.info("Starting Telegram scraping...")
-    python_path = sys.executable  # path to virtual env python
-    result = subprocess.run(
-        [python_path, "../scripts/_01_data_scraper.py", "--test"],
-        capture_output=True,
-        text=True,
-    )
-    context.log.info(f"Dagster running with: {sys.executable}")
-    context.log.info(result.stdout)
-    if result.returncode != 0:
-        context.log.error(result.stderr)
-        raise Exception("Telegram scraping failed.")
-    context.log.info("Scraping complete.")
-    return "Scraped"
+def scrape_telegram(context, channel: str) -> str:
+    # Imported here so only scraping processes load telethon
+    from scripts import _01_data_scraper as scraper
+
+    context.log.info(f"Starting Telegram scraping of {channel}...")
+    with script_logs(context):
+        counts = asyncio.run(
+            scraper.scrape(
+                test_mode=True, channels=[channel], day=partition_day(context)
+            )
+        )
+    scraped = counts.get("@" + channel.lstrip("@"))
+    if scraped is None:
+        raise Exception(f"Telegram scraping of {channel} failed.")
+    context.log.info(f"Scraping complete: {scraped} new messages.")
+    return channel
 
 
 @op
-def load_to_postgres(context, status: str):
-    # Call PostgreSQL loading script here
-    context.log.info(f"Received status from scraper: {status}")
-    context.log.info("Running raw data loader...")
-    python_path = sys.executable
-    result = subprocess.run(
-        [python_path, "../scripts/_02_data_loader.py", "--test"],
-        capture_output=True,
-        text=True,
-    )
-    context.log.info(result.stdout)
-    if result.returncode != 0:
-        context.log.error(result.stderr)
-        raise Exception("Raw data loader failed.")
+def load_to_postgres(context, channel: str, postgres: PostgresResource) -> str:
+    from scripts import _02_data_loader as loader
+
+    context.log.info(f"Running raw data loader for {channel}...")
+    with script_logs(context), postgres.connection() as conn:
+        result = loader.load_telegram_messages(
+            test_mode=True, day=partition_day(context), channel=channel, conn=conn
+        )
+    if result is None:
+        raise Exception(f"Raw data loader failed for {channel}.")
     context.log.info("Data loading complete.")
-    return "Loaded"
+    return channel
 
 
-@op(ins={"previous_status": In()})
-def run_dbt(context, previous_status: str):
-    # Call dbt transformations here
-    context.log.info(f"dbt starting after: {previous_status}")
-    context.log.info("Running dbt transformations...")
-    result = subprocess.run(
+def dbt_command(context, command, *selection):
+    """
+    Run a dbt command against the mock profile, streaming its output to the
+    Dagster log line by line, and raise if it fails.
+    """
+    process = subprocess.Popen(
         [
             "dbt",
-            "run",
+            command,
             "--project-dir",
             "../medical_insights",
             "--profile",
             "mock_medical_insights",
+            *selection,
         ],
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
         text=True,
     )
-    context.log.info(result.stdout)
-    if result.returncode != 0:
-        context.log.error(result.stderr)
-        raise Exception("dbt run failed.")
+    for line in process.stdout:
+        if line.strip():
+            context.log.info(line.rstrip())
+    if process.wait() != 0:
+        raise Exception(f"dbt {command} failed.")
+
+
+FULL_REFRESH = Field(
+    bool,
+    default_value=False,
+    description="Rebuild incremental models from scratch",
+)
+
+
+@op(config_schema={"full_refresh": FULL_REFRESH})
+def run_dbt_messages(context, channels: list) -> list:
+    # Build fct_messages (and what it needs) so the enricher sees new messages
+    context.log.info(f"dbt building {MESSAGE_MODELS} after loading {channels}...")
+    selection = ["--select", MESSAGE_MODELS]
+    if context.op_config["full_refresh"]:
+        selection.append("--full-refresh")
+    dbt_command(context, "run", *selection)
+    return channels
+
+
+@op(config_schema={"full_refresh": FULL_REFRESH})
+def run_dbt(context, channels: list):
+    # Build the models left: detections and everything downstream of the facts
+    context.log.info(f"dbt starting after enriching {channels}")
+    context.log.info("Running dbt transformations...")
+    selection = ["--exclude", MESSAGE_MODELS]
+    if context.op_config["full_refresh"]:
+        context.log.info("Full refresh requested: rebuilding incremental models.")
+        selection.append("--full-refresh")
+    dbt_command(context, "run", *selection)
     context.log.info("dbt complete.")
     return "dbt"
 
 
 @op(ins={"previous_status": In()})
-def test_dbt(context, previous_status: str):
+def bump_data_version(context, previous_status: str, postgres: PostgresResource) -> str:
+    # Tell the API that the marts changed so it drops its cached report responses
+    with postgres.connection() as conn, conn.cursor() as cur:
+        cur.execute("CREATE SCHEMA IF NOT EXISTS raw;")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS raw.data_version (
+                name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """
+        )
+        cur.execute(
+            """
+            INSERT INTO raw.data_version AS v (name, version)
+            VALUES ('marts', 1)
+            ON CONFLICT (name) DO UPDATE
+            SET version = v.version + 1, updated_at = now()
+            RETURNING version;
+        """
+        )
+        version = cur.fetchone()[0]
+        conn.commit()
+    context.log.info(f"Data version bumped to {version}.")
+    return previous_status
+
+
+@op(ins={"previous_status": In()})
+def test_dbt(context, previous_status: str) -> str:
     context.log.info("Running dbt tests...")
-    result = subprocess.run(
-        [
-            "dbt",
-            "test",
-            "--project-dir",
-            "../medical_insights",
-            "--profile",
-            "mock_medical_insights",
-        ],
-        capture_output=True,
-        text=True,
-    )
-    context.log.info(result.stdout)
-    if result.returncode != 0:
-        context.log.error(result.stderr)
-        raise Exception("dbt tests failed.")
+    dbt_command(context, "test")
+    return previous_status
 
 
 @op(ins={"previous_status": In()})
-def run_YOLO(context, previous_status: str) -> str:
-    # Call YOLO enrichment script here
-    context.log.info(f"YOLO running after: {previous_status}")
-    context.log.info("Running YOLO enrichment...")
-    python_path = sys.executable
-    result = subprocess.run(
-        [python_path, "../scripts/_03_data_enricher.py", "--test"],
-        capture_output=True,
-        text=True,
-    )
-    context.log.info(result.stdout)
-    if result.returncode != 0:
-        context.log.error(result.stderr)
-        raise Exception("Enrichment failed.")
+def export_parquet(context, previous_status: str, postgres: PostgresResource):
+    # Columnar copy of the tested marts for analysts and /api/analytics
+    from scripts.parquet_export import export_marts
+
+    context.log.info("Exporting the marts to Parquet...")
+    with script_logs(context), postgres.connection() as conn:
+        counts = export_marts(test_mode=True, conn=conn)
+    context.log.info(f"Parquet export complete: {counts}")
+
+
+@op(tags={"stage": "yolo"})
+def run_YOLO(
+    context, channel: str, postgres: PostgresResource, yolo: YoloModelResource
+) -> str:
+    # Imported here so only enrichment processes load torch and ultralytics
+    from scripts._03_data_enricher import DataEnricher
+
+    context.log.info(f"Running YOLO enrichment for {channel}...")
+    with script_logs(context):
+        with DataEnricher(
+            model_path=yolo.model_paths(),
+            model=yolo.get_models(),
+            test_mode=True,
+            channel=channel,
+        ) as enricher:
+            with postgres.connection() as conn:
+                enricher.process_all(conn)
+            enricher.save_results()
     context.log.info("Enrichment complete.")
-    return "Enriched"
+    return channel
 
 
-@op(ins={"previous_status": In()})
-def yolo_loader(context, previous_status: str) -> str:
-    # This function is used to load YOLO enriched data
-    context.log.info(f"Loading enriched detections after: {previous_status}")
-    context.log.info("Loading YOLO enriched data...")
-    python_path = sys.executable
-    result = subprocess.run(
-        [python_path, "../scripts/_03_enriched_data_loader.py", "--test"],
-        capture_output=True,
-        text=True,
-    )
-    context.log.info(result.stdout)
-    if result.returncode != 0:
-        context.log.error(result.stderr)
-        raise Exception("Enriched data loader failed.")
+@op
+def yolo_loader(context, channel: str, postgres: PostgresResource) -> str:
+    from scripts._03_enriched_data_loader import EnrichedDataLoader
+
+    context.log.info(f"Loading YOLO enriched data for {channel}...")
+    with script_logs(context), postgres.connection() as conn:
+        result = EnrichedDataLoader(
+            test_mode=True, channel=channel
+        ).load_enriched_messages(conn)
+    if result is None:
+        raise Exception(f"Enriched data loader failed for {channel}.")
     context.log.info("Enriched data loading complete.")
-    return "Detections loaded"
+    return channel
 
 
-@job
+# Ops run in parallel processes by default. Pick the in_process executor in the
+# launchpad to run every op in one process, sharing the model and pool.
+@job(
+    partitions_def=daily_partitions,
+    resource_defs={"postgres": PostgresResource(), "yolo": YoloModelResource()},
+    config={
+        "execution": {
+            "config": {
+                "multiprocess": {
+                    "max_concurrent": MAX_CONCURRENT,
+                    "tag_concurrency_limits": [
+                        {"key": "stage", "value": "yolo", "limit": YOLO_CONCURRENT}
+                    ],
+                }
+            }
+        }
+    },
+)
 def telegram_pipeline():
-    validate_test_db()
-    status = scrape_telegram()
-    dbt_status = load_to_postgres(status)
-    yolo_status = run_YOLO(dbt_status)
-    loader_status = yolo_loader(yolo_status)
-    dbt_run_result = run_dbt(loader_status)
-    test_dbt(dbt_run_result)
-
-
-# ✅ Scrape Telegram messages
-# ✅ Load them into mock Postgres
-# ✅ Enrich with YOLO
-# ✅ Insert enrichment results into mock DB
-# ✅ Run dbt transformations once enriched data is present
+    channels = channel_partitions(start=validate_test_db())
+    loaded = channels.map(lambda channel: load_to_postgres(scrape_telegram(channel)))
+    messages_built = run_dbt_messages(loaded.collect())
+    enriched = enrich_channels(messages_built).map(
+        lambda channel: yolo_loader(run_YOLO(channel))
+    )
+    dbt_run_result = run_dbt(enriched.collect())
+    export_parquet(test_dbt(bump_data_version(dbt_run_result)))
+
+
+# ✅ Check the mock DB before anything runs
+# ✅ Scrape and load every channel in parallel (one day partition per run)
+# ✅ Build fct_messages so the new messages can be enriched
+# ✅ Enrich with YOLO and load the detections, per channel in parallel
+# ✅ Run the remaining dbt models once enriched data is present
+# ✅ Bump the data version so the API cache is invalidated
 # ✅ Test dbt after run
+# ✅ Export the tested marts to Parquet for DuckDB queries
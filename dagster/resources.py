@@ -0,0 +1,92 @@
+import os
+import sys
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from dagster import ConfigurableResource
+from psycopg2 import pool
+
+# Ops import the pipeline scripts as the `scripts` package from the repo root
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _shared_pool(max_connections, **connect_kwargs):
+    """
+    One connection pool per database and process, created on first use.
+    """
+    key = tuple(sorted(connect_kwargs.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = pool.ThreadedConnectionPool(
+                1, max_connections, **connect_kwargs
+            )
+        return _pools[key]
+
+
+class PostgresResource(ConfigurableResource):
+    """
+    Connections to the database the pipeline loads into, checked out of a pool
+    shared by every op running in the same process.
+    """
+
+    test_mode: bool = True
+    max_connections: int = 4
+
+    def connect_kwargs(self):
+        return dict(
+            dbname=(
+                os.getenv("POSTGRES_DB_TEST")
+                if self.test_mode
+                else os.getenv("POSTGRES_DB")
+            ),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+            host=os.getenv("POSTGRES_HOST"),
+            port=os.getenv("POSTGRES_PORT"),
+        )
+
+    @contextmanager
+    def connection(self):
+        conn_pool = _shared_pool(self.max_connections, **self.connect_kwargs())
+        conn = conn_pool.getconn()
+        try:
+            yield conn
+        finally:
+            # Never hand a connection with an open transaction to the next op
+            conn.rollback()
+            conn_pool.putconn(conn)
+
+
+@lru_cache(maxsize=None)
+def _load_model(model_path):
+    from ultralytics import YOLO  # only enrichment ops pay for torch
+
+    logging.info(f"Loading YOLO weights from {model_path}...")
+    return YOLO(model_path)
+
+
+class YoloModelResource(ConfigurableResource):
+    """
+    YOLO models loaded once per process and shared by every enrichment op in it.
+    Models in extra_model_paths run alongside model_path in the same pass, with
+    their detections tagged by model version.
+    """
+
+    model_path: str = "yolov8n.pt"
+    extra_model_paths: list[str] = []
+
+    def get_model(self):
+        return _load_model(self.model_path)
+
+    def model_paths(self):
+        return [self.model_path, *self.extra_model_paths]
+
+    def get_models(self):
+        return [_load_model(path) for path in self.model_paths()]
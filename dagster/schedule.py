@@ -1,8 +1,8 @@
-from dagster import ScheduleDefinition
+from dagster import build_schedule_from_partitioned_job
 from pipeline import telegram_pipeline
 
-daily_schedule = ScheduleDefinition(
-    job=telegram_pipeline,
-    cron_schedule="0 7 * * *",  # every day at 7AM
-    execution_timezone="Africa/Addis_Ababa",
+# Every day at 7AM (the partitions' Africa/Addis_Ababa timezone), running that
+# day's partition
+daily_schedule = build_schedule_from_partitioned_job(
+    telegram_pipeline, hour_of_day=7, minute_of_hour=0
 )
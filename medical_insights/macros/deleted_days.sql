@@ -0,0 +1,11 @@
+{% macro deleted_days() %}
+    {#-
+        (channel_slug, date_day) of every message whose stale detections the
+        enriched loader deleted since this model's last run.
+    -#}
+    select m.channel_slug, m.date_day
+    from {{ source('enriched', 'detection_deletions') }} x
+    join {{ ref('fct_messages') }} m
+        on x.message_id = m.message_id
+    where {{ loaded_since_last_run('x.deleted_at', 'last_loaded_at') }}
+{% endmacro %}
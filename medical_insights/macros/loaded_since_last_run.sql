@@ -0,0 +1,15 @@
+{% macro loaded_since_last_run(source_column, column='loaded_at') %}
+    {#-
+        Incremental filter: rows whose `source_column` is newer than the latest
+        `column` already in this model. A table built before the watermark
+        column existed gets every row once (on_schema_change adds the column).
+    -#}
+    {%- set existing = adapter.get_columns_in_relation(this) | map(attribute='name') | list -%}
+    {%- if column in existing -%}
+        {{ source_column }} > (
+            select coalesce(max({{ column }}), '-infinity'::timestamptz) from {{ this }}
+        )
+    {%- else -%}
+        true
+    {%- endif -%}
+{% endmacro %}
@@ -1,15 +1,37 @@
 {{ config(
-    materialized = 'table', schema='enriched'
+    materialized='incremental',
+    schema='enriched',
+    incremental_strategy='merge',
+    unique_key='detection_id',
+    on_schema_change='append_new_columns',
+    pre_hook="{% if is_incremental() %}delete from {{ this }} t where t.message_id in (select x.message_id from {{ source('enriched', 'detection_deletions') }} x where {{ loaded_since_last_run('x.deleted_at') }}) and not exists (select 1 from {{ source('enriched', 'fct_image_detections') }} s where s.detection_id = t.detection_id){% endif %}",
+    post_hook="delete from {{ this }} where detection_id is null",
+    indexes=[
+        {'columns': ['detection_id'], 'unique': True},
+        {'columns': ['message_id']},
+        {'columns': ['object_class']},
+        {'columns': ['model_version', 'object_class']}
+    ]
 ) }}
 
+-- Incremental runs only merge detections loaded since the previous run
+-- (loaded_at watermark). Use `dbt run --full-refresh` to rebuild. The
+-- pre-hook drops detections the loader has deleted as stale (a message re-run
+-- through the same model), looking only at the messages it logged in
+-- detection_deletions since the watermark. The post-hook clears rows of a
+-- table built before detection_id existed; they are merged back in with their
+-- ids on that same run.
+
 SELECT
+    detections.detection_id,
     detections.message_id,
+    detections.model_version,
     detections.detected_object AS object_class,
     detections.confidence_score,
-    detections.bbox
+    detections.bbox,
+    detections.loaded_at
 FROM
     {{ source('enriched', 'fct_image_detections') }} AS detections
-LEFT JOIN
-    {{ ref('fct_messages') }} AS messages
-    ON detections.message_id = messages.message_id
-    
\ No newline at end of file
+{% if is_incremental() %}
+WHERE {{ loaded_since_last_run('detections.loaded_at') }}
+{% endif %}
@@ -0,0 +1,43 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['channel_slug', 'date_day'],
+    on_schema_change='append_new_columns',
+    indexes=[
+        {'columns': ['channel_slug', 'date_day'], 'unique': True}
+    ]
+) }}
+
+-- Daily message and view totals per channel, read by the channel activity
+-- endpoint. Incremental runs rebuild the last `rollup_lookback_days` days plus
+-- every day with messages merged into fct_messages since the previous run
+-- (new posts and refreshed view counts).
+
+with messages as (
+    select channel_slug, date_day, views, loaded_at
+    from {{ ref('fct_messages') }}
+)
+
+{% if is_incremental() %}
+, changed_days as (
+    select distinct channel_slug, date_day
+    from messages
+    where {{ loaded_since_last_run('loaded_at', 'last_loaded_at') }}
+       or date_day >= (
+           select max(date_day) - {{ var('rollup_lookback_days', 3) }} from {{ this }}
+       )
+)
+{% endif %}
+
+select
+    m.channel_slug,
+    m.date_day,
+    count(*) as message_count,
+    sum(coalesce(m.views, 0)) as total_views,
+    max(m.loaded_at) as last_loaded_at
+from messages m
+{% if is_incremental() %}
+join changed_days c
+    on m.channel_slug = c.channel_slug and m.date_day = c.date_day
+{% endif %}
+group by m.channel_slug, m.date_day
@@ -0,0 +1,67 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['channel_slug', 'date_day'],
+    on_schema_change='append_new_columns',
+    pre_hook="{% if is_incremental() %}delete from {{ this }} a using ({{ deleted_days() }}) c where a.channel_slug = c.channel_slug and a.date_day = c.date_day{% endif %}",
+    post_hook="update {{ this }} set model_version = 'yolov8n' where model_version is null",
+    indexes=[
+        {'columns': ['channel_slug', 'date_day']},
+        {'columns': ['model_version', 'object_class']}
+    ]
+) }}
+
+-- Daily detection counts per channel, model version and object class, read by
+-- the top products endpoint. confidence_sum is stored instead of an average so that rollups over
+-- any date range stay exact: avg = sum(confidence_sum) / sum(detection_count).
+-- Incremental runs rebuild the last `rollup_lookback_days` days plus every day
+-- that received detections since the previous run (enrichment can reach back
+-- to old messages) or lost some to the enriched loader's stale deletes. The
+-- pre-hook clears those days first, since delete+insert leaves a day that has
+-- no detections left untouched.
+-- A table built before model_version existed gains the column on its next run;
+-- the post-hook attributes its older rows to yolov8n, the only model then run
+-- (LEGACY_MODEL_VERSION in the enriched loader). The (model_version,
+-- object_class) index is only created by `dbt run --full-refresh`.
+
+with detections as (
+    select
+        m.channel_slug,
+        m.date_day,
+        d.model_version,
+        d.detected_object as object_class,
+        d.confidence_score,
+        d.loaded_at
+    from {{ source('enriched', 'fct_image_detections') }} d
+    join {{ ref('fct_messages') }} m
+        on d.message_id = m.message_id
+    where d.detected_object is not null
+)
+
+{% if is_incremental() %}
+, changed_days as (
+    select distinct channel_slug, date_day
+    from detections
+    where {{ loaded_since_last_run('loaded_at', 'last_loaded_at') }}
+       or date_day >= (
+           select max(date_day) - {{ var('rollup_lookback_days', 3) }} from {{ this }}
+       )
+    union
+    {{ deleted_days() }}
+)
+{% endif %}
+
+select
+    d.channel_slug,
+    d.date_day,
+    d.model_version,
+    d.object_class,
+    count(*) as detection_count,
+    sum(d.confidence_score) as confidence_sum,
+    max(d.loaded_at) as last_loaded_at
+from detections d
+{% if is_incremental() %}
+join changed_days c
+    on d.channel_slug = c.channel_slug and d.date_day = c.date_day
+{% endif %}
+group by d.channel_slug, d.date_day, d.model_version, d.object_class
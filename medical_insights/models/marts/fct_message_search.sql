@@ -0,0 +1,22 @@
+{{ config(
+    materialized='table',
+    pre_hook="create extension if not exists pg_trgm",
+    indexes=[
+        {'columns': ['search_vector'], 'type': 'gin'},
+        {'columns': ['text gin_trgm_ops'], 'type': 'gin'},
+        {'columns': ['date_day', 'message_id']}
+    ]
+) }}
+
+-- Search index over message text: a tsvector for ranked full-text search and a
+-- trigram index for substring (ILIKE) matches. 'simple' keeps Amharic and English
+-- tokens unstemmed.
+
+select
+    message_id,
+    channel_slug,
+    date_day,
+    text,
+    to_tsvector('simple', text) as search_vector
+from {{ ref('fct_messages') }}
+where text is not null and text <> ''
@@ -1,4 +1,18 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='merge',
+    unique_key='message_id',
+    on_schema_change='append_new_columns',
+    indexes=[
+        {'columns': ['message_id'], 'unique': True},
+        {'columns': ['channel_slug', 'date_day']},
+        {'columns': ['date_day']}
+    ]
+) }}
+
+-- Incremental runs only merge messages the loader inserted or changed since the
+-- previous run (loaded_at watermark). Use `dbt run --full-refresh` to rebuild,
+-- e.g. after messages were deleted upstream.
 
 with base as (
     select
@@ -10,8 +24,12 @@ with base as (
         m.views,
         m.media_type,
         m.message_length,
-        m.has_image
+        m.has_image,
+        m.loaded_at
     from {{ ref('stg_telegram_messages') }} m
+    {% if is_incremental() %}
+    where {{ loaded_since_last_run('m.loaded_at') }}
+    {% endif %}
 )
 
 select
@@ -24,7 +42,8 @@ select
     b.views,
     b.media_type,
     b.message_length,
-    b.has_image
+    b.has_image,
+    b.loaded_at
 from base b
 left join {{ ref('dim_channels') }} d
     on b.channel_slug = d.channel_slug
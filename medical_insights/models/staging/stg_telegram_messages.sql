@@ -11,7 +11,8 @@ with raw as (
         date::timestamp as posted_at,
         views::integer,
         media_type,
-        replace(channel_username, '@', '') as channel_slug
+        replace(channel_username, '@', '') as channel_slug,
+        loaded_at
     from raw.telegram_messages
 
 )
@@ -26,6 +27,7 @@ select
     media_type,
     length(text) as message_length,                 --  Calculating message length for analysis
     media_type = 'photo' as has_image,              --  Boolean flag for image presence
-    channel_slug
+    channel_slug,
+    loaded_at                                       --  When the loader last inserted or changed the row
 
 from raw
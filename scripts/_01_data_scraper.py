@@ -1,191 +1,706 @@
-import json
 import os
+import sys
 import time
 import asyncio
+import sqlite3
 import argparse
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from telethon import TelegramClient
+
+try:
+    from scripts.message_files import (
+        MessageWriter,
+        existing_message_files,
+        message_file_path,
+        read_messages,
+    )
+    from scripts.scrape_checkpoint import CheckpointStore
+    from scripts.image_store import ImageStore
+    from scripts.log_setup import configure_logging
+except ImportError:  # executed directly as scripts/_01_data_scraper.py
+    from message_files import (
+        MessageWriter,
+        existing_message_files,
+        message_file_path,
+        read_messages,
+    )
+    from scrape_checkpoint import CheckpointStore
+    from image_store import ImageStore
+    from log_setup import configure_logging
 
 # -------------------- Setup -------------------- #
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--test", action="store_true", help="Run scraper in test mode")
-args = parser.parse_args()
+parser.add_argument(
+    "--max-channels", type=int, default=3, help="Channels scraped concurrently"
+)
+parser.add_argument(
+    "--download-workers",
+    type=int,
+    default=4,
+    help="Concurrent photo downloads (0 = download inline while iterating)",
+)
+parser.add_argument(
+    "--requests-per-second",
+    type=float,
+    default=5.0,
+    help="Budget of Telegram API requests per second, shared by every task and "
+    "every scraper process writing to the same output folder",
+)
+parser.add_argument(
+    "--max-retries", type=int, default=5, help="Retries per request after errors"
+)
+parser.add_argument(
+    "--flush-every",
+    type=int,
+    default=500,
+    help="Messages buffered per channel before the file and checkpoint are saved",
+)
+parser.add_argument(
+    "--channel",
+    action="append",
+    help="Only scrape this channel (repeatable); defaults to every channel",
+)
+parser.add_argument(
+    "--date", help="Day folder (YYYY-MM-DD) the messages are written to; default today"
+)
+parser.add_argument(
+    "--compress",
+    choices=["gz", "zst"],
+    help="Compress the NDJSON message files (zst needs the zstandard package)",
+)
 
-# Load environment variables from parent directory
-load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
+# Define path for the Telegram session file
+session_path = os.path.abspath(os.path.join("..", "scraper", "scraping_session"))
 
-# Get Telegram API credentials from environment variables
-api_id = os.getenv("TG_API_ID")
-api_hash = os.getenv("TG_API_HASH")
+# Messages returned per GetHistory request made by iter_messages
+HISTORY_PAGE_SIZE = 100
 
-# Check if API credentials are provided
-if not api_id or not api_hash:
-    raise ValueError("Missing Telegram API credentials. Check your .env file.")
 
-# Configure logging
-log_dir = os.path.abspath(os.path.join("..", "logs"))
-os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, "scraper.log")
+def create_client():
+    """
+    Build the Telegram client from the TG_API_ID / TG_API_HASH credentials.
+    """
+    # Load environment variables from parent directory
+    load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
+    api_id = os.getenv("TG_API_ID")
+    api_hash = os.getenv("TG_API_HASH")
 
-logging.basicConfig(
-    filename=log_path,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
+    # Check if API credentials are provided
+    if not api_id or not api_hash:
+        raise ValueError("Missing Telegram API credentials. Check your .env file.")
 
+    from telethon import TelegramClient  # heavy; not needed in test mode
 
-# Define path for the Telegram session file
-session_path = os.path.abspath(os.path.join("..", "scraper", "scraping_session"))
-os.makedirs(os.path.dirname(session_path), exist_ok=True)
+    os.makedirs(os.path.dirname(session_path), exist_ok=True)
+    return TelegramClient(session_path, api_id, api_hash)
 
-# Initalise Telegram client
-client = TelegramClient(session_path, api_id, api_hash)
+
+# -------------------- Rate Limiting -------------------- #
+class RequestBudget:
+    """
+    Global token bucket shared by every scraping and download task.
+
+    `acquire()` waits until a request may be sent; `burst` requests may go out
+    back to back before pacing kicks in. A FloodWait reported by Telegram
+    pauses every task until the wait is over, not just the caller.
+    """
+
+    def __init__(self, requests_per_second, burst=1):
+        self.rate = requests_per_second
+        self.capacity = burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# Bucket shared by the scrapers writing under one output root
+BUDGET_FILE = "request_budget.sqlite"
+
+
+class SharedRequestBudget(RequestBudget):
+    """
+    RequestBudget whose tokens and FloodWait pause are kept in a SQLite file,
+    so scrapers running in separate processes (Dagster runs one per channel)
+    draw from one budget. Each process passes its own rate and burst.
+    """
+
+    def __init__(self, path, requests_per_second, burst=1):
+        super().__init__(requests_per_second, burst)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Autocommit, with explicit BEGIN IMMEDIATE around each read-modify-write
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS budget (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                paused_until REAL NOT NULL
+            );
+            """
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO budget VALUES (1, ?, ?, 0);",
+            (float(self.capacity), time.time()),
+        )
+
+    def _take(self):
+        """
+        Take a token if one is free. Returns 0, or the seconds to wait before
+        trying again. Wall-clock time, since it is compared across processes.
+        """
+        self._conn.execute("BEGIN IMMEDIATE;")
+        try:
+            tokens, updated, paused_until = self._conn.execute(
+                "SELECT tokens, updated, paused_until FROM budget WHERE id = 1;"
+            ).fetchone()
+            now = time.time()
+            if now < paused_until:
+                wait = paused_until - now
+            else:
+                tokens = min(
+                    self.capacity, tokens + max(0.0, now - updated) * self.rate
+                )
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not wait:
+                    tokens -= 1
+                self._conn.execute(
+                    "UPDATE budget SET tokens = ?, updated = ? WHERE id = 1;",
+                    (tokens, now),
+                )
+        except BaseException:
+            self._conn.execute("ROLLBACK;")
+            raise
+        self._conn.execute("COMMIT;")
+        return wait
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                wait = self._take()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        self._conn.execute(
+            "UPDATE budget SET paused_until = max(paused_until, ?) WHERE id = 1;",
+            (time.time() + seconds,),
+        )
+
+    def close(self):
+        self._conn.close()
+
+
+async def with_backoff(budget, call, description, max_retries=5):
+    """
+    Await `call()` under the request budget, retrying FloodWait and transient
+    network errors with exponential backoff.
+    """
+    from telethon.errors import FloodWaitError
+
+    for attempt in range(max_retries + 1):
+        await budget.acquire()
+        try:
+            return await call()
+        except FloodWaitError as e:
+            logging.warning(f"FloodWait of {e.seconds}s on {description}.")
+            budget.pause(e.seconds)
+            if attempt == max_retries:
+                raise
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            if attempt == max_retries:
+                raise
+            delay = min(60, 2**attempt)
+            logging.warning(f"{description} failed ({e}); retrying in {delay}s.")
+            await asyncio.sleep(delay)
+
+
+# -------------------- Downloads -------------------- #
+def telegram_photo_id(msg):
+    return getattr(getattr(msg.media, "photo", None), "id", None)
+
+
+async def download_photo(client, msg, message_id, image_store, budget, max_retries=5):
+    """
+    Download a message's photo into the image store and link it to the message.
+    """
+    data = await with_backoff(
+        budget,
+        lambda: client.download_media(msg, bytes),
+        f"download {message_id}",
+        max_retries,
+    )
+    # Hashing and the perceptual hash decode the image; keep them off the loop
+    sha256 = await asyncio.to_thread(image_store.put, data)
+    image_store.link(message_id, sha256, telegram_photo_id(msg))
+    return sha256
+
+
+async def download_worker(client, queue, budget, image_store, max_retries=5):
+    """
+    Download queued photos until a None sentinel arrives. Each item's `done`
+    future is resolved once its photo is stored or given up on, never when the
+    worker is cancelled mid-download.
+    """
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                return
+            msg, message_id, done = item
+            # Another message may have fetched the same photo since this was queued
+            known = image_store.photo(telegram_photo_id(msg))
+            if known is not None:
+                image_store.link(message_id, known)
+            else:
+                try:
+                    await download_photo(
+                        client, msg, message_id, image_store, budget, max_retries
+                    )
+                except Exception as e:
+                    logging.error(f"Failed to download the photo of {message_id}: {e}.")
+            done.set_result(None)
+        finally:
+            queue.task_done()
 
 
 # -------------------- Scrape Logic --------------------
-async def scrape_channel(client, channel_username, msg_limit, test_mode=False):
+def output_root(test_mode=False, base_dir=None):
+    """
+    Folder holding the dated message files, the scrape checkpoints and the
+    shared request budget.
+    """
+    return base_dir or (
+        "../data/test" if test_mode else "../data/raw/telegram_messages"
+    )
+
+
+def image_root(test_mode=False, image_dir=None):
+    """
+    Folder of the image store photos are downloaded to.
+    """
+    return image_dir or ("../data/test/images" if test_mode else "../data/images")
+
+
+def mock_messages(channel_username):
+    """
+    Five dummy messages per channel for test mode, oldest id first.
+    """
+    messages = []
+    for i in range(1, 6):  # Generate 5 messages
+        messages.append(
+            {
+                "channel_title": f"Mock Channel {channel_username[1:]}",
+                "channel_username": channel_username,
+                "id": 1000 + i,
+                "text": f"This is mock message #{i} from {channel_username}",
+                "date": (datetime.now() - timedelta(minutes=i * 5)).isoformat(),
+                "views": i * 10,
+                "media_type": "document" if i == 3 else "photo" if i % 2 else None,
+                "photo_id": None if i % 2 == 0 else 5000 + i,
+            }
+        )
+    return messages
+
+
+async def scrape_channel(
+    client,
+    channel_username,
+    msg_limit,
+    test_mode=False,
+    downloads=None,
+    budget=None,
+    max_retries=5,
+    base_dir=None,
+    image_store=None,
+    checkpoints=None,
+    flush_every=500,
+    compression=None,
+    day=None,
+):
     """
-    Scrapes messages from a given Telegram channel and writes them to a CSV.
+    Scrapes messages from a given Telegram channel and appends them to today's
+    NDJSON message file.
+
+    Only messages newer than the channel's checkpoint are requested, oldest
+    first. Every `flush_every` messages they are appended to the file and the
+    checkpoint is advanced, so a crash loses at most one unflushed batch and the
+    next run resumes where this one stopped. A message whose photo is still in
+    the download queue is held back, with every message after it, until the
+    download is over; an interrupted run fetches it again instead of skipping
+    its photo.
 
     Args:
         client (TelegramClient): The Telegram client.
         channel_username (str): The username of the Telegram channel.
-        msg_limit (int): Messgae Limit for test.
+        msg_limit (int): How many recent messages to fetch on a channel's first run.
+        downloads (asyncio.Queue): Photo download queue; None downloads inline.
+        budget (RequestBudget): Shared request budget; None means unlimited.
+        base_dir (str): Root folder for the dated JSON output.
+        image_store (ImageStore): Where photos are kept; opened at
+            image_root() if None. Photos it already holds are not downloaded.
+        checkpoints (CheckpointStore): Shared checkpoints; loaded from base_dir if None.
+        flush_every (int): Messages buffered between flushes to disk.
+        compression (str): None, "gz" or "zst" for the NDJSON output.
+        day (str): Day folder (YYYY-MM-DD) to write to; defaults to today.
     """
     # Start timer
     start = time.time()
+    budget = budget or RequestBudget(float("inf"))
 
     # Get scraping day
-    today = datetime.today().strftime("%Y-%m-%d")
+    today = day or datetime.today().strftime("%Y-%m-%d")
 
-    base_dir = "../data/test" if test_mode else "../data/raw/telegram_messages"
+    base_dir = output_root(test_mode, base_dir)
+    checkpoints = checkpoints or CheckpointStore(base_dir)
+    image_store = image_store or ImageStore(image_root(test_mode))
     output_dir = os.path.abspath(os.path.join(base_dir, today))
     os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, f"{channel_username[1:]}.json")
+    output_path = message_file_path(output_dir, channel_username[1:], compression)
     pretty_path = Path(output_path).as_posix()  # Polished path print
 
-    if os.path.exists(output_path):
-        logging.info(f"Skipped (already exists): {pretty_path}.")
-        print(f"\n{channel_username} already scraped — skipping.")
-        return
+    # Messages already saved today, e.g. by a run that stopped mid-channel
+    writer = MessageWriter(output_path)
+    seen_ids = set(writer.ids)
+    for path in existing_message_files(output_dir, channel_username[1:]):
+        if path != output_path:
+            seen_ids.update(msg["id"] for msg in read_messages(path))
+    last_id = max([checkpoints.last_id(channel_username), *seen_ids], default=0)
 
-    logging.info(f"Starting scrape: {channel_username}.")
+    logging.info(f"Starting scrape: {channel_username} (after id {last_id}).")
     print((f"\nStarted scraping from {channel_username} ..."))
 
-    messages = []
+    pending = []  # (message, its queued photo download or None)
+    scraped = 0
+    reused = 0  # photos already in the image store
+    high_water = None  # (id, date) of the newest message processed
+
+    def flush():
+        # Save the messages up to the first one whose photo is still downloading
+        nonlocal pending
+        if high_water is None:
+            return
+        ready = 0
+        for _, download in pending:
+            if download is not None and not download.done():
+                break
+            ready += 1
+        batch = [msg for msg, _ in pending[:ready]]
+        pending = pending[ready:]
+        if batch:
+            writer.append(batch)
+            seen_ids.update(msg["id"] for msg in batch)
+        if not pending:
+            checkpoints.update(channel_username, *high_water)
+        elif batch:
+            checkpoints.update(channel_username, batch[-1]["id"], batch[-1]["date"])
+
+    async def drain():
+        # Save the buffered messages as their photos finish downloading
+        while pending:
+            waiting = [
+                done for _, done in pending[: max(1, flush_every)] if done is not None
+            ]
+            if waiting:
+                await asyncio.wait(waiting)
+            flush()
+        flush()
+
     if test_mode:
         # Simulate dummy message
-        for i in range(1, 6):  # Generate 5 messages
-            messages.append(
-                {
-                    "channel_title": f"Mock Channel {channel_username[1:]}",
-                    "channel_username": channel_username,
-                    "id": 1000 + i,
-                    "text": f"This is mock message #{i} from {channel_username}",
-                    "date": (datetime.now() - timedelta(minutes=i * 5)).isoformat(),
-                    "views": i * 10,
-                    "media_type": "document" if i == 3 else "photo" if i % 2 else None,
-                    "media_path": (
-                        None
-                        if i % 2 == 0
-                        else f"/mock/path/{channel_username[1:]}_{i}.jpg"
-                    ),
-                }
-            )
-        print(f"Pretended to scrape 5 messages from {channel_username}")
+        for msg_dict in mock_messages(channel_username):
+            if msg_dict["id"] > last_id:
+                pending.append((msg_dict, None))
+                high_water = (msg_dict["id"], msg_dict["date"])
+        scraped = len(pending)
+        print(f"Pretended to scrape {scraped} messages from {channel_username}")
 
     else:
+        from telethon.errors import FloodWaitError
 
         # Get the channel entity
-        entity = await client.get_entity(channel_username)
+        entity = await with_backoff(
+            budget,
+            lambda: client.get_entity(channel_username),
+            f"get_entity {channel_username}",
+            max_retries,
+        )
         channel_title = entity.title  # Get the channel title
-        # Iterate through messages in the channel (up to a limit)
-        async for msg in client.iter_messages(entity, limit=msg_limit):
-            # Scrap message
-            msg_dict = {
-                "channel_title": channel_title,
-                "channel_username": channel_username,
-                "id": msg.id,
-                "text": msg.message,
-                "date": msg.date.isoformat() if msg.date else None,
-                "views": msg.views or 0,  # Fallback if views is None
-                "media_type": None,
-            }
-            # Check if the message has media and determine its type
-            if msg.media and hasattr(msg.media, "photo"):
-                msg_dict["media_type"] = "photo"
-                image_path = os.path.abspath(
-                    os.path.join(
-                        "..", "data/images", f"{channel_username[1:]}_{msg.id}.jpg"
-                    )
-                )
-                os.makedirs(os.path.dirname(image_path), exist_ok=True)
-                await client.download_media(msg, image_path)
-                msg_dict["media_path"] = image_path  # Optional: include in JSON
-
-            elif msg.media and hasattr(msg.media, "document"):
-                msg_dict["media_type"] = "document"
 
-            messages.append(msg_dict)
+        if not last_id:
+            # First run for this channel: start msg_limit ids below the newest post
+            latest = await with_backoff(
+                budget,
+                lambda: client.get_messages(entity, limit=1),
+                f"latest message {channel_username}",
+                max_retries,
+            )
+            last_id = max(0, latest[0].id - msg_limit) if latest else 0
+
+        # Iterate through messages newer than the checkpoint, oldest first. Each
+        # history page is one request against the budget; a FloodWait
+        # mid-iteration resumes after the last message already seen.
+        attempt = 0
+        while True:
+            try:
+                fetched = 0
+                async for msg in client.iter_messages(
+                    entity, min_id=last_id, reverse=True
+                ):
+                    if fetched % HISTORY_PAGE_SIZE == 0:
+                        await budget.acquire()
+                    fetched += 1
+                    last_id = msg.id
+                    high_water = (msg.id, msg.date.isoformat() if msg.date else None)
+                    if msg.id in seen_ids:
+                        continue
+                    # Scrap message
+                    download = None
+                    msg_dict = {
+                        "channel_title": channel_title,
+                        "channel_username": channel_username,
+                        "id": msg.id,
+                        "text": msg.message,
+                        "date": msg.date.isoformat() if msg.date else None,
+                        "views": msg.views or 0,  # Fallback if views is None
+                        "media_type": None,
+                    }
+                    # Check if the message has media and determine its type
+                    if msg.media and hasattr(msg.media, "photo"):
+                        msg_dict["media_type"] = "photo"
+                        message_id = f"{channel_username[1:]}_{msg.id}"
+                        photo_id = telegram_photo_id(msg)
+                        msg_dict["photo_id"] = photo_id
+                        # Downloaded before a restart, or a repost of a photo
+                        # the store already holds
+                        known = image_store.message_image(message_id)
+                        if known is None and photo_id is not None:
+                            known = image_store.photo(photo_id)
+                            if known is not None:
+                                image_store.link(message_id, known)
+                        if known is not None:
+                            reused += 1
+                        elif downloads is None:
+                            await download_photo(
+                                client,
+                                msg,
+                                message_id,
+                                image_store,
+                                budget,
+                                max_retries,
+                            )
+                        else:
+                            download = asyncio.get_running_loop().create_future()
+                            await downloads.put((msg, message_id, download))
+
+                    elif msg.media and hasattr(msg.media, "document"):
+                        msg_dict["media_type"] = "document"
+
+                    pending.append((msg_dict, download))
+                    scraped += 1
+                    if len(pending) >= flush_every:
+                        flush()
+                break  # caught up with the channel
+            except FloodWaitError as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                logging.warning(
+                    f"FloodWait of {e.seconds}s while iterating {channel_username}."
+                )
+                budget.pause(e.seconds)
+            finally:
+                # Keep what was fetched so far, even if the channel fails
+                flush()
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(messages, f, ensure_ascii=False, indent=2)
+    await drain()
 
     duration = time.time() - start  # End timing after all scraping and saving
     logging.info(f"{channel_username} scraped in {duration:.2f} seconds.")
     print(f"{channel_username} scraped in {duration:.2f} seconds.")
 
-    logging.info(f"Scraped {len(messages)} messages from {channel_username}.")
-    print(f"Scraped {len(messages)} messages from {channel_username}.")
-
-    logging.info(f"Saved to {pretty_path}.")
-    print(f"Scraped data from {channel_username} saved to {pretty_path}.\n")
+    logging.info(f"Scraped {scraped} new messages from {channel_username}.")
+    if reused:
+        logging.info(f"Reused {reused} photos already downloaded.")
+    print(f"Scraped {scraped} new messages from {channel_username}.")
+
+    if scraped:
+        logging.info(f"Saved to {pretty_path}.")
+        print(f"Scraped data from {channel_username} saved to {pretty_path}.\n")
+    return scraped
+
+
+async def scrape_channels(
+    client,
+    channels,
+    msg_limit,
+    test_mode=False,
+    max_channels=3,
+    download_workers=4,
+    requests_per_second=5.0,
+    max_retries=5,
+    base_dir=None,
+    image_dir=None,
+    **channel_options,
+):
+    """
+    Scrape several channels concurrently.
+
+    At most `max_channels` channels iterate at once; photos go to a shared queue
+    drained by `download_workers` tasks, so iteration never waits on a download.
+    Every request draws from one SharedRequestBudget, kept in the output root
+    so scrapers in other processes share it too, and all channels share one
+    CheckpointStore and one ImageStore (at `image_dir`, image_root() by default).
+    Returns {channel: new messages or None}.
+    """
+    base_dir = output_root(test_mode, base_dir)
+    budget = SharedRequestBudget(
+        os.path.join(base_dir, BUDGET_FILE), requests_per_second
+    )
+    checkpoints = CheckpointStore(base_dir)
+    image_store = ImageStore(image_root(test_mode, image_dir))
+    channel_slots = asyncio.Semaphore(max(1, max_channels))
+    downloads = asyncio.Queue(maxsize=200) if download_workers > 0 else None
+    workers = [
+        asyncio.create_task(
+            download_worker(client, downloads, budget, image_store, max_retries)
+        )
+        for _ in range(download_workers if downloads is not None else 0)
+    ]
+
+    async def scrape_one(channel):
+        async with channel_slots:
+            try:
+                return await scrape_channel(
+                    client,
+                    channel,
+                    msg_limit,
+                    test_mode=test_mode,
+                    downloads=downloads,
+                    budget=budget,
+                    max_retries=max_retries,
+                    base_dir=base_dir,
+                    image_store=image_store,
+                    checkpoints=checkpoints,
+                    **channel_options,
+                )
+            except Exception as e:
+                # Catch and print any errors during scraping
+                logging.error(f"Error scraping {channel}: {e}.")
+                print(f"Skipping {channel} due to error: {e}.\n")
+                return None
+
+    try:
+        counts = await asyncio.gather(*(scrape_one(channel) for channel in channels))
+    finally:
+        if downloads is not None:
+            for _ in workers:
+                await downloads.put(None)
+            await asyncio.gather(*workers)
+        image_store.close()
+        budget.close()
+    return dict(zip(channels, counts))
 
 
 # -------------------- Main Routine --------------------#
-async def main():
+CHANNELS = [
+    "@lobelia4cosmetics",
+    "@tikvahpharma",
+    "@yetenaweg",
+    "@ethiopianfoodanddrugauthority",
+    "@CheMed123",
+    "@newoptics",
+]
+TEST_CHANNELS = [
+    "@mock_pharma",
+    "@mock_food",
+    "@mock_optics",
+    "@mock_tena",
+    "@mock_drug",
+]
+
+
+async def scrape(test_mode=False, channels=None, client=None, **options):
     """
-    Main function to initialise the client, set up directories,
-    and scrape data from a list of channels.
+    Initialise the client and scrape a list of channels (every channel by
+    default). Other keyword arguments go to scrape_channels(). Returns
+    {channel: new messages or None}.
     """
-    if not args.test:
+    owns_client = client is None and not test_mode
+    if owns_client:
+        client = create_client()
         await client.start()  # Initialises the connection
 
-    # List of Telegram channels to scrape
     channels = (
-        ["@mock_pharma", "@mock_food", "@mock_optics", "@mock_tena", "@mock_drug"]
-        if args.test
-        else [
-            "@lobelia4cosmetics",
-            "@tikvahpharma",
-            "@yetenaweg",
-            "@ethiopianfoodanddrugauthority",
-            "@CheMed123",
-            "@newoptics",
-        ]
+        ["@" + channel.lstrip("@") for channel in channels]
+        if channels
+        else TEST_CHANNELS if test_mode else CHANNELS
     )
-    msg_limit = 1 if args.test else 10000
-    if args.test:
+    msg_limit = 1 if test_mode else 10000
+    if test_mode:
         print("Test mode ON — reduced scraping for speed.")
 
-    # Iterate through each channel
-    for channel in channels:
-        try:
-            await scrape_channel(client, channel, msg_limit, test_mode=args.test)
-        except Exception as e:
-            # Catch and print any errors during scraping
-            logging.error(f"Error scraping {channel}: {e}.")
-            print(f"Skipping {channel} due to error: {e}.\n")
+    try:
+        counts = await scrape_channels(
+            client, channels, msg_limit, test_mode=test_mode, **options
+        )
+    finally:
+        if owns_client:
+            await client.disconnect()
 
     logging.info("All channels scraped successfully.")
     print("All channels scraped successfully.")
+    return counts
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    configure_logging("scraper.log", console=False)
+    counts = asyncio.run(
+        scrape(
+            test_mode=args.test,
+            channels=args.channel,
+            max_channels=args.max_channels,
+            download_workers=args.download_workers,
+            requests_per_second=args.requests_per_second,
+            max_retries=args.max_retries,
+            flush_every=args.flush_every,
+            compression=args.compress,
+            day=args.date,
+        )
+    )
+    # Exit status: 1 when any channel failed
+    return int(any(count is None for count in counts.values()))
 
 
 # -------------------- Execute --------------------#
 # Run the main asynchronous function
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(main())
@@ -1,57 +1,339 @@
-import json, os
+import io
+import os
+import re
+import sys
+import time
 import psycopg2
 import logging
 import argparse
 from dotenv import load_dotenv
-from datetime import datetime
+from psycopg2.extras import execute_values
+
+try:
+    from scripts.load_manifest import (
+        file_checksum,
+        ensure_manifest,
+        already_loaded,
+        record_load,
+        clear_manifest,
+    )
+    from scripts.message_files import is_message_file, read_messages
+    from scripts.log_setup import configure_logging
+except ImportError:  # executed directly as scripts/_02_data_loader.py
+    from load_manifest import (
+        file_checksum,
+        ensure_manifest,
+        already_loaded,
+        record_load,
+        clear_manifest,
+    )
+    from message_files import is_message_file, read_messages
+    from log_setup import configure_logging
 
 # -------------------- Setup -------------------- #
 parser = argparse.ArgumentParser()
 parser.add_argument("--test", action="store_true", help="Run loader in test mode")
-args = parser.parse_args()
+parser.add_argument(
+    "--method",
+    choices=["copy", "values", "row"],
+    default="copy",
+    help="Insert strategy: COPY FROM STDIN, batched execute_values, or row-at-a-time",
+)
+parser.add_argument(
+    "--batch-size", type=int, default=5000, help="Page size for --method values"
+)
+parser.add_argument(
+    "--mode",
+    choices=["incremental", "full"],
+    default="incremental",
+    help="Upsert only new/changed files, or rebuild the table from every file",
+)
+parser.add_argument("--date", help="Only load one day folder (YYYY-MM-DD)")
+parser.add_argument(
+    "--channel", help="Only load this channel's files (username, with or without @)"
+)
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-base_path = (
-    os.path.join(script_dir, "..", "data", "test")
-    if args.test
-    else os.path.join(script_dir, "..", "data", "raw", "telegram_messages")
-)
-today = datetime.today().strftime("%Y-%m-%d")
-folder_path = os.path.abspath(os.path.join(base_path, today))
 
+# Scraper output folders; anything else under the data root (e.g. the scrape
+# checkpoints) is not message data
+DAY_FOLDER = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
-# Set up and configure logging
-log_dir = os.path.join("..", "logs")
-os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, "loader.log")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.FileHandler(log_path), logging.StreamHandler()],
+COLUMNS = (
+    "channel_title",
+    "channel_username",
+    "id",
+    "text",
+    "date",
+    "views",
+    "media_type",
 )
 
 
+# -------------------- Source Files --------------------#
+def data_root(test_mode=False):
+    """
+    Folder holding the dated message files written by the scraper.
+    """
+    return os.path.abspath(
+        os.path.join(script_dir, "..", "data", "test")
+        if test_mode
+        else os.path.join(script_dir, "..", "data", "raw", "telegram_messages")
+    )
+
+
+def discover_files(base_path, day=None, channel=None):
+    """
+    List message files as (manifest key, absolute path), oldest day first so that
+    later scrapes of the same message win the upsert. Only YYYY-MM-DD folders
+    are listed. `day` and `channel` narrow the listing to one day folder and/or
+    one channel's files.
+    """
+    slug = channel.lstrip("@") if channel else None
+    if not os.path.isdir(base_path):
+        logging.warning(f"No data folder at {base_path}")
+        return []
+    days = [day] if day else sorted(filter(DAY_FOLDER.match, os.listdir(base_path)))
+    files = []
+    for folder in days:
+        folder_path = os.path.join(base_path, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if is_message_file(name) and slug in (None, name.split(".", 1)[0]):
+                files.append((f"{folder}/{name}", os.path.join(folder_path, name)))
+    return files
+
+
+class MessageRows:
+    """
+    Lazily parsed message tuples of one file (NDJSON, compressed NDJSON or a
+    legacy JSON array). Iterate once; `count` holds the rows read so far.
+    Unreadable files raise while iterating.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+
+    def __iter__(self):
+        for msg in read_messages(self.path):
+            self.count += 1
+            yield tuple(msg[column] for column in COLUMNS)
+
+
+def _copy_field(value):
+    # Postgres COPY text format: \N for NULL, backslash-escape control characters
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class CopyStream(io.TextIOBase):
+    """
+    File-like adapter that encodes rows lazily for cursor.copy_expert().
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += "\t".join(_copy_field(v) for v in row) + "\n"
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def insert_rows(cursor, table_name, rows, method, batch_size=5000):
+    """
+    Insert message rows into `table_name` with the chosen strategy.
+    """
+    column_list = ", ".join(COLUMNS)
+    if method == "copy":
+        cursor.copy_expert(
+            f"COPY {table_name} ({column_list}) FROM STDIN", CopyStream(rows)
+        )
+    elif method == "values":
+        execute_values(
+            cursor,
+            f"INSERT INTO {table_name} ({column_list}) VALUES %s",
+            rows,
+            page_size=batch_size,
+        )
+    else:
+        placeholders = ", ".join(["%s"] * len(COLUMNS))
+        for row in rows:
+            cursor.execute(
+                f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})",
+                row,
+            )
+
+
+# -------------------- Table Setup --------------------#
+def create_message_table(cursor, table_name):
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            channel_title TEXT,
+            channel_username TEXT NOT NULL,
+            id BIGINT NOT NULL,
+            text TEXT,
+            date TIMESTAMP,
+            views INTEGER,
+            media_type TEXT,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (channel_username, id)
+        );
+    """
+    )
+
+
+def ensure_message_table(cursor, table_name):
+    """
+    Create the target table, or upgrade one built by the old drop-and-reload
+    loader: add loaded_at, drop duplicate messages and add the primary key.
+    """
+    cursor.execute("CREATE SCHEMA IF NOT EXISTS raw;")
+    cursor.execute("SELECT to_regclass(%s);", (table_name,))
+    if cursor.fetchone()[0] is None:
+        create_message_table(cursor, table_name)
+        create_loaded_at_index(cursor, table_name)
+        return
+
+    cursor.execute(
+        f"ALTER TABLE {table_name} "
+        "ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMPTZ NOT NULL DEFAULT now();"
+    )
+    cursor.execute(
+        "SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p';",
+        (table_name,),
+    )
+    if cursor.fetchone() is None:
+        logging.info(f"Adding primary key (channel_username, id) to {table_name}...")
+        cursor.execute(
+            f"""
+            DELETE FROM {table_name} a
+            USING {table_name} b
+            WHERE a.channel_username = b.channel_username
+              AND a.id = b.id
+              AND a.ctid < b.ctid;
+        """
+        )
+        cursor.execute(
+            f"ALTER TABLE {table_name} ADD PRIMARY KEY (channel_username, id);"
+        )
+    create_loaded_at_index(cursor, table_name)
+
+
+def create_loaded_at_index(cursor, table_name):
+    """
+    Index loaded_at, the watermark incremental dbt models filter on.
+    """
+    index_name = f"{table_name.split('.')[1]}_loaded_at_idx"
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} (loaded_at);"
+    )
+
+
+def upsert_rows(cursor, table_name, rows, method, batch_size=5000):
+    """
+    Merge message rows into table_name through a temporary incoming table.
+
+    Existing messages are only rewritten (and loaded_at bumped) when a value
+    actually changed, e.g. the view count of a re-scraped message.
+    """
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE IF NOT EXISTS incoming_messages
+        (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;
+    """
+    )
+    cursor.execute("TRUNCATE incoming_messages;")
+    insert_rows(cursor, "incoming_messages", rows, method, batch_size)
+
+    column_list = ", ".join(COLUMNS)
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in COLUMNS
+        if column not in ("channel_username", "id")
+    )
+    changed = " OR ".join(
+        f"target.{column} IS DISTINCT FROM EXCLUDED.{column}" for column in COLUMNS
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO {table_name} AS target ({column_list})
+        SELECT DISTINCT ON (channel_username, id) {column_list}
+        FROM incoming_messages
+        ORDER BY channel_username, id
+        ON CONFLICT (channel_username, id) DO UPDATE
+        SET {updates}, loaded_at = now()
+        WHERE {changed};
+    """
+    )
+    return cursor.rowcount
+
+
 # -------------------- Main Function --------------------#
-def load_telegram_messages():
+def connect(test_mode=False):
+    """
+    Open a connection to the test or production database named in .env.
+    """
     logging.info("Loading environment variables...")
-    env_path = os.path.abspath(os.path.join(script_dir, "..", ".env"))
-    load_dotenv(env_path)
-
+    load_dotenv(os.path.abspath(os.path.join(script_dir, "..", ".env")))
     logging.info(f"POSTGRES_DB_TEST from env: {os.getenv('POSTGRES_DB_TEST')}")
+    return psycopg2.connect(
+        dbname=os.getenv("POSTGRES_DB_TEST") if test_mode else os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+    )
+
+
+def load_telegram_messages(
+    test_mode=False,
+    method="copy",
+    batch_size=5000,
+    mode="incremental",
+    day=None,
+    channel=None,
+    conn=None,
+):
+    """
+    Load the scraped message files into raw.telegram_messages (or the _test
+    table in test mode).
 
-    table_name = "raw.telegram_messages_test" if args.test else "raw.telegram_messages"
+    Args:
+        conn: Open connection to use, e.g. from a pool; it is left open. When
+            None a connection is opened from .env and closed afterwards.
+
+    Returns (messages read, rows inserted or updated), or None when the
+    database could not be set up or a full load was rolled back.
+    """
+    table_name = "raw.telegram_messages_test" if test_mode else "raw.telegram_messages"
+    owns_connection = conn is None
 
     try:
-        conn = psycopg2.connect(
-            dbname=(
-                os.getenv("POSTGRES_DB_TEST") if args.test else os.getenv("POSTGRES_DB")
-            ),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            host=os.getenv("POSTGRES_HOST"),
-            port=os.getenv("POSTGRES_PORT"),
-        )
+        if owns_connection:
+            conn = connect(test_mode)
         cursor = conn.cursor()
         logging.info("Connected to PostgreSQL database.")
     except Exception as e:
@@ -59,72 +341,127 @@ def load_telegram_messages():
         return
 
     try:
-        logging.info("Ensuring raw schema and telegram_messages table exist...")
-        cursor.execute("CREATE SCHEMA IF NOT EXISTS raw;")
-        cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
-        cursor.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                channel_title TEXT,
-                channel_username TEXT,
-                id BIGINT,
-                text TEXT,
-                date TIMESTAMP,
-                views INTEGER,
-                media_type TEXT
-            );
-        """
-        )
+        logging.info(f"Ensuring {table_name} and the load manifest exist...")
+        # Loaders for different channels may start together; serialise the DDL
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (table_name,))
+        ensure_manifest(cursor)
+        if mode == "incremental":
+            ensure_message_table(cursor, table_name)
+        conn.commit()
         logging.info("Schema and table setup completed.")
     except Exception as e:
         logging.error(f"Error during schema/table creation: {e}")
+        conn.rollback()
+        if owns_connection:
+            conn.close()
         return
 
-    # Load messages from JSON files
-    logging.info("Loading messages from JSON files...")
-    data_paths = [
-        os.path.join(folder_path, f)
-        for f in os.listdir(folder_path)
-        if f.endswith(".json")
-    ]
-
-    total_inserted = 0
-    for path in data_paths:
-        if not os.path.exists(path):
-            logging.warning(f"File not found: {path}")
-            continue
+    files = discover_files(data_root(test_mode), day, channel)
+    logging.info(f"Found {len(files)} message files ({mode} load, method '{method}').")
+
+    start = time.perf_counter()
+    load = rebuild_table if mode == "full" else merge_new_files
+    totals = load(conn, cursor, table_name, files, method, batch_size)
+    duration = time.perf_counter() - start
+
+    cursor.close()
+    if owns_connection:
+        conn.close()
+    if totals is None:
+        return
+    total_read, total_written = totals
+    rate = total_read / duration if duration else 0.0
+    logging.info(
+        f"Load complete: {total_read} messages read, {total_written} inserted or "
+        f"updated in {duration:.2f} seconds ({rate:,.0f} rows/sec, method={method})."
+    )
+    return total_read, total_written
 
-        logging.info(f"Loading messages from {path}")
+
+def merge_new_files(conn, cursor, table_name, files, method, batch_size):
+    """
+    Upsert each new or changed file in its own transaction.
+    """
+    total_read = total_written = 0
+    for file_key, path in files:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                messages = json.load(f)
-                for msg in messages:
-                    cursor.execute(
-                        f"""
-                        INSERT INTO {table_name} (
-                            channel_title, channel_username, id, text, date, views, media_type
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            msg["channel_title"],
-                            msg["channel_username"],
-                            msg["id"],
-                            msg["text"],
-                            msg["date"],
-                            msg["views"],
-                            msg["media_type"],
-                        ),
-                    )
-                    total_inserted += 1
+            checksum = file_checksum(path)
+            if already_loaded(cursor, table_name, file_key, checksum):
+                logging.info(f"Skipped (already loaded): {file_key}")
+                continue
+            logging.info(f"Loading messages from {path}")
+            rows = MessageRows(path)
+            written = upsert_rows(cursor, table_name, rows, method, batch_size)
+            record_load(cursor, table_name, file_key, checksum, rows.count)
+            conn.commit()
         except Exception as e:
+            conn.rollback()
             logging.error(f"Failed to process {path}: {e}")
+            continue
+        total_read += rows.count
+        total_written += written
+    return total_read, total_written
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    logging.info(f"Load complete: {total_inserted} messages inserted.")
+
+def rebuild_table(conn, cursor, table_name, files, method, batch_size):
+    """
+    Rebuild the table from every file in a staging table and swap it in.
+
+    Everything runs in one transaction: readers keep seeing the old table
+    until the staging table replaces it at commit. Returns None when the load
+    was rolled back.
+    """
+    staging_name = f"{table_name}_staging"
+    total_read = total_written = 0
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_name};")
+        create_message_table(cursor, staging_name)
+        clear_manifest(cursor, table_name)
+        for file_key, path in files:
+            logging.info(f"Loading messages from {path}")
+            # Files are parsed while they stream into Postgres, so a bad file
+            # is only discovered mid-insert: roll back just that file
+            cursor.execute("SAVEPOINT file_load;")
+            try:
+                checksum = file_checksum(path)
+                rows = MessageRows(path)
+                written = upsert_rows(cursor, staging_name, rows, method, batch_size)
+                record_load(cursor, table_name, file_key, checksum, rows.count)
+            except (OSError, ValueError, KeyError, psycopg2.Error) as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT file_load;")
+                logging.error(f"Failed to process {path}: {e}")
+                continue
+            cursor.execute("RELEASE SAVEPOINT file_load;")
+            total_written += written
+            total_read += rows.count
+        # Dependent dbt views are dropped with the old table; dbt run recreates them
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name} CASCADE;")
+        cursor.execute(
+            f"ALTER TABLE {staging_name} RENAME TO {table_name.split('.')[1]};"
+        )
+        create_loaded_at_index(cursor, table_name)
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Full load failed, keeping previous table: {e}")
+        conn.rollback()
+        return
+    return total_read, total_written
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    configure_logging("loader.log")
+    result = load_telegram_messages(
+        test_mode=args.test,
+        method=args.method,
+        batch_size=args.batch_size,
+        mode=args.mode,
+        day=args.date,
+        channel=args.channel,
+    )
+    return 1 if result is None else 0
 
 
 # -------------------- Execute --------------------#
 if __name__ == "__main__":
-    load_telegram_messages()
+    sys.exit(main())
@@ -1,77 +1,282 @@
 import os
+import sys
 import json
+import time
+import shutil
 import psycopg2
 import logging
 import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from dotenv import load_dotenv
-from ultralytics import YOLO
+
+try:
+    from scripts.detection_cache import (
+        DetectionCache,
+        model_fingerprint,
+        model_version,
+    )
+    from scripts.image_store import ImageStore
+    from scripts.tensor_cache import (
+        SHARD_IMAGES,
+        TensorCache,
+        letterbox,
+        restore_boxes,
+    )
+    from scripts.log_setup import configure_logging
+except ImportError:  # executed directly as scripts/_03_data_enricher.py
+    from detection_cache import DetectionCache, model_fingerprint, model_version
+    from image_store import ImageStore
+    from tensor_cache import SHARD_IMAGES, TensorCache, letterbox, restore_boxes
+    from log_setup import configure_logging
 
 # Specify directory
 root_dir = os.path.abspath(os.path.join(".."))
 
-# Set up and configure logging
-log_dir = os.path.join(root_dir, "logs")
-os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, "enricher.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.FileHandler(log_path), logging.StreamHandler()],
-)
-
 # Set up test
 parser = argparse.ArgumentParser()
 parser.add_argument("--test", action="store_true", help="Run enricher in test mode")
-args = parser.parse_args()
-
-# Class input directory
-image_base_path = (
-    os.path.join(root_dir, "data", "test", "images")
-    if args.test
-    else os.path.join(root_dir, "data", "images")
+parser.add_argument(
+    "--model",
+    action="append",
+    help="YOLO weights to run (repeatable; every model sees each decoded image "
+    "once); defaults to yolov8n.pt",
 )
-
-output_base_path = (
-    os.path.join(root_dir, "data", "test", "fct_image_detections.json")
-    if args.test
-    else os.path.join(root_dir, "data", "processed", "fct_image_detections.json")
+parser.add_argument("--batch-size", type=int, default=16, help="Images per model call")
+parser.add_argument(
+    "--workers", type=int, default=4, help="Threads decoding images ahead of the model"
+)
+parser.add_argument(
+    "--shards",
+    type=int,
+    default=1,
+    help="Worker processes, each running its own model on a slice of the images",
+)
+parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Disable the detection cache and run the model on every image",
+)
+parser.add_argument(
+    "--refresh",
+    action="store_true",
+    help="Ignore cached detections but write fresh ones back to the cache",
+)
+parser.add_argument(
+    "--channel",
+    help="Only enrich this channel's images and write them to their own output file",
+)
+parser.add_argument(
+    "--imgsz", type=int, default=640, help="Side of the square model input"
 )
+parser.add_argument(
+    "--tensor-cache",
+    action="store_true",
+    help="Keep letterboxed inputs in memory-mapped shards for later runs "
+    "(about 1.2 MB per image at 640)",
+)
+parser.add_argument(
+    "--tensor-shard-images",
+    type=int,
+    default=SHARD_IMAGES,
+    help="Letterboxed inputs held in memory per tensor cache shard",
+)
+parser.add_argument(
+    "--exact-duplicates",
+    action="store_true",
+    help="Only share detections between byte-identical images, not near-duplicates",
+)
+
+
+def image_root(test_mode=False):
+    """
+    Image store the scraper downloads photos to.
+    """
+    if test_mode:
+        return os.path.join(root_dir, "data", "test", "images")
+    return os.path.join(root_dir, "data", "images")
+
+
+def detections_path(test_mode=False, channel=None):
+    """
+    NDJSON output file. Enriching a single channel writes its own file, so
+    enrichers for different channels can run at once.
+    """
+    name = (
+        f"fct_image_detections_{channel.lstrip('@')}.ndjson"
+        if channel
+        else "fct_image_detections.ndjson"
+    )
+    if test_mode:
+        return os.path.join(root_dir, "data", "test", name)
+    return os.path.join(root_dir, "data", "processed", name)
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock seconds and item counts per pipeline stage.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, items):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.items[stage] = self.items.get(stage, 0) + items
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.seconds), dict(self.items)
+
+    def merge(self, snapshot):
+        seconds, items = snapshot
+        for stage in seconds:
+            self.add(stage, seconds[stage], items[stage])
+
+    def log(self, wall_seconds, total):
+        for stage, seconds in self.seconds.items():
+            rate = self.items[stage] / seconds if seconds else 0.0
+            logging.info(
+                f"Stage {stage}: {self.items[stage]} images in {seconds:.2f}s "
+                f"({rate:.1f} images/sec)"
+            )
+        rate = total / wall_seconds if wall_seconds else 0.0
+        logging.info(
+            f"End-to-end: {total} images in {wall_seconds:.2f}s ({rate:.1f} images/sec)"
+        )
 
 
 class DataEnricher:
     def __init__(
         self,
         model_path="yolov8n.pt",
-        image_dir=image_base_path,
-        output_path=output_base_path,
+        image_dir=None,
+        output_path=None,
+        batch_size=16,
+        prefetch_workers=4,
+        shards=1,
+        cache_path=None,
+        use_cache=True,
+        refresh=False,
+        test_mode=False,
+        channel=None,
+        model=None,
+        near_duplicates=True,
+        image_size=640,
+        tensor_cache_path=None,
+        use_tensor_cache=False,
+        tensor_shard_images=SHARD_IMAGES,
     ):
         """
         Initialise the DataEnricher with model path, image directory, and output file path.
 
         Args:
-            model_path (str): Path to the YOLO model.
-            image_dir (str): Directory containing images to process.
-            output_path (str): Path to save the enriched data.
+            model_path (str | list): Path to the YOLO model, or a list of paths
+                to run every model in one pass over the images. Detections are
+                tagged with model_version(path).
+            image_dir (str): Image store holding the photos; defaults to
+                image_root().
+            output_path (str): NDJSON file the detections are streamed to;
+                defaults to detections_path().
+            batch_size (int): Number of images passed to the model per call.
+            prefetch_workers (int): Threads decoding images ahead of inference.
+            shards (int): Processes to split the images across (1 = in-process).
+            cache_path (str): Detection cache file; defaults to
+                detection_cache.sqlite next to output_path.
+            use_cache (bool): Skip inference for images already in the cache.
+            refresh (bool): Re-run inference even on cache hits.
+            test_mode (bool): Read messages from the test database.
+            channel (str): Only enrich this channel's images.
+            model: Already loaded YOLO model (or list of models, one per
+                model_path) to use instead of loading model_path, e.g. one
+                shared by several runs.
+            near_duplicates (bool): Infer once per group of near-duplicate
+                images rather than once per byte-identical image.
+            image_size (int): Side of the square images are letterboxed to
+                before inference.
+            tensor_cache_path (str): Letterboxed input cache folder; defaults
+                to tensor_cache next to output_path.
+            use_tensor_cache (bool): Read letterboxed inputs from the tensor
+                cache and add the ones it lacks.
+            tensor_shard_images (int): Letterboxed inputs the tensor cache holds
+                in memory before writing them out as a shard.
+
+        The image store and caches stay open until close(); use the enricher
+        as a context manager to close them on every path.
         """
-        load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
+        self.test_mode = test_mode
+        self.channel = channel.lstrip("@") if channel else None
+        self.model_paths = (
+            [model_path] if isinstance(model_path, str) else list(model_path)
+        )
+        self.image_dir = image_dir or image_root(test_mode)
+        self.near_duplicates = near_duplicates
+        self.output_path = output_path or detections_path(test_mode, channel)
+        self.batch_size = max(1, batch_size)
+        self.prefetch_workers = max(1, prefetch_workers)
+        self.shards = max(1, shards)
+        if model is None:
+            from ultralytics import YOLO  # pulls in torch; only import when needed
+
+            model = [YOLO(path) for path in self.model_paths]
+        elif not isinstance(model, (list, tuple)):
+            model = [model]
+        # (version, model, cache fingerprint) per model, in model_path order
+        self.models = [
+            (
+                model_version(path),
+                loaded,
+                model_fingerprint(getattr(loaded, "ckpt_path", None) or path),
+            )
+            for path, loaded in zip(self.model_paths, model)
+        ]
+        versions = [version for version, _, _ in self.models]
+        if len(set(versions)) != len(versions):
+            raise ValueError(f"Model versions must be unique: {versions}")
+        self.detection_count = 0
+        self._output = None
+        self._output_lock = threading.Lock()
+        self.timer = StageTimer()
 
-        self.image_dir = image_dir
-        self.output_path = output_path
-        self.model = YOLO(model_path)
-        self.results = []
+        self.refresh = refresh
+        self.cache_path = cache_path or os.path.join(
+            os.path.dirname(self.output_path), "detection_cache.sqlite"
+        )
+        self.image_size = image_size
+        self.tensor_cache_path = tensor_cache_path or os.path.join(
+            os.path.dirname(self.output_path), "tensor_cache"
+        )
+
+        # Opened once the models are loaded, and closed again if one fails
+        self.image_store = self.cache = self.tensors = None
+        try:
+            self.image_store = ImageStore(self.image_dir)
+            if use_cache:
+                self.cache = DetectionCache(self.cache_path)
+            if use_tensor_cache:
+                self.tensors = TensorCache(
+                    self.tensor_cache_path, image_size, tensor_shard_images
+                )
+        except Exception:
+            self.close()
+            raise
 
-        logging.info("YOLO model initialised.")
+        logging.info(f"YOLO models initialised: {', '.join(versions)}.")
 
     def connect_db(self):
         """
         Connect to the PostgreSQL database.
         """
+        load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
         try:
             conn = psycopg2.connect(
                 dbname=(
                     os.getenv("POSTGRES_DB_TEST")
-                    if args.test
+                    if self.test_mode
                     else os.getenv("POSTGRES_DB")
                 ),
                 user=os.getenv("POSTGRES_USER"),
@@ -85,81 +290,404 @@ class DataEnricher:
             logging.error(f"DB connection error: {e}")
             return None
 
-    def fetch_messages_with_images(self):
+    def fetch_messages_with_images(self, conn=None):
         """
-        Fetch messages from the database that contain images.
+        Fetch messages from the database that contain images. `conn` is an open
+        connection to use (left open); when None one is opened and closed.
         """
-        conn = self.connect_db()
+        owns_connection = conn is None
+        if owns_connection:
+            conn = self.connect_db()
         if not conn:
             return []
 
         query = """
             SELECT message_id
             FROM raw_marts.fct_messages
-            WHERE has_image IS TRUE;
+            WHERE has_image IS TRUE
+              AND (%(channel)s IS NULL OR channel_slug = %(channel)s);
         """
         try:
             with conn.cursor() as cursor:
-                cursor.execute(query)
+                cursor.execute(query, {"channel": self.channel})
                 rows = cursor.fetchall()
-                conn.close()
-                return [row[0] for row in rows]
+            return [row[0] for row in rows]
         except Exception as e:
             logging.error(f"Failed to fetch messages: {e}")
             return []
+        finally:
+            if owns_connection:
+                conn.close()
+
+    def group_images(self, message_ids):
+        """
+        Map each unique image to the messages that post it, as
+        [(sha256, [message_id, ...])]. Photos saved as <message_id>.jpg by
+        earlier scrapers are imported into the store on the way.
+        """
+        groups, missing = self.image_store.group_messages(
+            message_ids, self.near_duplicates
+        )
+        imported = 0
+        for message_id in missing:
+            legacy_path = os.path.join(self.image_dir, f"{message_id}.jpg")
+            if os.path.exists(legacy_path):
+                self.image_store.link(
+                    message_id, self.image_store.put_file(legacy_path)
+                )
+                imported += 1
+            else:
+                logging.warning(f"Missing image for {message_id}")
+        if imported:
+            groups, _ = self.image_store.group_messages(
+                message_ids, self.near_duplicates
+            )
+        return list(groups.items())
+
+    def load_image(self, sha256, message_ids):
+        """
+        Read one stored image, letterboxed to the model input size.
+
+        Returns (sha256, message_ids, image, transform, versions): the letterbox
+        transform restore_boxes() needs, and the versions of the models still
+        to run on the image. Detections cached for the other models are emitted
+        for every message straight away. The image is None when the file is
+        unreadable or every model's detections were cached. Letterboxed images
+        come from the tensor cache when it has them.
+        """
+        start = time.perf_counter()
+        versions = []
+        for version, _, fingerprint in self.models:
+            cached = None
+            if self.cache is not None and not self.refresh:
+                cached = self.cache.get(sha256, fingerprint)
+            if cached is None:
+                versions.append(version)
+                continue
+            for message_id in message_ids:
+                self.emit(message_id, version, cached)
+        if len(versions) < len(self.models):
+            self.timer.add("cache", time.perf_counter() - start, 1)
+        if not versions:
+            return sha256, message_ids, None, None, versions
+
+        if self.tensors is not None:
+            hit = self.tensors.get(sha256)
+            if hit is not None:
+                self.timer.add("tensor", time.perf_counter() - start, 1)
+                return (sha256, message_ids, *hit, versions)
+
+        import cv2
+
+        image_path = self.image_store.path(sha256)
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            logging.warning(f"Unreadable image: {image_path}")
+            return sha256, message_ids, None, None, versions
+        image, transform = letterbox(image, self.image_size)
+        if self.tensors is not None:
+            self.tensors.add(sha256, image, transform)
+        self.timer.add("decode", time.perf_counter() - start, 1)
+        return sha256, message_ids, image, transform, versions
+
+    def emit(self, message_id, version, detections):
+        """
+        Append one model's detections for a message to the NDJSON output, one
+        object per line. The file is truncated on the first write of a run.
+        """
+        lines = "".join(
+            json.dumps({"message_id": message_id, "model_version": version, **d}) + "\n"
+            for d in detections
+        )
+        with self._output_lock:
+            self._open_output()
+            self._output.write(lines)
+            self.detection_count += len(detections)
+
+    def _open_output(self):
+        if self._output is None:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+            self._output = open(self.output_path, "w", encoding="utf-8")
+
+    def flush_output(self):
+        with self._output_lock:
+            if self._output is not None:
+                self._output.flush()
+
+    def iter_batches(self, images):
+        """
+        Yield batches of load_image() results for the (sha256, message_ids)
+        pairs in `images`.
+
+        A thread pool decodes up to two batches ahead of the consumer, so
+        inference on one batch overlaps with decoding the next.
+        """
+        window = self.batch_size * 2
+        pending = deque()
+        batch = []
+        remaining = iter(images)
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers) as executor:
+
+            def submit():
+                item = next(remaining, None)
+                if item is not None:
+                    pending.append(executor.submit(self.load_image, *item))
+
+            for _ in range(window):
+                submit()
+            while pending:
+                loaded = pending.popleft().result()
+                submit()
+                if loaded[2] is not None:
+                    batch.append(loaded)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def enrich_batch(self, batch):
+        """
+        Run object detection on a batch of decoded images, one call per model
+        that still needs them, and emit the detections for every message
+        posting each image.
+        """
+        for version, model, fingerprint in self.models:
+            items = [loaded for loaded in batch if version in loaded[4]]
+            if not items:
+                continue
+            try:
+                start = time.perf_counter()
+                predictions = model(
+                    [loaded[2] for loaded in items],
+                    imgsz=self.image_size,
+                    verbose=False,
+                )
+                self.timer.add(
+                    f"inference {version}", time.perf_counter() - start, len(items)
+                )
+            except Exception as e:
+                logging.error(
+                    f"{version} failed on the batch starting {items[0][0]}: {e}"
+                )
+                continue
+
+            start = time.perf_counter()
+            cache_entries = []
+            for (digest, message_ids, _, transform, _), prediction in zip(
+                items, predictions
+            ):
+                boxes = prediction.boxes
+                classes = boxes.cls.tolist()
+                confidences = boxes.conf.tolist()
+                coordinates = restore_boxes(boxes.xyxy.tolist(), transform)
+                detections = [
+                    {
+                        "detected_object": model.names[int(cls)],
+                        "confidence_score": round(float(conf), 4),
+                        "bbox": bbox,
+                    }
+                    for cls, conf, bbox in zip(classes, confidences, coordinates)
+                ]
+                for message_id in message_ids:
+                    self.emit(message_id, version, detections)
+                cache_entries.append((digest, detections))
+            if self.cache is not None:
+                self.cache.put_many(fingerprint, cache_entries)
+            self.timer.add("postprocess", time.perf_counter() - start, len(items))
+        self.flush_output()  # a crash keeps every finished batch
 
     def enrich_image(self, message_id):
         """
         Enrich the image associated with a message ID by performing object detection.
         """
-        image_path = os.path.join(self.image_dir, f"{message_id}.jpg")
-        if not os.path.exists(image_path):
-            logging.warning(f"Missing image: {image_path}")
-            return
+        for sha256, message_ids in self.group_images([message_id]):
+            loaded = self.load_image(sha256, message_ids)
+            if loaded[2] is not None:
+                self.enrich_batch([loaded])
 
+    def process_images(self, images):
         try:
-            results = self.model(image_path, verbose=False)[0]
-            for box in results.boxes:
-                obj = {
-                    "message_id": message_id,
-                    "detected_object": self.model.names[int(box.cls[0])],
-                    "confidence_score": round(float(box.conf[0]), 4),
-                    "bbox": box.xyxy[0].tolist(),
-                }
-                self.results.append(obj)
-        except Exception as e:
-            logging.error(f"Failed detection for {message_id}: {e}")
+            for batch in self.iter_batches(images):
+                self.enrich_batch(batch)
+        finally:
+            if self.tensors is not None:
+                self.tensors.flush()
 
-    def process_all(self):
+    def process_all(self, conn=None):
         """
-        Process all images for enrichment.
+        Process all images for enrichment. `conn` is passed on to
+        fetch_messages_with_images().
         """
         logging.info("Starting enrichment...")
-        message_ids = self.fetch_messages_with_images()
-        for message_id in message_ids:
-            self.enrich_image(message_id)
-        logging.info(f"Finished enrichment for {len(message_ids)} images.")
+        start = time.perf_counter()
+        if self.cache is not None:
+            stale = sum(
+                self.cache.invalidate_stale(fingerprint)
+                for _, _, fingerprint in self.models
+            )
+            if stale:
+                logging.info(f"Dropped {stale} cached detections from older weights.")
+        message_ids = self.fetch_messages_with_images(conn)
+        images = self.group_images(message_ids)
+        logging.info(
+            f"{len(message_ids)} messages with images share {len(images)} unique images."
+        )
+        shards = min(self.shards, len(images))
+        try:
+            if shards > 1:
+                self.process_sharded(images, shards)
+            else:
+                with self._output_lock:
+                    self._open_output()  # replace last run's file even if empty
+                self.process_images(images)
+        finally:
+            self.close_output()
+        self.timer.log(time.perf_counter() - start, len(images))
+        logging.info(f"Finished enrichment for {len(message_ids)} messages.")
 
-    def save_results(self):
+    def process_sharded(self, images, shards):
         """
-        Save the enriched results to a JSON file.
+        Split the images across worker processes, each with its own model copy.
         """
+        logging.info(f"Sharding {len(images)} images across {shards} processes.")
+        threads = max(1, (os.cpu_count() or shards) // shards)
+        part_paths = [f"{self.output_path}.part{i}" for i in range(shards)]
+        options = dict(
+            model_path=self.model_paths,
+            image_dir=self.image_dir,
+            batch_size=self.batch_size,
+            prefetch_workers=self.prefetch_workers,
+            torch_threads=threads,
+            cache_path=self.cache_path if self.cache is not None else None,
+            refresh=self.refresh,
+            image_size=self.image_size,
+            tensor_cache_path=self.tensor_cache_path if self.tensors else None,
+            tensor_shard_images=self.tensors.shard_images if self.tensors else None,
+        )
+        with ProcessPoolExecutor(max_workers=shards) as executor:
+            futures = [
+                executor.submit(
+                    enrich_shard, images[i::shards], part_paths[i], **options
+                )
+                for i in range(shards)
+            ]
+            for future in futures:
+                count, timings = future.result()
+                self.detection_count += count
+                self.timer.merge(timings)
+
+        # Stitch the shard files together without loading them into memory
         os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
-        if not self.results:
+        with open(self.output_path, "w", encoding="utf-8") as output:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    with open(part_path, "r", encoding="utf-8") as part:
+                        shutil.copyfileobj(part, output)
+                    os.remove(part_path)
+
+    def close_output(self):
+        with self._output_lock:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+
+    def close(self):
+        """
+        Close the output file, the image store and the caches. The tensor cache
+        writes out the inputs it still holds first.
+        """
+        try:
+            self.close_output()
+            if self.tensors is not None:
+                self.tensors.close()
+        finally:
+            for store in (self.cache, self.image_store):
+                if store is not None:
+                    store.close()
+            self.image_store = self.cache = self.tensors = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save_results(self):
+        """
+        Finish the NDJSON output. Detections are written as they are produced,
+        so this only closes the file and reports what was saved.
+        """
+        self.close_output()
+        if not self.detection_count:
             logging.warning("No results to save.")
             return
-        try:
-            with open(self.output_path, "w", encoding="utf-8") as f:
-                json.dump(self.results, f, indent=2)
+        logging.info(
+            f"Saved {self.detection_count} detections to {os.path.relpath(self.output_path)}"
+        )
 
-            logging.info(
-                f"Saved {len(self.results)} detections to {os.path.relpath(self.output_path)}"
-            )
-        except Exception as e:
-            logging.error(f"Failed to save detections: {e}")
+
+def enrich_shard(
+    images,
+    output_path,
+    model_path,
+    image_dir,
+    batch_size,
+    prefetch_workers,
+    torch_threads,
+    cache_path,
+    refresh,
+    image_size,
+    tensor_cache_path,
+    tensor_shard_images,
+):
+    """
+    Worker-process entry point: enrich one shard into its own NDJSON file and
+    return the detection count and stage timings.
+    """
+    import torch
+
+    torch.set_num_threads(torch_threads)  # avoid oversubscribing the CPU
+    with DataEnricher(
+        model_path=model_path,
+        image_dir=image_dir,
+        output_path=output_path,
+        batch_size=batch_size,
+        prefetch_workers=prefetch_workers,
+        shards=1,
+        cache_path=cache_path,
+        use_cache=cache_path is not None,
+        refresh=refresh,
+        image_size=image_size,
+        tensor_cache_path=tensor_cache_path,
+        use_tensor_cache=tensor_cache_path is not None,
+        tensor_shard_images=tensor_shard_images or SHARD_IMAGES,
+    ) as enricher:
+        enricher.process_images(images)
+    return enricher.detection_count, enricher.timer.snapshot()
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    configure_logging("enricher.log")
+    with DataEnricher(
+        model_path=args.model or "yolov8n.pt",
+        batch_size=args.batch_size,
+        prefetch_workers=args.workers,
+        shards=args.shards,
+        use_cache=not args.no_cache,
+        refresh=args.refresh,
+        test_mode=args.test,
+        channel=args.channel,
+        near_duplicates=not args.exact_duplicates,
+        image_size=args.imgsz,
+        use_tensor_cache=args.tensor_cache,
+        tensor_shard_images=args.tensor_shard_images,
+    ) as enricher:
+        enricher.process_all()
+        enricher.save_results()
+    return 0
 
 
 if __name__ == "__main__":
-    enricher = DataEnricher()
-    enricher.process_all()
-    enricher.save_results()
+    sys.exit(main())
@@ -1,125 +1,362 @@
 import json, os
+import re
+import sys
+import hashlib
+import itertools
 import psycopg2
 import logging
 import argparse
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
 
-# Specify directory
-root_dir = os.path.abspath(os.path.join(".."))
-
-# Set up and configure logging
-log_dir = os.path.join(root_dir, "logs")
-os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, "enriched_loader.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.FileHandler(log_path), logging.StreamHandler()],
-)
+try:
+    from scripts.load_manifest import (
+        file_checksum,
+        ensure_manifest,
+        already_loaded,
+        record_load,
+    )
+    from scripts.log_setup import configure_logging
+except ImportError:  # executed directly as scripts/_03_enriched_data_loader.py
+    from load_manifest import (
+        file_checksum,
+        ensure_manifest,
+        already_loaded,
+        record_load,
+    )
+    from log_setup import configure_logging
 
 # Set up test
 parser = argparse.ArgumentParser()
 parser.add_argument("--test", action="store_true", help="Run loader in test mode")
-args = parser.parse_args()
+parser.add_argument(
+    "--batch-size", type=int, default=5000, help="Detections per upsert batch"
+)
+parser.add_argument(
+    "--channel", help="Load the detections file the enricher wrote for this channel"
+)
+
+TABLE_NAME = "enriched.fct_image_detections"
+
+# Messages whose stale detections were deleted, so the dbt models can drop and
+# re-aggregate them without scanning the whole table
+DELETIONS_TABLE = "enriched.detection_deletions"
+
+# Weights every detection came from before model_version was recorded
+LEGACY_MODEL_VERSION = "yolov8n"
+
+
+def detection_id(obj):
+    """
+    Stable identity of a detection: model, message, class and (rounded) bounding
+    box. Detections of the legacy model keep the ids they had before
+    model_version existed.
+    """
+    bbox = [round(float(v), 2) for v in obj["bbox"]]
+    key = [obj["message_id"], obj["detected_object"], bbox]
+    version = obj.get("model_version", LEGACY_MODEL_VERSION)
+    if version != LEGACY_MODEL_VERSION:
+        key.insert(0, version)
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def file_model_version(path):
+    """
+    Model a legacy JSON file's detections came from, told by its name suffix:
+    fct_image_detections_yolov8m.json holds yolov8m detections, and the
+    unsuffixed file the legacy model's.
+    """
+    match = re.search(r"_(yolo[^_./]+)\.json$", os.path.basename(path))
+    return match.group(1) if match else LEGACY_MODEL_VERSION
+
+
+def iter_detections(path):
+    """
+    Stream detections from an NDJSON file line by line. Legacy JSON array files
+    (e.g. the DVC-tracked fct_image_detections.json) are read whole, and their
+    detections are given the model version in the file name.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            version = file_model_version(path)
+            for obj in json.load(f):
+                obj.setdefault("model_version", version)
+                yield obj
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def detections_path(test_mode=False, channel=None):
+    """
+    NDJSON file the enricher writes detections to: one per channel when the
+    enricher ran for a single channel.
+    """
+    name = (
+        f"fct_image_detections_{channel.lstrip('@')}.ndjson"
+        if channel
+        else "fct_image_detections.ndjson"
+    )
+    return f"../data/test/{name}" if test_mode else f"../data/processed/{name}"
 
 
 class EnrichedDataLoader:
-    def __init__(
-        self,
-        path=(
-            "../data/test/fct_image_detections.json"
-            if args.test
-            else "../data/processed/fct_image_detections.json"
-        ),
-    ):
+    def __init__(self, path=None, test_mode=False, channel=None, batch_size=5000):
         """
         Initialise the EnrichedDataLoader.
+
+        Args:
+            path (str): Detections file; defaults to detections_path().
+            test_mode (bool): Load into the test database.
+            channel (str): Load the file written for this channel.
+            batch_size (int): Detections per upsert batch.
         """
-        load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
+        self.test_mode = test_mode
+        self.batch_size = batch_size
+        self.path = path or detections_path(test_mode, channel)
         logging.info("EnrichedDataLoader initialised.")
-        self.path = path
 
-    def load_enriched_messages(self):
-        """
-        Load enriched messages from the JSON file and insert them into the PostgreSQL database.
-        """
+    def connect(self):
         logging.info("Loading environment variables...")
-
         load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
+        return psycopg2.connect(
+            dbname=(
+                os.getenv("POSTGRES_DB_TEST")
+                if self.test_mode
+                else os.getenv("POSTGRES_DB")
+            ),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+            host=os.getenv("POSTGRES_HOST"),
+            port=os.getenv("POSTGRES_PORT"),
+        )
+
+    def load_enriched_messages(self, conn=None):
+        """
+        Stream detections from the NDJSON (or legacy JSON) file into PostgreSQL in
+        batches, so memory stays flat regardless of the file size.
+
+        `conn` is an open connection to use (left open); when None one is opened
+        from .env and closed afterwards. Returns (detections read, rows inserted
+        or updated), or None when the load failed.
+        """
+        owns_connection = conn is None
         try:
-            conn = psycopg2.connect(
-                dbname=(
-                    os.getenv("POSTGRES_DB_TEST")
-                    if args.test
-                    else os.getenv("POSTGRES_DB")
-                ),
-                user=os.getenv("POSTGRES_USER"),
-                password=os.getenv("POSTGRES_PASSWORD"),
-                host=os.getenv("POSTGRES_HOST"),
-                port=os.getenv("POSTGRES_PORT"),
-            )
-            cursor = conn.cursor()
+            if owns_connection:
+                conn = self.connect()
             logging.info("Connected to PostgreSQL database.")
         except Exception as e:
             logging.error(f"Database connection failed: {e}")
             return
+        try:
+            return self._load(conn)
+        finally:
+            if owns_connection:
+                conn.close()
 
+    def _load(self, conn):
+        cursor = conn.cursor()
         cursor.execute("SELECT current_database();")
         active_db = cursor.fetchone()[0]
-        if args.test and active_db != "telegram_health_test":
+        if self.test_mode and active_db != "telegram_health_test":
             logging.error("Aborting: connected to wrong database for test mode.")
-            conn.close()
             return
 
         try:
             logging.info(
                 "Ensuring enriched schema and fct_image_detections table exist..."
             )
-            cursor.execute("CREATE SCHEMA IF NOT EXISTS enriched;")
-            cursor.execute("DROP TABLE IF EXISTS enriched.fct_image_detections;")
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS enriched.fct_image_detections (
-                    message_id TEXT,
-                    detected_object TEXT,
-                    confidence_score FLOAT,
-                    bbox JSONB
-                );
-            """
-            )
+            # Loaders for different channels may start together; serialise the DDL
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (TABLE_NAME,))
+            ensure_manifest(cursor)
+            self.ensure_table(cursor)
+            conn.commit()
             logging.info("Schema and table setup completed.")
         except Exception as e:
             logging.error(f"Error during schema/table creation: {e}")
+            conn.rollback()
             return
-        # Load messages from JSON files
-        logging.info("Loading messages from JSON files...")
 
-        with open(self.path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        for obj in data:
+        file_key = os.path.basename(self.path)
+        checksum = file_checksum(self.path)
+        if already_loaded(cursor, TABLE_NAME, file_key, checksum):
+            logging.info(f"Skipped (already loaded): {file_key}")
+            return 0, 0
+
+        logging.info(f"Streaming detections from {self.path}...")
+        read = written = 0
+        try:
             cursor.execute(
                 """
-                INSERT INTO enriched.fct_image_detections (message_id, detected_object, confidence_score, bbox)
-                VALUES (%s, %s, %s, %s);
-            """,
-                (
-                    obj["message_id"],
-                    obj["detected_object"],
-                    obj["confidence_score"],
-                    json.dumps(obj["bbox"]),
-                ),
+                CREATE TEMP TABLE loaded_detections (
+                    detection_id TEXT PRIMARY KEY,
+                    message_id TEXT NOT NULL,
+                    model_version TEXT NOT NULL
+                ) ON COMMIT DROP;
+            """
             )
+            detections = iter_detections(self.path)
+            while True:
+                batch = list(itertools.islice(detections, self.batch_size))
+                if not batch:
+                    break
+                written += self.upsert_detections(cursor, batch)
+                read += len(batch)
+            removed = self.delete_stale_detections(cursor)
+            record_load(cursor, TABLE_NAME, file_key, checksum, read)
+            conn.commit()
+        except Exception as e:
+            logging.error(f"Failed to load detections, rolled back: {e}")
+            conn.rollback()
+            return
 
-        conn.commit()
         cursor.close()
-        conn.close()
         logging.info(
-            f"{len(data)} detections loaded into enriched.fct_image_detections."
+            f"{read} detections read, {written} inserted or updated and "
+            f"{removed} stale ones deleted in {TABLE_NAME}."
         )
         logging.info("Enriched messages loaded successfully.")
+        return read, written
+
+    def ensure_table(self, cursor):
+        """
+        Create the detections table keyed by detection_id, with its indexes. A
+        table left by the old drop-and-reload loader has no identity column and is
+        rebuilt once; one from before model_version gets the column, with its
+        rows attributed to the legacy model.
+        """
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS enriched;")
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'enriched'
+              AND table_name = 'fct_image_detections'
+              AND column_name = 'detection_id';
+        """
+        )
+        if cursor.fetchone() is None:
+            logging.info(f"Rebuilding {TABLE_NAME} with a detection_id key...")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE_NAME};")
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+                detection_id TEXT PRIMARY KEY,
+                message_id TEXT NOT NULL,
+                detected_object TEXT,
+                confidence_score FLOAT,
+                bbox JSONB,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """
+        )
+        cursor.execute(
+            f"ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS model_version TEXT "
+            f"NOT NULL DEFAULT '{LEGACY_MODEL_VERSION}';"
+        )
+        # message_id is joined on by the API search; loaded_at drives incremental dbt
+        for column in ("message_id", "loaded_at"):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS fct_image_detections_{column}_idx "
+                f"ON {TABLE_NAME} ({column});"
+            )
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {DELETIONS_TABLE} (
+                message_id TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS detection_deletions_deleted_at_idx "
+            f"ON {DELETIONS_TABLE} (deleted_at);"
+        )
+
+    def upsert_detections(self, cursor, batch):
+        """
+        Merge a batch of detections; rows that did not change are left untouched.
+        The ids are also noted in loaded_detections for delete_stale_detections.
+        """
+        rows = {}
+        for obj in batch:  # dedupe so one statement never hits a key twice
+            rows[detection_id(obj)] = (
+                obj.get("model_version", LEGACY_MODEL_VERSION),
+                obj["message_id"],
+                obj["detected_object"],
+                obj["confidence_score"],
+                json.dumps(obj["bbox"]),
+            )
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {TABLE_NAME} AS target
+                (detection_id, model_version, message_id, detected_object,
+                 confidence_score, bbox)
+            VALUES %s
+            ON CONFLICT (detection_id) DO UPDATE
+            SET confidence_score = EXCLUDED.confidence_score,
+                bbox = EXCLUDED.bbox,
+                loaded_at = now()
+            WHERE target.confidence_score IS DISTINCT FROM EXCLUDED.confidence_score
+               OR target.bbox IS DISTINCT FROM EXCLUDED.bbox;
+            """,
+            [(key, *values) for key, values in rows.items()],
+            page_size=len(rows) or 1,
+        )
+        written = cursor.rowcount
+        execute_values(
+            cursor,
+            """
+            INSERT INTO loaded_detections (detection_id, model_version, message_id)
+            VALUES %s ON CONFLICT DO NOTHING;
+            """,
+            [(key, *values[:2]) for key, values in rows.items()],
+            page_size=len(rows) or 1,
+        )
+        return written
+
+    def delete_stale_detections(self, cursor):
+        """
+        Delete the detections of every (message, model) in the file that the file
+        no longer lists, e.g. boxes from weights since replaced under the same
+        model_version. The file holds a message's complete set of detections per
+        model, so what it lacks is out of date. Each (message, model) that lost
+        rows is noted in DELETIONS_TABLE. Returns the rows deleted.
+        """
+        cursor.execute(
+            f"""
+            WITH deleted AS (
+                DELETE FROM {TABLE_NAME} AS target
+                USING (
+                    SELECT DISTINCT message_id, model_version FROM loaded_detections
+                ) AS loaded
+                WHERE target.message_id = loaded.message_id
+                  AND target.model_version = loaded.model_version
+                  AND NOT EXISTS (
+                      SELECT 1 FROM loaded_detections
+                      WHERE loaded_detections.detection_id = target.detection_id
+                  )
+                RETURNING target.message_id, target.model_version
+            ), logged AS (
+                INSERT INTO {DELETIONS_TABLE} (message_id, model_version)
+                SELECT DISTINCT message_id, model_version FROM deleted
+            )
+            SELECT count(*) FROM deleted;
+        """
+        )
+        return cursor.fetchone()[0]
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    configure_logging("enriched_loader.log")
+    enriched_loader = EnrichedDataLoader(
+        test_mode=args.test, channel=args.channel, batch_size=args.batch_size
+    )
+    return 1 if enriched_loader.load_enriched_messages() is None else 0
 
 
 if __name__ == "__main__":
-    enriched_loader = EnrichedDataLoader()
-    enriched_loader.load_enriched_messages()
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Command line for the pipeline scripts.
+
+    python -m scripts scrape --test
+    python -m scripts load --mode full
+    python -m scripts enrich --shards 2
+    python -m scripts load-detections --test
+    python -m scripts images --migrate
+    python -m scripts export --test
+    python -m scripts query "SELECT count(*) FROM fct_messages"
+
+Everything after the command goes to that script's own options
+(`python -m scripts <command> --help`). A script module is only imported once
+its command is chosen, so `--help` and the light commands never load telethon
+or torch.
+"""
+
+import os
+import sys
+import importlib
+
+COMMANDS = {
+    "scrape": (
+        "scripts._01_data_scraper",
+        "Scrape Telegram channels into dated NDJSON files",
+    ),
+    "load": (
+        "scripts._02_data_loader",
+        "Load message files into raw.telegram_messages",
+    ),
+    "enrich": (
+        "scripts._03_data_enricher",
+        "Detect objects in downloaded images with YOLO",
+    ),
+    "load-detections": (
+        "scripts._03_enriched_data_loader",
+        "Load detections into enriched.fct_image_detections",
+    ),
+    "images": (
+        "scripts.image_store",
+        "Show image store statistics or migrate <message_id>.jpg files into it",
+    ),
+    "export": (
+        "scripts.parquet_export",
+        "Export the marts to Parquet partitioned by channel and month",
+    ),
+    "query": (
+        "scripts.parquet_query",
+        "Run SQL with DuckDB against the Parquet export",
+    ),
+}
+
+
+def usage():
+    lines = ["usage: python -m scripts <command> [options]", "", "commands:"]
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, summary) in COMMANDS.items():
+        lines.append(f"  {name.ljust(width)}  {summary}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0 if argv else 2
+    command, options = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"{usage()}\n\nunknown command: {command}", file=sys.stderr)
+        return 2
+
+    # The scripts resolve ../data and ../logs from the scripts folder, as when
+    # they are run directly
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    module = importlib.import_module(COMMANDS[command][0])
+    module.parser.prog = f"python -m scripts {command}"
+    # Every script's main returns its exit status; one that returns nothing
+    # never reported success
+    status = module.main(options)
+    return status if type(status) is int else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+# SQLite sidecar mapping image content (SHA-256) and model weights to detections,
+# so enrichment only runs the model on images it has not seen with these weights.
+
+
+def model_fingerprint(model_path):
+    """
+    Identify a model by file name and weights digest, e.g. "yolov8n.pt:1f2e...".
+    Retrained or replaced weights get a new fingerprint and miss the cache.
+    """
+    name = os.path.basename(model_path)
+    if not os.path.exists(model_path):
+        return name
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return f"{name}:{digest.hexdigest()[:16]}"
+
+
+def model_version(model_path):
+    """
+    Name detections of a model are recorded under: the weights file name without
+    its suffix, e.g. "yolov8m" for yolov8m.pt.
+    """
+    return os.path.splitext(os.path.basename(model_path))[0]
+
+
+class DetectionCache:
+    def __init__(self, path):
+        """
+        Open (or create) the cache database at `path`.
+
+        Args:
+            path (str): SQLite file, usually next to the detections output.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS detections (
+                sha256 TEXT NOT NULL,
+                model TEXT NOT NULL,
+                detections TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (sha256, model)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get(self, sha256, model):
+        """
+        Cached detections for image content, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT detections FROM detections WHERE sha256 = ? AND model = ?;",
+                (sha256, model),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, model, entries):
+        """
+        Store detections for several images: entries is [(sha256, detections)].
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO detections (sha256, model, detections) "
+                "VALUES (?, ?, ?);",
+                [(sha256, model, json.dumps(dets)) for sha256, dets in entries],
+            )
+            self._conn.commit()
+
+    def invalidate_stale(self, model):
+        """
+        Drop entries produced by older weights of the same model file.
+        Returns the number of entries removed.
+        """
+        name = model.split(":", 1)[0]
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM detections WHERE model != ? "
+                "AND (model = ? OR substr(model, 1, ?) = ?);",
+                (model, name, len(name) + 1, f"{name}:"),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
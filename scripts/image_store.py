@@ -0,0 +1,338 @@
+import io
+import json
+import os
+import sys
+import glob
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+# Content-addressed store for scraped photos. Each image is kept once, at
+# objects/<aa>/<sha256>.jpg under the store root, however many messages post it.
+# A SQLite index next to the objects maps Telegram photo ids and messages to
+# images, and keeps a perceptual hash (dHash) of each image so recompressed
+# reposts of the same picture can share one set of detections.
+
+INDEX_FILE = "image_store.sqlite"
+OBJECT_DIR = "objects"
+
+# Most differing dHash bits for two images of the same size to count as one
+# picture. The index splits hashes into 4 bands of 16 bits, so any pair within
+# 3 bits shares at least one band and is found by an indexed lookup.
+NEAR_DUPLICATE_DISTANCE = 2
+HASH_BANDS = 4
+
+# Message ids looked up per query by group_messages
+LOOKUP_CHUNK = 500
+
+
+def difference_hash(data):
+    """
+    64-bit difference hash of an encoded image, with its width and height.
+    Returns (None, None, None) when the bytes are not a readable image.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            pixels = image.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+    except (UnidentifiedImageError, OSError):
+        return None, None, None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value, width, height
+
+
+def hash_bands(value):
+    return [(value >> (16 * band)) & 0xFFFF for band in range(HASH_BANDS)]
+
+
+class ImageStore:
+    def __init__(self, root, near_distance=NEAR_DUPLICATE_DISTANCE):
+        """
+        Open (or create) the store under `root`.
+
+        Args:
+            root (str): Store folder, usually data/images.
+            near_distance (int): Most dHash bits two same-sized images may
+                differ by to be treated as one picture (at most 3); None only
+                merges byte-identical images.
+        """
+        self.root = os.path.abspath(root)
+        self.near_distance = (
+            None if near_distance is None else min(near_distance, HASH_BANDS - 1)
+        )
+        os.makedirs(os.path.join(self.root, OBJECT_DIR), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.root, INDEX_FILE), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS images (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                dhash TEXT,
+                -- first image this one is a near-duplicate of (itself if none)
+                canonical TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS dhash_bands (
+                band INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (band, value, sha256)
+            );
+            CREATE TABLE IF NOT EXISTS telegram_photos (
+                photo_id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS message_images (
+                message_id TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def path(self, sha256):
+        """
+        File holding the image with this digest.
+        """
+        return os.path.join(self.root, OBJECT_DIR, sha256[:2], f"{sha256}.jpg")
+
+    def put(self, data):
+        """
+        Store encoded image bytes and return their SHA-256. Content already in
+        the store is not written again.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            known = self._conn.execute(
+                "SELECT 1 FROM images WHERE sha256 = ?;", (sha256,)
+            ).fetchone()
+        if known:
+            return sha256
+
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        dhash, width, height = difference_hash(data)
+        with self._lock:
+            canonical = sha256
+            if dhash is not None:
+                canonical = self._nearest(dhash, width, height) or sha256
+            self._conn.execute(
+                "INSERT OR IGNORE INTO images "
+                "(sha256, size, width, height, dhash, canonical) "
+                "VALUES (?, ?, ?, ?, ?, ?);",
+                (
+                    sha256,
+                    len(data),
+                    width,
+                    height,
+                    None if dhash is None else f"{dhash:016x}",
+                    canonical,
+                ),
+            )
+            if dhash is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO dhash_bands VALUES (?, ?, ?);",
+                    [(band, v, sha256) for band, v in enumerate(hash_bands(dhash))],
+                )
+            self._conn.commit()
+        return sha256
+
+    def put_file(self, path, remove=False):
+        """
+        Store an image file and return its SHA-256, deleting the file if `remove`.
+        """
+        with open(path, "rb") as f:
+            sha256 = self.put(f.read())
+        if remove:
+            os.remove(path)
+        return sha256
+
+    def _nearest(self, dhash, width, height):
+        """
+        Canonical digest of the closest stored image of the same size within
+        near_distance bits, or None. Caller holds the lock.
+        """
+        if self.near_distance is None:
+            return None
+        clauses = " OR ".join("(b.band = ? AND b.value = ?)" for _ in range(HASH_BANDS))
+        params = [p for pair in enumerate(hash_bands(dhash)) for p in pair]
+        rows = self._conn.execute(
+            f"""
+            SELECT DISTINCT i.dhash, i.canonical
+            FROM dhash_bands b
+            JOIN images i ON i.sha256 = b.sha256
+            WHERE ({clauses}) AND i.width = ? AND i.height = ?;
+            """,
+            (*params, width, height),
+        ).fetchall()
+        best = None
+        for other, canonical in rows:
+            distance = bin(dhash ^ int(other, 16)).count("1")
+            if distance <= self.near_distance and (best is None or distance < best[0]):
+                best = (distance, canonical)
+        return best[1] if best else None
+
+    def photo(self, photo_id):
+        """
+        Digest of a Telegram photo already downloaded, or None. Photo ids are
+        stable across reposts and forwards; file references expire, so they are
+        only used to download, never to identify.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM telegram_photos WHERE photo_id = ?;", (photo_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def link(self, message_id, sha256, photo_id=None):
+        """
+        Record that a message (and optionally a Telegram photo) uses an image.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO message_images VALUES (?, ?);",
+                (message_id, sha256),
+            )
+            if photo_id is not None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO telegram_photos VALUES (?, ?);",
+                    (photo_id, sha256),
+                )
+            self._conn.commit()
+
+    def message_image(self, message_id):
+        """
+        Digest of the image a message uses, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM message_images WHERE message_id = ?;",
+                (message_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def group_messages(self, message_ids, near_duplicates=True):
+        """
+        Group messages by the image they use: {sha256: [message_id, ...]}, keyed
+        by the canonical image when `near_duplicates` is set. Also returns the
+        message ids with no image in the store.
+        """
+        column = "i.canonical" if near_duplicates else "m.sha256"
+        images = {}
+        unique_ids = list(dict.fromkeys(message_ids))
+        with self._lock:
+            # Look the messages up by primary key in chunks, below SQLite's
+            # bound parameter limit, rather than reading the whole table
+            for start in range(0, len(unique_ids), LOOKUP_CHUNK):
+                chunk = unique_ids[start : start + LOOKUP_CHUNK]
+                images.update(
+                    self._conn.execute(
+                        f"""
+                        SELECT m.message_id, {column}
+                        FROM message_images m
+                        JOIN images i ON i.sha256 = m.sha256
+                        WHERE m.message_id IN ({", ".join("?" * len(chunk))});
+                        """,
+                        chunk,
+                    ).fetchall()
+                )
+        groups = {}
+        for message_id in unique_ids:
+            if message_id in images:
+                groups.setdefault(images[message_id], []).append(message_id)
+        return groups, [
+            message_id for message_id in message_ids if message_id not in images
+        ]
+
+    def import_legacy(self, image_dir=None, remove=False):
+        """
+        Move photos saved as <image_dir>/<message_id>.jpg by earlier scrapers
+        into the store. Returns the number of files imported.
+        """
+        paths = sorted(glob.glob(os.path.join(image_dir or self.root, "*.jpg")))
+        for path in paths:
+            message_id = os.path.splitext(os.path.basename(path))[0]
+            self.link(message_id, self.put_file(path, remove=remove))
+        return len(paths)
+
+    def stats(self):
+        """
+        Message, image and byte counts, and how many messages share an image.
+        """
+        with self._lock:
+            messages, images, canonical = self._conn.execute(
+                """
+                SELECT
+                    (SELECT count(*) FROM message_images),
+                    (SELECT count(*) FROM images),
+                    (SELECT count(DISTINCT canonical) FROM images);
+                """
+            ).fetchone()
+            stored_bytes, linked_bytes = self._conn.execute(
+                """
+                SELECT
+                    (SELECT coalesce(sum(size), 0) FROM images),
+                    (SELECT coalesce(sum(i.size), 0)
+                     FROM message_images m JOIN images i USING (sha256));
+                """
+            ).fetchone()
+        return {
+            "messages": messages,
+            "images": images,
+            "distinct_pictures": canonical,
+            "stored_bytes": stored_bytes,
+            "bytes_saved": linked_bytes - stored_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+parser = argparse.ArgumentParser(description="Inspect or migrate the image store")
+parser.add_argument(
+    "--root", default=os.path.join("..", "data", "images"), help="Store folder"
+)
+parser.add_argument(
+    "--migrate",
+    action="store_true",
+    help="Move <message_id>.jpg files from the store folder into the store",
+)
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    with ImageStore(args.root) as store:
+        if args.migrate:
+            print(f"Imported {store.import_legacy(remove=True)} images.")
+        print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
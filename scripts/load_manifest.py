@@ -0,0 +1,75 @@
+import hashlib
+
+# Records which source files each loader has already ingested, keyed by target
+# table and file path, so re-runs only touch files that are new or changed.
+MANIFEST_TABLE = "raw.load_manifest"
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """
+    Return the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ensure_manifest(cursor):
+    """
+    Create the manifest table if it does not exist yet.
+    """
+    cursor.execute("CREATE SCHEMA IF NOT EXISTS raw;")
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            target_table TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (target_table, file_path)
+        );
+    """
+    )
+
+
+def already_loaded(cursor, target_table, file_path, checksum):
+    """
+    True if this exact file content was already loaded into target_table.
+    """
+    cursor.execute(
+        f"""
+        SELECT 1 FROM {MANIFEST_TABLE}
+        WHERE target_table = %s AND file_path = %s AND checksum = %s;
+        """,
+        (target_table, file_path, checksum),
+    )
+    return cursor.fetchone() is not None
+
+
+def record_load(cursor, target_table, file_path, checksum, row_count):
+    """
+    Upsert the manifest entry for a file. Call inside the load's transaction.
+    """
+    cursor.execute(
+        f"""
+        INSERT INTO {MANIFEST_TABLE} (target_table, file_path, checksum, row_count)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (target_table, file_path) DO UPDATE
+        SET checksum = EXCLUDED.checksum,
+            row_count = EXCLUDED.row_count,
+            loaded_at = now();
+        """,
+        (target_table, file_path, checksum, row_count),
+    )
+
+
+def clear_manifest(cursor, target_table):
+    """
+    Forget every file loaded into target_table, e.g. before a full rebuild.
+    """
+    cursor.execute(
+        f"DELETE FROM {MANIFEST_TABLE} WHERE target_table = %s;", (target_table,)
+    )
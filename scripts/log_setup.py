@@ -0,0 +1,19 @@
+import os
+import logging
+
+# The pipeline scripts log to ../logs/<name>.log relative to the working
+# directory. This is only set up when a script runs as a program: imported by
+# the Dagster ops, their records go to the Dagster run log instead.
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+
+def configure_logging(file_name, console=True):
+    """
+    Send INFO and above to ../logs/`file_name` and, if `console`, to stderr.
+    """
+    log_dir = os.path.abspath(os.path.join("..", "logs"))
+    os.makedirs(log_dir, exist_ok=True)
+    handlers = [logging.FileHandler(os.path.join(log_dir, file_name))]
+    if console:
+        handlers.append(logging.StreamHandler())
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=handlers)
@@ -0,0 +1,181 @@
+import os
+import gzip
+import json
+import logging
+
+# On-disk format of the raw Telegram message files under <date>/ folders.
+# New files are NDJSON (one message per line), optionally gzip- or
+# zstd-compressed, appended to as the scraper goes. Legacy files are a single
+# pretty-printed JSON array and are still read.
+COMPRESSION_SUFFIXES = {None: "", "gz": ".gz", "zst": ".zst"}
+MESSAGE_EXTENSIONS = (".ndjson", ".ndjson.gz", ".ndjson.zst", ".json")
+
+
+class TruncatedMessageFile(ValueError):
+    """Raised when a message file ends in a partially written record."""
+
+
+def message_file_path(directory, name, compression=None):
+    """
+    Path of the NDJSON file for `name` (e.g. a channel) in `directory`.
+    """
+    return os.path.join(directory, f"{name}.ndjson{COMPRESSION_SUFFIXES[compression]}")
+
+
+def is_message_file(file_name):
+    return file_name.endswith(MESSAGE_EXTENSIONS)
+
+
+def existing_message_files(directory, name):
+    """
+    Every message file already written for `name`, whatever its format.
+    """
+    return [
+        os.path.join(directory, f"{name}{extension}")
+        for extension in MESSAGE_EXTENSIONS
+        if os.path.exists(os.path.join(directory, f"{name}{extension}"))
+    ]
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError(
+            "Reading or writing .zst message files requires the zstandard package."
+        ) from e
+    return zstandard
+
+
+def _zstd_lines(path, chunk_size=1 << 16):
+    """
+    Decode a file of concatenated zstd frames into text lines. A frame cut off
+    at the end of the file raises TruncatedMessageFile.
+    """
+    dctx = _zstandard().ZstdDecompressor()
+    frame = dctx.decompressobj()
+    in_frame = False
+    buffer = b""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            while chunk:
+                buffer += frame.decompress(chunk)
+                in_frame = not frame.eof
+                chunk = b""
+                if frame.eof:
+                    chunk = frame.unused_data
+                    frame = dctx.decompressobj()
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8") + "\n"
+    if in_frame:
+        raise TruncatedMessageFile(f"{path} ends in an incomplete zstd frame.")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+def _iter_records(path):
+    """
+    Yield messages from one file. Raises TruncatedMessageFile after the last
+    complete record if the file ends mid-write.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    if path.endswith(".zst"):
+        lines = _zstd_lines(path)
+    elif path.endswith(".gz"):
+        lines = gzip.open(path, "rt", encoding="utf-8")
+    else:
+        lines = open(path, "r", encoding="utf-8")
+    try:
+        for line in lines:
+            if not line.endswith("\n"):
+                raise TruncatedMessageFile(f"{path} ends in a partial record.")
+            if line.strip():
+                yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile) as e:
+        raise TruncatedMessageFile(f"{path} is truncated: {e}") from e
+    finally:
+        lines.close()
+
+
+def read_messages(path):
+    """
+    Lazily yield the messages of one file, in any supported format.
+
+    A partially written last record (an interrupted scrape) is skipped with a
+    warning; the scraper re-fetches it on its next run.
+    """
+    try:
+        yield from _iter_records(path)
+    except TruncatedMessageFile as e:
+        logging.warning(f"{e} Ignoring the incomplete tail.")
+
+
+class MessageWriter:
+    def __init__(self, path):
+        """
+        Append-only NDJSON writer for one channel's messages of the day.
+
+        The compression follows the file extension. Records already in the file
+        are scanned once so their ids are known; a partially written tail left
+        by a crash is cut off before anything new is appended.
+
+        Args:
+            path (str): Target file, see message_file_path().
+        """
+        self.path = path
+        self.ids = set()
+        if os.path.exists(path):
+            try:
+                for msg in _iter_records(path):
+                    self.ids.add(msg["id"])
+            except TruncatedMessageFile as e:
+                logging.warning(f"{e} Rewriting it without the incomplete tail.")
+                self._rewrite_complete_records()
+
+    def _encode(self, messages):
+        data = "".join(
+            json.dumps(msg, ensure_ascii=False) + "\n" for msg in messages
+        ).encode("utf-8")
+        # Each append is a complete gzip member / zstd frame; readers decode
+        # concatenated members and frames as one stream.
+        if self.path.endswith(".gz"):
+            return gzip.compress(data)
+        if self.path.endswith(".zst"):
+            return _zstandard().ZstdCompressor().compress(data)
+        return data
+
+    def _rewrite_complete_records(self):
+        tmp_path = f"{self.path}.tmp"
+        self.ids = set()
+        with open(tmp_path, "wb") as f:
+            batch = []
+            for msg in read_messages(self.path):
+                self.ids.add(msg["id"])
+                batch.append(msg)
+                if len(batch) >= 1000:
+                    f.write(self._encode(batch))
+                    batch = []
+            f.write(self._encode(batch))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def append(self, messages):
+        """
+        Append messages and fsync, so they are durable once this returns.
+        Messages whose id is already in the file are skipped.
+        """
+        messages = [msg for msg in messages if msg["id"] not in self.ids]
+        if not messages:
+            return 0
+        with open(self.path, "ab") as f:
+            f.write(self._encode(messages))
+            f.flush()
+            os.fsync(f.fileno())
+        self.ids.update(msg["id"] for msg in messages)
+        return len(messages)
@@ -0,0 +1,245 @@
+import os
+import sys
+import uuid
+import shutil
+import logging
+import argparse
+import tempfile
+import psycopg2
+from dotenv import load_dotenv
+
+try:
+    from scripts.log_setup import configure_logging
+except ImportError:  # executed directly as scripts/parquet_export.py
+    from log_setup import configure_logging
+
+# Columnar copy of the star schema for analysts and heavy read-only queries.
+# Each table is streamed out of Postgres with COPY and written by DuckDB as
+# Parquet, the facts partitioned Hive-style by channel and month
+# (fct_messages/channel_slug=tikvahpharma/date_month=2025-06-01/data_0.parquet)
+# and sorted by date_day inside each file. Daily partitions would leave a few
+# hundred rows per file, and scans would spend their time opening files; the
+# sorted date_day column still lets a day filter skip most row groups.
+# open_duckdb() exposes the files as views, so scans of the whole history run
+# against the export instead of the database the API and the loaders share.
+
+PARTITION_COLUMNS = ["channel_slug", "date_month"]
+SORT_COLUMNS = ["channel_slug", "date_day"]
+
+# Exported table -> (query, partition columns). Detections carry their message's
+# channel and day so they partition the same way as the messages.
+TABLES = {
+    "fct_messages": (
+        """
+        SELECT message_id, channel_id, channel_slug, channel_username, date_day,
+               text, views, media_type, message_length, has_image, loaded_at,
+               date_trunc('month', date_day)::date AS date_month
+        FROM raw_marts.fct_messages
+        """,
+        PARTITION_COLUMNS,
+    ),
+    "fct_image_detections": (
+        """
+        SELECT d.detection_id, d.message_id, m.channel_slug, m.date_day,
+               d.model_version, d.detected_object AS object_class,
+               d.confidence_score, d.bbox, d.loaded_at,
+               date_trunc('month', m.date_day)::date AS date_month
+        FROM enriched.fct_image_detections d
+        JOIN raw_marts.fct_messages m ON d.message_id = m.message_id
+        WHERE d.detected_object IS NOT NULL
+        """,
+        PARTITION_COLUMNS,
+    ),
+    "dim_channels": ("SELECT * FROM raw_marts.dim_channels", []),
+    "dim_dates": ("SELECT * FROM raw_marts.dim_dates", []),
+}
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--test", action="store_true", help="Export the test database")
+parser.add_argument("--root", help="Export folder (default: data/warehouse)")
+parser.add_argument(
+    "--table",
+    action="append",
+    choices=list(TABLES),
+    help="Only export this table (repeatable)",
+)
+
+# Postgres type OID -> DuckDB type for reading the COPY output back. Anything
+# else (text, jsonb, ...) stays VARCHAR.
+DUCKDB_TYPES = {
+    16: "BOOLEAN",
+    20: "BIGINT",
+    21: "SMALLINT",
+    23: "INTEGER",
+    700: "FLOAT",
+    701: "DOUBLE",
+    1700: "DOUBLE",  # numeric, e.g. the extract() columns of dim_dates
+    1082: "DATE",
+    1114: "TIMESTAMP",
+    1184: "TIMESTAMPTZ",
+}
+
+
+def export_root(test_mode=False, root=None):
+    """
+    Folder the Parquet export is written to, one sub-folder per table.
+    """
+    return root or ("../data/test/warehouse" if test_mode else "../data/warehouse")
+
+
+def sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def connect(test_mode=False):
+    """
+    Open a connection to the test or production database named in .env.
+    """
+    load_dotenv(os.path.join(os.path.abspath(os.path.join("..")), ".env"))
+    return psycopg2.connect(
+        dbname=os.getenv("POSTGRES_DB_TEST") if test_mode else os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT"),
+    )
+
+
+def column_types(cursor, query):
+    """
+    (name, DuckDB type) of every column the query returns, without running it.
+    """
+    cursor.execute(f"SELECT * FROM ({query}) AS q LIMIT 0;")
+    return [
+        (column.name, DUCKDB_TYPES.get(column.type_code, "VARCHAR"))
+        for column in cursor.description
+    ]
+
+
+def export_table(conn, duck, root, table):
+    """
+    Rewrite one table's Parquet folder and return the number of rows written.
+
+    The rows are copied to a temporary CSV file and converted by DuckDB into a
+    folder next to the old export, which then replaces it, so readers never see
+    a half-written table.
+    """
+    query, partition_by = TABLES[table]
+    with conn.cursor() as cursor:
+        columns = column_types(cursor, query)
+        # Timestamps are written in UTC, whatever the server's time zone
+        cursor.execute("SET LOCAL TIME ZONE 'UTC';")
+        with tempfile.NamedTemporaryFile(
+            "wb", suffix=".csv", dir=root, delete=False
+        ) as csv_file:
+            try:
+                cursor.copy_expert(
+                    f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                    csv_file,
+                )
+            except Exception:
+                os.remove(csv_file.name)
+                raise
+    conn.rollback()
+
+    target = os.path.join(root, table)
+    staging = os.path.join(root, f".{table}.{uuid.uuid4().hex[:8]}")
+    struct = ", ".join(f"{sql_string(name)}: '{kind}'" for name, kind in columns)
+    # Postgres writes NULL unquoted and empty strings as "", keep them apart
+    source = (
+        f"SELECT * FROM read_csv({sql_string(csv_file.name)}, header = true, "
+        f"columns = {{{struct}}}, allow_quoted_nulls = false)"
+    )
+    options = "FORMAT parquet, COMPRESSION zstd"
+    if partition_by:
+        # Sorted by DuckDB rather than Postgres, off the database's CPU
+        source += f" ORDER BY {', '.join(SORT_COLUMNS)}"
+        options += f", PARTITION_BY ({', '.join(partition_by)})"
+        destination = staging
+    else:
+        os.makedirs(staging)
+        destination = os.path.join(staging, "data_0.parquet")
+    try:
+        rows = duck.execute(
+            f"COPY ({source}) TO {sql_string(destination)} ({options});"
+        ).fetchone()[0]
+        retired = f"{staging}.old"
+        if os.path.exists(target):
+            os.replace(target, retired)
+        os.replace(staging, target)
+        shutil.rmtree(retired, ignore_errors=True)
+    finally:
+        os.remove(csv_file.name)
+        shutil.rmtree(staging, ignore_errors=True)
+    return rows
+
+
+def export_marts(test_mode=False, root=None, tables=None, conn=None):
+    """
+    Export the marts to Parquet under export_root().
+
+    Args:
+        test_mode (bool): Read from the test database.
+        root (str): Export folder; defaults to export_root().
+        tables (list): Tables to export; defaults to every table in TABLES.
+        conn: Open connection to use, e.g. from a pool; it is left open. When
+            None a connection is opened from .env and closed afterwards.
+
+    Returns {table: rows written}.
+    """
+    import duckdb  # only the export and query paths need it
+
+    root = export_root(test_mode, root)
+    os.makedirs(root, exist_ok=True)
+    owns_connection = conn is None
+    if owns_connection:
+        conn = connect(test_mode)
+    duck = duckdb.connect()
+    counts = {}
+    try:
+        for table in tables or TABLES:
+            counts[table] = export_table(conn, duck, root, table)
+            logging.info(f"Exported {counts[table]} rows of {table} to {root}.")
+    finally:
+        duck.close()
+        if owns_connection:
+            conn.close()
+    return counts
+
+
+def open_duckdb(root, database=":memory:"):
+    """
+    DuckDB connection with a view per exported table, reading its Parquet files
+    with the partition columns restored. Tables not exported yet are skipped.
+    Views read the files at query time, so they follow later exports.
+    """
+    import duckdb
+
+    duck = duckdb.connect(database)
+    for table, (_, partition_by) in TABLES.items():
+        folder = os.path.join(os.path.abspath(root), table)
+        if not os.path.isdir(folder):
+            continue
+        options = ""
+        if partition_by:
+            hive_types = ", ".join(
+                f"'{column}': {'DATE' if column == 'date_month' else 'VARCHAR'}"
+                for column in partition_by
+            )
+            options = f", hive_partitioning = true, hive_types = {{{hive_types}}}"
+        duck.execute(
+            f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM "
+            f"read_parquet({sql_string(folder + '/**/*.parquet')}{options});"
+        )
+    return duck
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    configure_logging("parquet_export.log")
+    export_marts(test_mode=args.test, root=args.root, tables=args.table)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import sys
+import argparse
+
+try:
+    from scripts.parquet_export import TABLES, export_root, open_duckdb, sql_string
+except ImportError:  # executed directly as scripts/parquet_query.py
+    from parquet_export import TABLES, export_root, open_duckdb, sql_string
+
+# Embedded DuckDB over the Parquet export. Each exported table is a view of the
+# same name, so ad-hoc SQL reads the columnar files and never touches Postgres:
+#
+#   python -m scripts query "SELECT channel_slug, count(*) FROM fct_messages
+#                            WHERE date_day >= DATE '2025-06-01' GROUP BY 1"
+#
+# Filters on channel_slug and date_day only open the matching partitions.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("sql", nargs="?", help="Query to run; read from stdin if omitted")
+parser.add_argument("--test", action="store_true", help="Query the test export")
+parser.add_argument("--root", help="Export folder (default: data/warehouse)")
+parser.add_argument(
+    "--output",
+    help="Write the result to this .parquet, .csv or .json file instead of printing it",
+)
+parser.add_argument(
+    "--max-rows", type=int, default=40, help="Rows printed to the terminal"
+)
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    root = export_root(args.test, args.root)
+    sql = (args.sql or sys.stdin.read()).strip().rstrip(";")
+    duck = open_duckdb(root)
+    try:
+        views = {row[0] for row in duck.execute("SHOW TABLES;").fetchall()}
+        if not views:
+            print(
+                f"No tables exported under {root} yet "
+                f"(expected {', '.join(TABLES)}); run `python -m scripts export`.",
+                file=sys.stderr,
+            )
+            return 1
+        if args.output:
+            duck.execute(f"COPY ({sql}) TO {sql_string(args.output)};")
+            print(f"Wrote {args.output}")
+        else:
+            duck.sql(sql).show(max_rows=args.max_rows)
+    finally:
+        duck.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import json
+
+# Per-channel high-water marks for the scraper: the newest message id and date
+# already written to disk, so the next run only asks Telegram for newer posts.
+# Each channel has its own file, so scrapers running in parallel processes for
+# different channels never overwrite each other's progress.
+CHECKPOINT_DIR = "scrape_checkpoints"
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """
+    Write JSON to a temporary sibling file and swap it in with os.replace, so
+    readers (and a crashed run) only ever see the old or the new version.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    def __init__(self, base_dir):
+        """
+        Load the checkpoints kept in `base_dir`, the scraper's output root.
+        """
+        self.directory = os.path.join(base_dir, CHECKPOINT_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self._checkpoints = {}
+
+    def _path(self, channel_username):
+        return os.path.join(self.directory, f"{channel_username.lstrip('@')}.json")
+
+    def get(self, channel_username):
+        """
+        Return {"last_id", "last_date"} for a channel, or None if never scraped.
+        """
+        path = self._path(channel_username)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._checkpoints[channel_username] = json.load(f)
+        return self._checkpoints.get(channel_username)
+
+    def last_id(self, channel_username):
+        checkpoint = self.get(channel_username)
+        return checkpoint["last_id"] if checkpoint else 0
+
+    def update(self, channel_username, last_id, last_date):
+        """
+        Advance a channel's high-water mark and persist it immediately. Only call
+        once the messages up to `last_id` are safely on disk.
+        """
+        if last_id <= self.last_id(channel_username):
+            return
+        checkpoint = {"last_id": last_id, "last_date": last_date}
+        self._checkpoints[channel_username] = checkpoint
+        write_json_atomic(self._path(channel_username), checkpoint, indent=2)
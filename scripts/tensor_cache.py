@@ -0,0 +1,180 @@
+import os
+import uuid
+import sqlite3
+import threading
+from datetime import date
+
+# Letterboxed model inputs, decoded once per image and input size and kept in
+# memory-mapped .npy shards. Repeat runs, and runs with other weights at the same
+# input size, read pixels straight from disk instead of decoding and resizing the
+# JPEG again. A SQLite index maps (sha256, size) to a shard row and to the
+# letterbox transform that maps boxes back onto the original image.
+
+INDEX_FILE = "tensor_cache.sqlite"
+PAD_VALUE = 114  # the grey ultralytics pads letterboxed images with
+
+
+def letterbox(image, size=640):
+    """
+    Fit a BGR image into a size x size square, keeping its aspect ratio, with the
+    rest padded evenly as ultralytics does. Returns (canvas, transform), where
+    transform is (ratio, left, top, width, height) for restore_boxes().
+    """
+    import cv2
+    import numpy as np
+
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    left = round((size - new_width) / 2 - 0.1)
+    top = round((size - new_height) / 2 - 0.1)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(
+            image, (new_width, new_height), interpolation=cv2.INTER_LINEAR
+        )
+    canvas = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    canvas[top : top + new_height, left : left + new_width] = image
+    return canvas, (ratio, left, top, width, height)
+
+
+def restore_boxes(boxes, transform):
+    """
+    Map xyxy boxes on a letterboxed canvas back onto the original image.
+    """
+    ratio, left, top, width, height = transform
+    return [
+        [
+            min(max((x1 - left) / ratio, 0.0), width),
+            min(max((y1 - top) / ratio, 0.0), height),
+            min(max((x2 - left) / ratio, 0.0), width),
+            min(max((y2 - top) / ratio, 0.0), height),
+        ]
+        for x1, y1, x2, y2 in boxes
+    ]
+
+
+# Images buffered in memory before a shard is written: about 80 MB at 640
+SHARD_IMAGES = 64
+
+
+class TensorCache:
+    def __init__(self, root, size=640, shard_images=SHARD_IMAGES):
+        """
+        Open (or create) the cache under `root` for one model input size.
+
+        Args:
+            root (str): Cache folder, usually tensor_cache next to the detections.
+            size (int): Side of the square model input.
+            shard_images (int): Images buffered in memory before they are
+                written out as a new shard (about 1.2 MB each at 640).
+        """
+        self.size = size
+        self.shard_images = max(1, shard_images)
+        self.directory = os.path.join(root, str(size))
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._shards = {}  # shard file -> read-only memmap
+        self._pending = []  # (sha256, canvas, transform) not written yet
+        self._conn = sqlite3.connect(
+            os.path.join(root, INDEX_FILE), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tensors (
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                shard TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                ratio REAL NOT NULL,
+                pad_left INTEGER NOT NULL,
+                pad_top INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                PRIMARY KEY (sha256, size)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get(self, sha256):
+        """
+        (canvas, transform) for a cached image, or None. The canvas is a
+        read-only view into its memory-mapped shard.
+        """
+        import numpy as np
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT shard, row, ratio, pad_left, pad_top, width, height "
+                "FROM tensors WHERE sha256 = ? AND size = ?;",
+                (sha256, self.size),
+            ).fetchone()
+            if row is None:
+                return None
+            shard = self._shards.get(row[0])
+            if shard is None:
+                path = os.path.join(self.directory, row[0])
+                if not os.path.exists(path):
+                    return None
+                shard = self._shards[row[0]] = np.load(path, mmap_mode="r")
+        return shard[row[1]], tuple(row[2:])
+
+    def add(self, sha256, canvas, transform):
+        """
+        Queue a letterboxed image; a shard is written every shard_images images.
+        """
+        with self._lock:
+            self._pending.append((sha256, canvas, transform))
+            full = len(self._pending) >= self.shard_images
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the queued images to a new shard named after today's date.
+        """
+        import numpy as np
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        name = f"{date.today().isoformat()}-{uuid.uuid4().hex[:8]}.npy"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        shard = np.lib.format.open_memmap(
+            tmp_path,
+            mode="w+",
+            dtype=np.uint8,
+            shape=(len(pending), *pending[0][1].shape),
+        )
+        for row, (_, canvas, _) in enumerate(pending):
+            shard[row] = canvas
+        shard.flush()
+        del shard
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tensors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                [
+                    (sha256, self.size, name, row, *transform)
+                    for row, (sha256, _, transform) in enumerate(pending)
+                ],
+            )
+            self._conn.commit()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._pending.clear()
+                self._shards.clear()
+                self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+from api import crud, main
+from api.database import PoolTimeoutError
+
+
+async def run_inline(func, *args):
+    return func(*args)
+
+
+def search_with(monkeypatch, error):
+    @contextmanager
+    def failing_connection(readonly=False):
+        raise error
+        yield
+
+    monkeypatch.setattr(main, "run_db", run_inline)
+    monkeypatch.setattr(crud, "pooled_connection", failing_connection)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    return client.get("/api/search/messages", params={"query": "paracetamol"})
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        PoolTimeoutError("No database connection available after 5 seconds."),
+        psycopg2.OperationalError("server closed the connection unexpectedly"),
+    ],
+)
+def test_search_without_a_database_is_unavailable(monkeypatch, error):
+    response = search_with(monkeypatch, error)
+
+    assert response.status_code == 503
+
+
+def test_search_query_error_reads_as_no_matches(monkeypatch):
+    response = search_with(monkeypatch, psycopg2.ProgrammingError("syntax error"))
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("healthy, status", [(True, 200), (False, 503)])
+def test_health_reflects_the_pool(monkeypatch, healthy, status):
+    monkeypatch.setattr(main, "run_db", run_inline)
+    monkeypatch.setattr(main, "check_pool_health", lambda: healthy)
+    client = TestClient(main.app, raise_server_exceptions=False)
+
+    assert client.get("/health").status_code == status
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import Request, Response
+
+from api import cache
+
+
+def request(**headers):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+async def run_inline(func):
+    return func()
+
+
+@pytest.fixture
+def marts_version(monkeypatch):
+    """
+    A data version already read from the database, and crud calls run in
+    place of the database thread pool, so no server is needed.
+    """
+    version = cache.DataVersion()
+    version.token = "v7"
+    version.updated_at = datetime(2025, 7, 10, 8, 0, 30, 500, tzinfo=timezone.utc)
+    version.checked_at = time.monotonic()
+    monkeypatch.setattr(cache, "_version", version)
+    monkeypatch.setattr(cache, "_backend", cache.MemoryCache())
+    monkeypatch.setattr(cache, "run_db", run_inline)
+    return version
+
+
+def call(req, func, params=("tikvahpharma",)):
+    response = Response()
+    result = asyncio.run(cache.cached_call(req, response, "report", params, func))
+    return result, response
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = cache.MemoryCache(max_entries=2)
+    backend.set("a", 1, 60)
+    backend.set("b", 2, 60)
+    backend.get("a")
+    backend.set("c", 3, 60)
+
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+
+
+def test_memory_cache_expires_entries():
+    backend = cache.MemoryCache()
+    backend.set("a", 1, -1)
+
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_second_call_is_served_from_the_cache(marts_version):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return ["rows"]
+
+    first, response = call(request(), load)
+    second, _ = call(request(), load)
+
+    assert first == second == ["rows"]
+    assert len(calls) == 1
+    assert response.headers["etag"].startswith('"v7-')
+    assert response.headers["last-modified"] == "Thu, 10 Jul 2025 08:00:30 GMT"
+
+
+def test_matching_etag_gets_a_304(marts_version):
+    _, response = call(request(), lambda: ["rows"])
+    etag = response.headers["etag"]
+
+    result, _ = call(request(if_none_match=f'"other", {etag}'), pytest.fail)
+
+    assert result.status_code == 304
+    assert result.headers["etag"] == etag
+
+
+def test_etag_differs_per_parameters(marts_version):
+    _, response = call(request(), lambda: ["rows"])
+
+    result, _ = call(
+        request(if_none_match=response.headers["etag"]),
+        lambda: ["other rows"],
+        params=("yetenaweg",),
+    )
+
+    assert result == ["other rows"]
+
+
+@pytest.mark.parametrize(
+    "since, not_modified",
+    [
+        ("Thu, 10 Jul 2025 08:00:30 GMT", True),
+        ("Thu, 10 Jul 2025 08:00:29 GMT", False),
+        ("not a date", False),
+    ],
+)
+def test_if_modified_since(marts_version, since, not_modified):
+    result, _ = call(request(if_modified_since=since), lambda: ["rows"])
+
+    assert (getattr(result, "status_code", None) == 304) is not_modified
+
+
+def test_no_validators_without_a_data_version(marts_version):
+    marts_version.token = None
+
+    result, response = call(request(if_none_match="*"), lambda: ["rows"])
+
+    assert result == ["rows"]
+    assert "etag" not in response.headers
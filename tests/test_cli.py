@@ -0,0 +1,42 @@
+import pytest
+
+from scripts import __main__ as cli
+from scripts import _02_data_loader, _03_enriched_data_loader
+
+
+@pytest.fixture(autouse=True)
+def keep_cwd(monkeypatch, tmp_path):
+    # The CLI changes into the scripts folder
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize("result, status", [(None, 1), ((3, 2), 0)])
+def test_load_exit_status(monkeypatch, result, status):
+    monkeypatch.setattr(_02_data_loader, "configure_logging", lambda *a: None)
+    monkeypatch.setattr(
+        _02_data_loader, "load_telegram_messages", lambda **options: result
+    )
+
+    assert cli.main(["load", "--test"]) == status
+
+
+def test_failed_detection_load_exits_non_zero(monkeypatch):
+    monkeypatch.setattr(_03_enriched_data_loader, "configure_logging", lambda *a: None)
+    monkeypatch.setattr(
+        _03_enriched_data_loader.EnrichedDataLoader,
+        "load_enriched_messages",
+        lambda self: None,
+    )
+
+    assert cli.main(["load-detections", "--test"]) == 1
+
+
+def test_script_returning_nothing_exits_non_zero(monkeypatch):
+    monkeypatch.setattr(_02_data_loader, "main", lambda options: None)
+
+    assert cli.main(["load"]) == 1
+
+
+def test_unknown_command(capsys):
+    assert cli.main(["nope"]) == 2
+    assert "unknown command: nope" in capsys.readouterr().err
@@ -0,0 +1,43 @@
+from scripts._02_data_loader import (
+    CopyStream,
+    MessageRows,
+    _copy_field,
+    discover_files,
+)
+from scripts.scrape_checkpoint import CheckpointStore
+
+
+def test_discover_files_skips_scrape_checkpoints(tmp_path):
+    day = tmp_path / "2025-07-10"
+    day.mkdir()
+    (day / "chan.ndjson").write_text(
+        '{"channel_title": "Chan", "channel_username": "@chan", "id": 1, '
+        '"text": "hi", "date": "2025-07-10T08:00:00", "views": 3, '
+        '"media_type": null}\n'
+    )
+    CheckpointStore(str(tmp_path)).update("@chan", 1, "2025-07-10T08:00:00")
+
+    files = discover_files(str(tmp_path))
+
+    assert [key for key, _ in files] == ["2025-07-10/chan.ndjson"]
+    assert len(list(MessageRows(files[0][1]))) == 1
+
+
+def test_copy_fields_are_escaped_for_copy_text_format():
+    assert _copy_field(None) == "\\N"
+    assert _copy_field(42) == "42"
+    assert _copy_field("a\\b\tc\nd\re") == "a\\\\b\\tc\\nd\\re"
+    assert _copy_field("\\N") == "\\\\N"  # the text, not a NULL
+
+
+def test_copy_stream_reads_the_same_text_in_any_chunk_size():
+    rows = [("@chan", 1, "line\none", None), ("@chan", 2, "tab\there", 7)]
+    expected = "@chan\t1\tline\\none\t\\N\n@chan\t2\ttab\\there\t7\n"
+
+    assert CopyStream(rows).read() == expected
+    for size in (1, 5, 8192):
+        stream, chunks = CopyStream(rows), []
+        while chunk := stream.read(size):
+            assert len(chunk) <= size
+            chunks.append(chunk)
+        assert "".join(chunks) == expected
@@ -0,0 +1,23 @@
+from scripts.detection_cache import DetectionCache
+
+
+def test_detections_are_cached_per_model(tmp_path):
+    with DetectionCache(str(tmp_path / "cache.sqlite")) as cache:
+        cache.put_many("yolov8n.pt:aaaa", [("img1", [{"class": "bottle"}])])
+
+        assert cache.get("img1", "yolov8n.pt:aaaa") == [{"class": "bottle"}]
+        assert cache.get("img1", "yolov8n.pt:bbbb") is None
+
+
+def test_invalidate_stale_only_drops_older_weights_of_the_same_file(tmp_path):
+    with DetectionCache(str(tmp_path / "cache.sqlite")) as cache:
+        for model in ["yolov8n.pt:old", "yolov8n.pt", "yolov8n.pt:new", "yolov8m.pt:x"]:
+            cache.put_many(model, [("img1", [])])
+        cache.put_many("yolov8n.ptx:y", [("img1", [])])
+
+        assert cache.invalidate_stale("yolov8n.pt:new") == 2
+        assert cache.get("img1", "yolov8n.pt:old") is None
+        assert cache.get("img1", "yolov8n.pt") is None
+        assert cache.get("img1", "yolov8n.pt:new") == []
+        assert cache.get("img1", "yolov8m.pt:x") == []
+        assert cache.get("img1", "yolov8n.ptx:y") == []
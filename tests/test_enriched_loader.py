@@ -0,0 +1,40 @@
+from scripts._03_enriched_data_loader import detection_id, file_model_version
+
+DETECTION = {
+    "message_id": "tikvahpharma_101",
+    "detected_object": "bottle",
+    "confidence_score": 0.91,
+    "bbox": [10.0, 20.0, 110.0, 220.0],
+}
+
+
+def test_detection_id_is_stable():
+    # Changing these breaks the upsert key of every row already loaded
+    assert detection_id(DETECTION) == "725c5cdee32a0d8a0e0c88d7cf45f9dfddec73d2"
+    assert (
+        detection_id({**DETECTION, "model_version": "yolov8m"})
+        == "993ebf897f11926f29d0a4ebb7e7ae9b60aec3ec"
+    )
+
+
+def test_legacy_model_keeps_its_unversioned_id():
+    assert detection_id({**DETECTION, "model_version": "yolov8n"}) == detection_id(
+        DETECTION
+    )
+
+
+def test_detection_id_ignores_confidence_and_float_noise():
+    noisy = {**DETECTION, "confidence_score": 0.5, "bbox": [10.001, 20.0, 110.0, 220.0]}
+    assert detection_id(noisy) == detection_id(DETECTION)
+
+
+def test_detection_id_tells_boxes_and_classes_apart():
+    moved = {**DETECTION, "bbox": [12.0, 20.0, 110.0, 220.0]}
+    other_class = {**DETECTION, "detected_object": "cup"}
+    ids = {detection_id(d) for d in (DETECTION, moved, other_class)}
+    assert len(ids) == 3
+
+
+def test_file_model_version():
+    assert file_model_version("fct_image_detections.json") == "yolov8n"
+    assert file_model_version("data/fct_image_detections_yolov8m.json") == "yolov8m"
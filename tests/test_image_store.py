@@ -0,0 +1,82 @@
+import io
+import os
+
+from PIL import Image
+
+from scripts import image_store
+from scripts.image_store import ImageStore, difference_hash
+
+
+def jpeg(pattern, quality=90, size=(64, 48)):
+    image = Image.new("L", size)
+    image.putdata([pattern(x, y) for y in range(size[1]) for x in range(size[0])])
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def gradient(x, y):
+    return (x * 4) % 256
+
+
+def checkers(x, y):
+    return 255 if (x // 8 + y // 8) % 2 else 0
+
+
+def test_identical_bytes_are_stored_once(tmp_path):
+    data = jpeg(gradient)
+    with ImageStore(str(tmp_path)) as store:
+        first = store.put(data)
+        assert store.put(data) == first
+        store.link("chan_1", first, photo_id=10)
+        store.link("chan_2", first)
+
+        assert os.path.exists(store.path(first))
+        assert store.photo(10) == first
+        assert store.message_image("chan_2") == first
+        assert store.stats()["images"] == 1
+        assert store.stats()["bytes_saved"] == len(data)
+
+
+def test_recompressed_repost_groups_with_the_original(tmp_path):
+    with ImageStore(str(tmp_path)) as store:
+        original = store.put(jpeg(gradient, quality=90))
+        repost = store.put(jpeg(gradient, quality=40))
+        other = store.put(jpeg(checkers))
+        for message_id, sha256 in [("a", original), ("b", repost), ("c", other)]:
+            store.link(message_id, sha256)
+
+        assert repost != original
+        groups, missing = store.group_messages(["a", "b", "c", "d"])
+        assert groups == {original: ["a", "b"], other: ["c"]}
+        assert missing == ["d"]
+
+        exact, _ = store.group_messages(["a", "b"], near_duplicates=False)
+        assert exact == {original: ["a"], repost: ["b"]}
+
+
+def test_same_picture_at_another_size_is_not_merged(tmp_path):
+    small_data = jpeg(gradient, size=(64, 48))
+    large_data = jpeg(lambda x, y: gradient(x // 2, y), size=(128, 96))
+    assert difference_hash(small_data)[0] == difference_hash(large_data)[0]
+
+    with ImageStore(str(tmp_path)) as store:
+        small = store.put(small_data)
+        large = store.put(large_data)
+        store.link("a", small)
+        store.link("b", large)
+
+        groups, _ = store.group_messages(["a", "b"])
+        assert groups == {small: ["a"], large: ["b"]}
+
+
+def test_messages_are_looked_up_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "LOOKUP_CHUNK", 2)
+    with ImageStore(str(tmp_path)) as store:
+        sha256 = store.put(jpeg(gradient))
+        for message_id in "abcde":
+            store.link(message_id, sha256)
+
+        groups, missing = store.group_messages(["e", "x", "a", "c", "b", "d"])
+        assert groups == {sha256: ["e", "a", "c", "b", "d"]}
+        assert missing == ["x"]
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+HEAVY = ("torch", "ultralytics", "telethon", "cv2")
+SCRIPTS = (
+    "scripts.__main__",
+    "scripts._01_data_scraper",
+    "scripts._02_data_loader",
+    "scripts._03_data_enricher",
+    "scripts._03_enriched_data_loader",
+)
+
+
+def test_scripts_import_without_heavy_dependencies():
+    code = "; ".join(
+        [f"import {module}" for module in SCRIPTS]
+        + [f"import sys; print(sorted(m for m in {HEAVY!r} if m in sys.modules))"]
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
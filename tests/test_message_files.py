@@ -0,0 +1,71 @@
+import pytest
+
+from scripts.message_files import MessageWriter, message_file_path, read_messages
+
+try:
+    import zstandard
+except ImportError:  # optional, only --compress zst needs it
+    zstandard = None
+
+COMPRESSIONS = [
+    None,
+    "gz",
+    pytest.param(
+        "zst",
+        marks=pytest.mark.skipif(
+            zstandard is None,
+            reason="zstandard is not installed",
+        ),
+    ),
+]
+
+
+def message(msg_id):
+    return {"channel_username": "@chan", "id": msg_id, "text": f"post {msg_id}"}
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_appends_are_read_back_in_order(tmp_path, compression):
+    path = message_file_path(str(tmp_path), "chan", compression)
+    MessageWriter(path).append([message(1), message(2)])
+    MessageWriter(path).append([message(3)])
+
+    assert [msg["id"] for msg in read_messages(path)] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_ids_already_in_the_file_are_skipped(tmp_path, compression):
+    path = message_file_path(str(tmp_path), "chan", compression)
+    writer = MessageWriter(path)
+    assert writer.append([message(1), message(2)]) == 2
+    assert writer.append([message(2), message(3)]) == 1
+
+    reopened = MessageWriter(path)
+    assert reopened.ids == {1, 2, 3}
+    assert reopened.append([message(1)]) == 0
+    assert [msg["id"] for msg in read_messages(path)] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_truncated_tail_is_dropped_and_cut_before_appending(tmp_path, compression):
+    path = message_file_path(str(tmp_path), "chan", compression)
+    MessageWriter(path).append([message(1), message(2)])
+    MessageWriter(path).append([message(3)])
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-15])  # a crash in the middle of the last append
+
+    assert [msg["id"] for msg in read_messages(path)] == [1, 2]
+
+    writer = MessageWriter(path)
+    assert writer.ids == {1, 2}
+    writer.append([message(3), message(4)])
+    assert [msg["id"] for msg in read_messages(path)] == [1, 2, 3, 4]
+
+
+def test_legacy_json_array_is_read(tmp_path):
+    path = tmp_path / "chan.json"
+    path.write_text('[{"id": 1}, {"id": 2}]', encoding="utf-8")
+
+    assert [msg["id"] for msg in read_messages(str(path))] == [1, 2]
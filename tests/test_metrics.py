@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import metrics
+from api.metrics import Gauge, Histogram, MetricsMiddleware, add_time
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, "/a")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.650000',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    histogram = Histogram("h", "H.", ("route",), buckets=(1,))
+    histogram.observe(0.5, 'a"b\\c')
+
+    assert 'h_count{route="a\\"b\\\\c"} 1' in histogram.render()
+
+
+def test_unlabelled_series_and_gauges():
+    histogram = Histogram("wait_seconds", "Wait.", (), buckets=(1,))
+    histogram.observe(2)
+
+    assert histogram.render()[-3:] == [
+        'wait_seconds_bucket{le="+Inf"} 1',
+        "wait_seconds_sum 2.000000",
+        "wait_seconds_count 1",
+    ]
+    assert Gauge("up", "Up.", lambda: 3).render()[-1] == "up 3"
+
+
+def test_middleware_records_requests_by_route(monkeypatch):
+    for name in ("REQUEST_SECONDS", "DB_SECONDS", "SERIALIZE_SECONDS"):
+        original = getattr(metrics, name)
+        monkeypatch.setattr(
+            metrics, name, Histogram(original.name, "", original.label_names)
+        )
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        add_time("db", 0.25)
+        return {"item_id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/nowhere")
+
+    requests = "\n".join(metrics.REQUEST_SECONDS.render())
+    assert 'route="/items/{item_id}",status="200"} 2' in requests
+    assert 'route="unmatched",status="404"} 1' in requests
+    assert 'api_db_duration_seconds_sum{route="/items/{item_id}"} 0.500000' in (
+        metrics.DB_SECONDS.render()
+    )
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import date
+
+import pytest
+
+from api.exceptions import InvalidCursorException
+from api.pagination import decode_cursor, encode_cursor
+
+
+def raw_cursor(kind, key):
+    payload = json.dumps({"k": kind, "v": key}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def test_cursor_round_trip():
+    activity = encode_cursor("activity:tikvahpharma", date(2025, 7, 10))
+    assert decode_cursor(activity, "activity:tikvahpharma") == date(2025, 7, 10)
+
+    substring = encode_cursor("search:substring", [date(2025, 7, 10), "a_1"])
+    assert decode_cursor(substring, "search:substring") == [date(2025, 7, 10), "a_1"]
+
+    fts = encode_cursor("search:fts", [0.25, "a_1"])
+    assert decode_cursor(fts, "search:fts") == [0.25, "a_1"]
+
+
+def test_cursor_of_another_listing_is_rejected():
+    cursor = encode_cursor("activity:tikvahpharma", date(2025, 7, 10))
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor, "activity:yetenaweg")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["not base64!", base64.urlsafe_b64encode(b"[1, 2]").decode("ascii"), ""],
+)
+def test_garbled_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor, "search:fts")
+
+
+@pytest.mark.parametrize(
+    "kind, key",
+    [
+        ("activity:tikvahpharma", "yesterday"),
+        ("activity:tikvahpharma", 20250710),
+        ("search:substring", ["2025-07-10"]),
+        ("search:substring", ["2025-07-10", 1]),
+        ("search:substring", [0.5, "a_1"]),
+        ("search:fts", ["0.5", "a_1"]),
+        ("search:fts", [True, "a_1"]),
+        ("search:fts", [0.5, "a_1", "extra"]),
+    ],
+)
+def test_tampered_key_is_rejected(kind, key):
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(raw_cursor(kind, key), kind)
@@ -0,0 +1,136 @@
+from collections import namedtuple
+from datetime import date
+
+import duckdb
+
+from scripts.parquet_export import export_table, open_duckdb
+
+Column = namedtuple("Column", "name type_code")
+
+# fct_messages columns with their Postgres type OIDs
+MESSAGE_COLUMNS = [
+    Column("message_id", 25),
+    Column("channel_id", 20),
+    Column("channel_slug", 25),
+    Column("channel_username", 25),
+    Column("date_day", 1082),
+    Column("text", 25),
+    Column("views", 20),
+    Column("media_type", 25),
+    Column("message_length", 23),
+    Column("has_image", 16),
+    Column("loaded_at", 1184),
+    Column("date_month", 1082),
+]
+
+
+class FakeCursor:
+    """
+    Answers the export's queries with fixed rows, as COPY ... FORMAT csv would.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = MESSAGE_COLUMNS
+
+    def execute(self, query):
+        pass
+
+    def copy_expert(self, sql, file):
+        lines = [",".join(column.name for column in MESSAGE_COLUMNS)]
+        for row in self.rows:
+            # Postgres leaves NULL unquoted and quotes empty strings
+            lines.append(
+                ",".join("" if v is None else '""' if v == "" else str(v) for v in row)
+            )
+        file.write("\n".join(lines).encode("utf-8") + b"\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+    def rollback(self):
+        pass
+
+
+def message(message_id, slug, day, text):
+    return (
+        message_id,
+        1,
+        slug,
+        f"@{slug}",
+        day,
+        text,
+        10,
+        None,
+        len(text or ""),
+        "false",
+        "2025-07-10 08:00:00+00",
+        day[:8] + "01",
+    )
+
+
+def export(root, rows):
+    duck = duckdb.connect()
+    try:
+        return export_table(FakeConnection(rows), duck, str(root), "fct_messages")
+    finally:
+        duck.close()
+
+
+def test_messages_are_partitioned_by_channel_and_month(tmp_path):
+    rows = [
+        message("a_1", "a", "2025-06-02", "hello"),
+        message("a_2", "a", "2025-07-01", ""),
+        message("b_1", "b", "2025-06-30", None),
+    ]
+
+    assert export(tmp_path, rows) == 3
+
+    partitions = sorted(
+        p.relative_to(tmp_path / "fct_messages").parent.as_posix()
+        for p in (tmp_path / "fct_messages").rglob("*.parquet")
+    )
+    assert partitions == [
+        "channel_slug=a/date_month=2025-06-01",
+        "channel_slug=a/date_month=2025-07-01",
+        "channel_slug=b/date_month=2025-06-01",
+    ]
+    duck = open_duckdb(str(tmp_path))
+    assert duck.execute(
+        "SELECT message_id, text, date_month, has_image "
+        "FROM fct_messages ORDER BY message_id"
+    ).fetchall() == [
+        ("a_1", "hello", date(2025, 6, 1), False),
+        ("a_2", "", date(2025, 7, 1), False),
+        ("b_1", None, date(2025, 6, 1), False),
+    ]
+
+
+def test_reexport_replaces_the_previous_files(tmp_path):
+    export(tmp_path, [message("a_1", "a", "2025-06-02", "old")])
+    duck = open_duckdb(str(tmp_path))
+
+    export(tmp_path, [message("b_1", "b", "2025-07-02", "new")])
+
+    assert duck.execute("SELECT message_id FROM fct_messages").fetchall() == [("b_1",)]
+    assert [p.name for p in tmp_path.iterdir()] == ["fct_messages"]
+
+
+def test_tables_not_exported_get_no_view(tmp_path):
+    export(tmp_path, [message("a_1", "a", "2025-06-02", "hi")])
+
+    views = open_duckdb(str(tmp_path)).execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal"
+    )
+    assert [row[0] for row in views.fetchall()] == ["fct_messages"]
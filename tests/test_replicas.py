@@ -0,0 +1,126 @@
+import itertools
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+from api import database
+from api.database import PoolNode, pooled_connection
+
+
+class FakeConnection:
+    def __init__(self, node):
+        self.node = node
+        self.closed = 0
+
+    def get_transaction_status(self):
+        if self.closed:
+            return extensions.TRANSACTION_STATUS_UNKNOWN
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """
+    Stands in for a node's ThreadedConnectionPool, so no server is needed.
+    """
+
+    def __init__(self, node, reachable=True):
+        self.node = node
+        self.reachable = reachable
+        self.closed = False
+
+    def getconn(self):
+        if not self.reachable:
+            raise psycopg2.OperationalError(f"could not connect to {self.node}")
+        return FakeConnection(self.node)
+
+    def putconn(self, conn, close=False):
+        pass
+
+
+def node(name, reachable=True):
+    pool_node = PoolNode(name, {}, 1, 2)
+    pool_node.pool = FakePool(name, reachable)
+    return pool_node
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    primary = node("primary")
+    replicas = [node("replica1"), node("replica2")]
+    monkeypatch.setattr(database, "_primary", primary)
+    monkeypatch.setattr(database, "_replicas", replicas)
+    monkeypatch.setattr(database, "_next_replica", itertools.count())
+    return primary, replicas
+
+
+def read_from():
+    with pooled_connection(readonly=True) as conn:
+        return conn.node
+
+
+def test_reads_rotate_over_replicas(nodes):
+    assert [read_from() for _ in range(3)] == ["replica1", "replica2", "replica1"]
+
+
+def test_writes_go_to_the_primary(nodes):
+    with pooled_connection() as conn:
+        assert conn.node == "primary"
+
+
+def test_unreachable_replica_is_marked_down_and_skipped(nodes):
+    _, (replica1, _) = nodes
+    replica1.pool.reachable = False
+
+    assert read_from() == "replica2"
+    assert not replica1.available()
+    assert [n.name for n in database._read_nodes()] == ["replica2", "primary"]
+
+
+def test_reads_fall_back_to_the_primary(nodes):
+    _, replicas = nodes
+    for replica in replicas:
+        replica.pool.reachable = False
+
+    assert read_from() == "primary"
+    assert [n.name for n in database._read_nodes()] == ["primary"]
+
+
+def test_replica_failing_mid_query_is_marked_down(nodes):
+    _, (replica1, replica2) = nodes
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pooled_connection(readonly=True) as conn:
+            conn.closed = 2
+            raise psycopg2.OperationalError("server closed the connection")
+
+    assert not replica1.available()
+    assert replica2.available()
+
+
+def test_replica_comes_back_after_the_cooldown(nodes, monkeypatch):
+    _, (replica1, _) = nodes
+    replica1.mark_down(psycopg2.OperationalError("gone"))
+    monkeypatch.setattr(replica1, "down_until", 0.0)
+    monkeypatch.setattr(
+        database.pool,
+        "ThreadedConnectionPool",
+        lambda minconn, maxconn: FakePool("replica1"),
+    )
+    monkeypatch.setattr(database, "_ping", lambda conn: None)
+
+    assert read_from() == "replica1"
+
+
+def test_worker_threads_cover_every_pool(monkeypatch):
+    monkeypatch.setattr(database, "_primary", None)
+    monkeypatch.setattr(database, "READ_DSNS", ["host=a", "host=b"])
+    monkeypatch.setattr(PoolNode, "get_pool", lambda self: None)
+    database.init_pool(minconn=1, maxconn=4)
+    try:
+        assert database._limiter.total_tokens == 12
+    finally:
+        database.close_pool()
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from scripts._01_data_scraper import RequestBudget, SharedRequestBudget
+
+
+def timed_acquires(budget, count, pause=0):
+    async def run():
+        if pause:
+            budget.pause(pause)
+        start = time.monotonic()
+        await asyncio.gather(*(budget.acquire() for _ in range(count)))
+        return time.monotonic() - start
+
+    return asyncio.run(run())
+
+
+def test_requests_are_paced_to_the_rate():
+    # One request goes out at once, the next four wait 1/20 s each
+    elapsed = timed_acquires(RequestBudget(20), 5)
+    assert 0.18 <= elapsed < 1.0
+
+
+def test_burst_goes_out_back_to_back():
+    assert timed_acquires(RequestBudget(1, burst=5), 5) < 0.1
+
+
+def test_pause_holds_every_request():
+    assert timed_acquires(RequestBudget(1000, burst=5), 3, pause=0.2) >= 0.19
+
+
+def test_shared_budget_paces_every_process(tmp_path):
+    # Two stores on one file stand in for two scraper processes
+    path = str(tmp_path / "request_budget.sqlite")
+    first, second = SharedRequestBudget(path, 20), SharedRequestBudget(path, 20)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(
+            *(budget.acquire() for budget in (first, second, first, second))
+        )
+        return time.monotonic() - start
+
+    try:
+        assert 0.13 <= asyncio.run(run()) < 1.0
+    finally:
+        first.close()
+        second.close()
+
+
+def test_flood_wait_pauses_other_processes(tmp_path):
+    path = str(tmp_path / "request_budget.sqlite")
+    first, second = SharedRequestBudget(path, 1000), SharedRequestBudget(path, 1000)
+    try:
+        first.pause(0.2)
+        assert timed_acquires(second, 1) >= 0.19
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,30 @@
+from scripts.scrape_checkpoint import CheckpointStore
+
+
+def test_checkpoint_survives_a_new_store(tmp_path):
+    CheckpointStore(str(tmp_path)).update("@chan", 42, "2025-07-10T08:00:00")
+
+    store = CheckpointStore(str(tmp_path))
+    assert store.get("@chan") == {"last_id": 42, "last_date": "2025-07-10T08:00:00"}
+    assert store.last_id("@chan") == 42
+    assert store.last_id("@other") == 0
+
+
+def test_checkpoint_never_moves_backwards(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.update("@chan", 42, "2025-07-10T08:00:00")
+    store.update("@chan", 7, "2025-07-01T08:00:00")
+
+    assert CheckpointStore(str(tmp_path)).last_id("@chan") == 42
+
+
+def test_channels_are_kept_in_separate_files(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.update("@a", 1, None)
+    store.update("@b", 2, None)
+
+    assert sorted(p.name for p in (tmp_path / "scrape_checkpoints").iterdir()) == [
+        "a.json",
+        "b.json",
+    ]
+
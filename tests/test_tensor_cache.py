@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from scripts.tensor_cache import PAD_VALUE, TensorCache, letterbox, restore_boxes
+
+
+def test_letterbox_keeps_aspect_ratio_and_pads_evenly():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+
+    canvas, transform = letterbox(image, 640)
+
+    assert canvas.shape == (640, 640, 3)
+    assert transform == (3.2, 0, 160, 200, 100)
+    assert (canvas[:160] == PAD_VALUE).all() and (canvas[480:] == PAD_VALUE).all()
+    assert (canvas[160:480] == 0).all()
+
+
+def test_restore_boxes_inverts_letterbox():
+    _, transform = letterbox(np.zeros((100, 200, 3), dtype=np.uint8), 640)
+    canvas_box = [32.0, 192.0, 320.0, 352.0]  # (10, 10)-(100, 60) in the image
+
+    assert restore_boxes([canvas_box], transform) == [
+        pytest.approx([10.0, 10.0, 100.0, 60.0])
+    ]
+
+
+def test_restore_boxes_clips_to_the_image():
+    _, transform = letterbox(np.zeros((100, 200, 3), dtype=np.uint8), 640)
+
+    assert restore_boxes([[-50.0, 0.0, 700.0, 640.0]], transform) == [
+        [0.0, 0.0, 200.0, 100.0]
+    ]
+
+
+def test_cached_inputs_are_read_back(tmp_path):
+    canvas, transform = letterbox(np.full((50, 80, 3), 7, dtype=np.uint8), 64)
+    with TensorCache(str(tmp_path), size=64, shard_images=2) as cache:
+        cache.add("a" * 64, canvas, transform)
+        assert cache.get("a" * 64) is None  # still buffered
+        cache.add("b" * 64, canvas, transform)  # fills the shard
+
+        cached, cached_transform = cache.get("a" * 64)
+        assert (cached == canvas).all()
+        assert cached_transform == pytest.approx(transform)
+    with TensorCache(str(tmp_path), size=128) as other_size:
+        assert other_size.get("a" * 64) is None